@@ -0,0 +1,85 @@
+"""
+Pre-bakes every image under an asset folder into a decoded image cache, so the
+game can memory-map the pixels instead of decoding PNGs/GIFs on each launch.
+Runs outside the engine:
+
+    python my_game/bake_assets.py ASSET_DIR CACHE_DIR [--jobs N] [--pattern "*.png" ...]
+                                  [--thumbnails 64,128]
+
+Point TextureRegistry.CACHE_DIR at the same CACHE_DIR in the game.
+"""
+import argparse
+import concurrent.futures
+import importlib.util
+import pathlib
+import sys
+import time
+
+# Load asset_cache.py directly, importing the bgimgui package needs bge
+_spec = importlib.util.spec_from_file_location(
+    "bgimgui_asset_cache", pathlib.Path(__file__).parent / "bgimgui" / "asset_cache.py")
+asset_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(asset_cache)
+
+DEFAULT_PATTERNS = ("*.png", "*.gif", "*.jpg", "*.jpeg", "*.bmp", "*.tga", "*.webp")
+
+
+def bake_one(cache_dir: str, path: str, force: bool, thumbnails=()):
+    cache = asset_cache.DecodedImageCache(cache_dir)
+    start = time.perf_counter()
+    try:
+        entry = cache.bake(path, force=force)
+        for max_size in thumbnails:
+            cache.bake(path, force=force, max_size=max_size)
+    except Exception as error:
+        return path, None, f"{type(error).__name__}: {error}", 0.0
+    return path, str(entry), None, time.perf_counter() - start
+
+
+def find_assets(asset_dir: pathlib.Path, patterns):
+    paths = set()
+    for pattern in patterns:
+        paths.update(path for path in asset_dir.rglob(pattern) if path.is_file())
+    return sorted(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("asset_dir", type=pathlib.Path)
+    parser.add_argument("cache_dir", type=pathlib.Path)
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="worker processes, defaults to the CPU count")
+    parser.add_argument("--pattern", "-p", action="append", dest="patterns",
+                        help="file glob to bake, can be repeated")
+    parser.add_argument("--force", action="store_true",
+                        help="bake again even if an entry exists")
+    parser.add_argument("--thumbnails", default="",
+                        help="comma separated thumbnail sizes to bake too, e.g. the ImageGallery levels 64,128,256,512")
+    args = parser.parse_args(argv)
+    thumbnails = tuple(int(size) for size in args.thumbnails.split(",") if size)
+
+    paths = find_assets(args.asset_dir, args.patterns or DEFAULT_PATTERNS)
+    if not paths:
+        print(f"No images found in {args.asset_dir}")
+        return 0
+
+    start = time.perf_counter()
+    failures = 0
+    with concurrent.futures.ProcessPoolExecutor(args.jobs) as pool:
+        futures = [pool.submit(bake_one, str(args.cache_dir), str(path), args.force, thumbnails)
+                   for path in paths]
+        for future in concurrent.futures.as_completed(futures):
+            path, entry, error, elapsed = future.result()
+            if error is not None:
+                failures += 1
+                print(f"FAILED {path}: {error}")
+            else:
+                print(f"{elapsed * 1000:8.1f} ms  {path}")
+
+    print(f"Baked {len(paths) - failures}/{len(paths)} images into {args.cache_dir} "
+          f"in {time.perf_counter() - start:.2f} s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+Headless benchmarks of bgimgui. Runs BGEImguiWrapper and BGEImguiRenderer
+outside the engine, on an offscreen Mesa context (EGL or OSMesa) with a
+stand-in bge module, through scripted scenarios:
+
+    cd my_game
+    python -m benchmarks run [--scenario NAME ...] [--frames N] [--output results.json]
+    python -m benchmarks compare baseline.json results.json
+
+Results are JSON with frame time percentiles and Python and GL allocations
+per scenario. Software rendering timings depend on the machine, only compare
+runs made on the same one.
+"""
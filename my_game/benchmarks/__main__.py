@@ -0,0 +1,158 @@
+import argparse
+import ast
+import datetime
+import json
+import pathlib
+import platform
+import subprocess
+import sys
+
+from . import headless
+
+# Classes whose UPPERCASE settings --set can change
+CONFIGURABLE = {
+    "bgimgui.renderer": ("BGEPipelineRenderer", "BGEImguiRenderer", "GLStateTracker"),
+    "bgimgui.imgui_wrapper": ("BGEImguiWrapper",),
+    "bgimgui.manager": ("PanelManager",),
+    "bgimgui.picking": ("PanelPicker",),
+    "bgimgui.atlas": ("PanelAtlas",),
+    "bgimgui.textures": ("TextureRegistry", "ImageTexture"),
+    "bgimgui.loader": ("ImageLoader",),
+    "bgimgui.image": ("ImageHelper",),
+    "bgimgui.widgets": ("ImageGallery",),
+}
+
+
+def apply_settings(settings):
+    """Set Class.ATTRIBUTE=value settings, values are Python literals."""
+    import importlib
+    classes = {}
+    for module_name, names in CONFIGURABLE.items():
+        module = importlib.import_module(module_name)
+        for name in names:
+            classes[name] = getattr(module, name)
+
+    applied = {}
+    for setting in settings:
+        target, _, value = setting.partition("=")
+        class_name, _, attribute = target.partition(".")
+        cls = classes.get(class_name)
+        if cls is None or not attribute.isupper() or not hasattr(cls, attribute):
+            raise SystemExit(f"Unknown setting {target!r}")
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            raise SystemExit(f"Setting {target!r} needs a Python literal, got {value!r}")
+        setattr(cls, attribute, value)
+        applied[target] = value
+    return applied
+
+
+def git_revision():
+    def git(*command):
+        return subprocess.run(("git",) + command, capture_output=True, text=True, check=True,
+                              cwd=pathlib.Path(__file__).parent).stdout.strip()
+    try:
+        commit = git("rev-parse", "HEAD")
+        dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {"commit": commit, "dirty": dirty}
+
+
+def run(args):
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    try:
+        context = headless.create_context(args.gl, width, height)
+    except RuntimeError as error:
+        raise SystemExit(f"Could not create an offscreen GL context: {error}")
+
+    # Only importable once the GL platform is chosen and bge exists
+    from . import fake_bge
+    engine = fake_bge.install(width, height)
+    fake_bge.load_bgimgui()
+    from imgui_bundle import __version__ as imgui_bundle_version
+    from .runner import ScenarioRunner
+    from .scenarios import SCENARIOS
+
+    names = args.scenario or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios {unknown}, expected some of {list(SCENARIOS)}")
+
+    settings = list(args.set)
+    if args.gpu_timing:
+        settings.append("BGEPipelineRenderer.GPU_TIMING=True")
+    applied = apply_settings(settings)
+
+    runner = ScenarioRunner(engine, args.frames, args.warmup, args.memory_frames)
+    results = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": sys.version.split()[0],
+            "system": platform.platform(),
+            "imgui_bundle": imgui_bundle_version,
+            "gl": context.info(),
+            "window": [width, height],
+            "settings": applied,
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        result = runner.run(SCENARIOS[name])
+        results["scenarios"][name] = result
+        frame_ms = result["frame_ms"]
+        print(f"{name:<22} median {frame_ms['median']:7.3f} ms  p99 {frame_ms['p99']:7.3f} ms  "
+              f"{result['memory'].get('transient_bytes_mean', 0) / 1024:8.1f} KiB/frame  "
+              f"{len(result['gl']['leaks'])} leaks", file=sys.stderr)
+
+    context.destroy()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Headless bgimgui benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run scenarios and write JSON results")
+    run_parser.add_argument("--scenario", "-s", action="append",
+                            help="scenario to run, can be repeated, defaults to all")
+    run_parser.add_argument("--frames", "-n", type=int, default=None,
+                            help="measured frames per scenario, defaults to each scenario's own")
+    run_parser.add_argument("--warmup", type=int, default=None,
+                            help="frames run before measuring")
+    run_parser.add_argument("--memory-frames", type=int, default=None,
+                            help="frames run under tracemalloc after the measured ones, 0 to skip")
+    run_parser.add_argument("--gl", choices=headless.PLATFORMS, default="egl",
+                            help="offscreen GL platform")
+    run_parser.add_argument("--size", default="1280x720", help="window size")
+    run_parser.add_argument("--gpu-timing", action="store_true",
+                            help="measure GPU time with timer queries")
+    run_parser.add_argument("--set", action="append", default=[], metavar="CLASS.SETTING=VALUE",
+                            help="change a class setting, e.g. BGEPipelineRenderer.MERGE_CMD_LISTS=True")
+    run_parser.add_argument("--output", "-o", help="JSON file to write, defaults to stdout")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative change counted as a regression")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        from .compare import compare
+        return compare(args.baseline, args.results, args.threshold)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Compares two result files of `python -m benchmarks run`, e.g. before and after a commit."""
+from __future__ import annotations
+import json
+
+# (section, key) of every compared metric, lower is better for all of them.
+# Only the ones marked True fail the comparison, p99 and max are too noisy.
+METRICS = (
+    ("frame_ms", "median", True),
+    ("frame_ms", "p99", False),
+    ("update_ms", "median", True),
+    ("render_ms", "median", True),
+    ("gpu_ms", "median", False),
+    ("memory", "transient_bytes_mean", True),
+    ("memory", "retained_bytes", False),
+    ("gl", "created_per_frame", True),
+)
+
+
+def _value(result: dict, section: str, key: str):
+    values = result.get(section)
+    if not isinstance(values, dict):
+        return None
+    return values.get(key)
+
+
+def compare(baseline_path: str, results_path: str, threshold=0.1):
+    """Prints the change of every metric, returns 1 if any checked metric got worse by more than threshold."""
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    with open(results_path) as file:
+        results = json.load(file)
+
+    print(f"{'scenario':<22}{'metric':<34}{'baseline':>14}{'results':>14}{'change':>10}")
+    regressions = []
+    for name, result in results["scenarios"].items():
+        old_result = baseline["scenarios"].get(name)
+        if old_result is None:
+            print(f"{name:<22}not in the baseline")
+            continue
+
+        for section, key, checked in METRICS:
+            old, new = _value(old_result, section, key), _value(result, section, key)
+            if old is None or new is None:
+                continue
+            if old:
+                change = (new - old) / abs(old)
+                change_text = f"{change:+.1%}"
+            else:
+                change = float("inf") if new > 0 else 0.0
+                change_text = "new" if new > 0 else "="
+            regressed = checked and change > threshold
+            if regressed:
+                regressions.append((name, f"{section}.{key}"))
+            print(f"{name:<22}{f'{section}.{key}':<34}{old:>14.4g}{new:>14.4g}"
+                  f"{change_text:>10}{'  <-' if regressed else ''}")
+
+        new_leaks = len(result["gl"]["leaks"]) - len(old_result["gl"]["leaks"])
+        if new_leaks > 0:
+            regressions.append((name, "gl.leaks"))
+            print(f"{name:<22}{new_leaks} more GL resources leaked")
+
+    if regressions:
+        print(f"{len(regressions)} regressions over {threshold:.0%}: " +
+              ", ".join(f"{name} {metric}" for name, metric in regressions))
+        return 1
+    return 0
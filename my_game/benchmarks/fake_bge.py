@@ -0,0 +1,360 @@
+"""
+Stand-in for the engine's bge module, with just enough of it to run bgimgui
+outside the engine: one scene with pre_draw/post_draw callbacks and a
+camera, game objects with properties and a default plane mesh, keyboard and
+mouse whose state is set by a script, and bge.texture textures backed by
+real GL textures.
+
+install() puts it in sys.modules, before anything imports bge. Import it
+after headless.select_platform(), it creates GL objects.
+"""
+from __future__ import annotations
+import importlib.util
+import itertools
+import math
+import pathlib
+import sys
+import types
+
+import numpy as np
+from OpenGL import GL as gl
+
+# Where the .blend sits, "//" paths are expanded from it
+BLEND_DIR = pathlib.Path(__file__).resolve().parents[2]
+
+_event_ids = itertools.count(1)
+EVENT_NAMES = (
+    [f"{letter}KEY" for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"]
+    + [f"{digit}KEY" for digit in ("ZERO", "ONE", "TWO", "THREE", "FOUR",
+                                    "FIVE", "SIX", "SEVEN", "EIGHT", "NINE")]
+    + ["TABKEY", "LEFTARROWKEY", "RIGHTARROWKEY", "UPARROWKEY", "DOWNARROWKEY",
+       "PAGEUPKEY", "PAGEDOWNKEY", "HOMEKEY", "ENDKEY", "INSERTKEY", "DELKEY",
+       "BACKSPACEKEY", "SPACEKEY", "ENTERKEY", "ESCKEY",
+       "LEFTCTRLKEY", "RIGHTCTRLKEY", "LEFTALTKEY", "RIGHTALTKEY",
+       "LEFTSHIFTKEY", "RIGHTSHIFTKEY",
+       "LEFTMOUSE", "MIDDLEMOUSE", "RIGHTMOUSE", "WHEELUPMOUSE", "WHEELDOWNMOUSE",
+       "MOUSEX", "MOUSEY"]
+)
+EVENTS = {name: next(_event_ids) for name in EVENT_NAMES}
+
+
+class Vector:
+    """The little of mathutils.Vector bgimgui uses on object transforms."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values) -> None:
+        self._values = [float(value) for value in values]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __setitem__(self, index, value):
+        self._values[index] = float(value)
+
+    def __repr__(self) -> str:
+        return f"Vector({self._values})"
+
+    @property
+    def length(self):
+        return math.sqrt(sum(value * value for value in self._values))
+
+    def _axis(index):
+        return property(lambda self: self._values[index],
+                        lambda self, value: self.__setitem__(index, value))
+
+    x = _axis(0)
+    y = _axis(1)
+    z = _axis(2)
+    del _axis
+
+
+class Vertex:
+    __slots__ = ("XYZ", "UV")
+
+    def __init__(self, position, uv) -> None:
+        self.XYZ = Vector(position)
+        self.UV = Vector(uv)
+
+
+class Mesh:
+    """One material of four vertices, the default plane spanning -1..1 on X and Y."""
+
+    def __init__(self) -> None:
+        self.materials = ["Material"]
+        self._vertices = [[
+            Vertex((-1, -1, 0), (0, 0)), Vertex((1, -1, 0), (1, 0)),
+            Vertex((1, 1, 0), (1, 1)), Vertex((-1, 1, 0), (0, 1)),
+        ]]
+
+    def getVertexArrayLength(self, material_id: int):
+        return len(self._vertices[material_id])
+
+    def getVertex(self, material_id: int, index: int):
+        return self._vertices[material_id][index]
+
+
+class GameObject:
+    """Unrotated object with game properties, a mesh and a transform made of its position and scale."""
+
+    def __init__(self, name: str, position=(0, 0, 0), scale=(1, 1, 1), properties=None) -> None:
+        self.name = name
+        self.worldPosition = Vector(position)
+        self.localScale = Vector(scale)
+        self.properties = dict(properties or {})
+        self.meshes = [Mesh()]
+        self.parent = None
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name}>"
+
+    @property
+    def worldScale(self):
+        return self.localScale
+
+    @property
+    def worldTransform(self):
+        matrix = np.identity(4)
+        matrix[:3, :3] *= np.array(self.localScale)
+        matrix[:3, 3] = self.worldPosition
+        return matrix
+
+    def __getitem__(self, name: str):
+        return self.properties[name]
+
+    def __setitem__(self, name: str, value):
+        self.properties[name] = value
+
+    def __contains__(self, name: str):
+        return name in self.properties
+
+    def get(self, name: str, default=None):
+        return self.properties.get(name, default)
+
+    def rayCast(self, *args, **kwargs):
+        # No physics world, nothing is ever in the way
+        return None, None, None
+
+
+class Camera(GameObject):
+    """Looks down its -Z axis like the engine's cameras, fov is vertical in degrees."""
+
+    def __init__(self, name: str, aspect: float, fov=60.0, position=(0, 0, 0)) -> None:
+        super().__init__(name, position)
+        self.aspect = aspect
+        self.fov = fov
+        self.near = 0.1
+        self.far = 100.0
+
+    @property
+    def projection_matrix(self):
+        focal = 1 / math.tan(math.radians(self.fov) / 2)
+        near, far = self.near, self.far
+        return np.array([
+            [focal / self.aspect, 0, 0, 0],
+            [0, focal, 0, 0],
+            [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+            [0, 0, -1, 0],
+        ])
+
+    def getScreenVect(self, x: float, y: float):
+        # Unit vector from the screen position back towards the camera, like the engine
+        half_height = math.tan(math.radians(self.fov) / 2)
+        direction = np.array([(2 * x - 1) * half_height * self.aspect,
+                              (1 - 2 * y) * half_height, -1.0])
+        return Vector(-direction / np.linalg.norm(direction))
+
+
+class Scene:
+    def __init__(self, name: str, width: int, height: int) -> None:
+        self.name = name
+        self.pre_draw = []
+        self.post_draw = []
+        self.active_camera = Camera("Camera", width / height)
+        self.objects = [self.active_camera]
+
+    def __repr__(self) -> str:
+        return f"<Scene {self.name}>"
+
+    def add_object(self, obj: GameObject):
+        self.objects.append(obj)
+        return obj
+
+    def draw(self):
+        """Clear the window with the state the engine leaves, then run the draw callbacks."""
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        gl.glEnable(gl.GL_DEPTH_TEST)
+        gl.glEnable(gl.GL_CULL_FACE)
+        gl.glClearColor(0.05, 0.05, 0.05, 1.0)
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+        for callback in list(self.pre_draw):
+            callback()
+        for callback in list(self.post_draw):
+            callback()
+
+
+class InputEvent:
+    __slots__ = ("active",)
+
+    def __init__(self) -> None:
+        self.active = True
+
+
+class Keyboard:
+    def __init__(self) -> None:
+        self.activeInputs: dict[int, InputEvent] = {}
+        self.text = ""
+
+    def set(self, keys=(), text=""):
+        """Keys held down this frame, and the characters typed."""
+        self.activeInputs = {key: InputEvent() for key in keys}
+        self.text = text
+
+
+class Mouse:
+    def __init__(self) -> None:
+        self.activeInputs: dict[int, InputEvent] = {}
+        self.position = [0.5, 0.5]
+        self.visible = False
+
+    def set(self, position=None, buttons=()):
+        """Position (0..1 from the top left) and buttons held this frame, wheel events included."""
+        if position is not None:
+            self.position = [float(position[0]), float(position[1])]
+        self.activeInputs = {button: InputEvent() for button in buttons}
+
+
+class ImageBuff:
+    def __init__(self, width=0, height=0, color=0, scale=False) -> None:
+        self.size = (width, height)
+        self.scale = scale
+
+
+class EngineState:
+    """Everything the fake modules read: window size, frame clock, input devices and the scene."""
+
+    def __init__(self, width: int, height: int, tic_rate=60.0) -> None:
+        self.width = width
+        self.height = height
+        self.tic_rate = tic_rate
+        self.frame_time = 0.0
+        self.ended = False
+        self.keyboard = Keyboard()
+        self.mouse = Mouse()
+        self.scene = Scene("Scene", width, height)
+        # GL textures made for bge.texture.Texture, owned by the "engine"
+        self.textures: list[int] = []
+
+    def advance(self):
+        """Move the clock one logic tic on, typed text and wheel events only last one frame."""
+        self.frame_time += 1 / self.tic_rate
+        self.keyboard.text = ""
+        for wheel in (EVENTS["WHEELUPMOUSE"], EVENTS["WHEELDOWNMOUSE"]):
+            self.mouse.activeInputs.pop(wheel, None)
+
+    def reset(self):
+        """Fresh scene and input, keeping the clock running."""
+        self.release_textures()
+        self.ended = False
+        self.keyboard = Keyboard()
+        self.mouse = Mouse()
+        self.scene = Scene("Scene", self.width, self.height)
+
+    def release_textures(self):
+        if self.textures:
+            gl.glDeleteTextures(self.textures)
+        self.textures = []
+
+
+state: EngineState | None = None
+
+
+class Texture:
+    """Material texture replacement, bgimgui renders into its bindId."""
+
+    def __init__(self, obj: GameObject, material_id=0, texture_id=0) -> None:
+        self.bindId = int(gl.glGenTextures(1))
+        state.textures.append(self.bindId)
+        self.source = None
+
+    def refresh(self, refresh_source=True):
+        pass
+
+
+def _expand_path(path: str):
+    if path.startswith("//"):
+        return str(BLEND_DIR / path[2:])
+    return path
+
+
+def _end_game():
+    state.ended = True
+
+
+def _module(name: str, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def load_bgimgui():
+    """
+    Import the bgimgui package without running its __init__, which patches
+    imgui_bundle in the engine's site-packages. Its modules import as usual.
+    """
+    package = sys.modules.get("bgimgui")
+    if package is None:
+        path = BLEND_DIR / "my_game" / "bgimgui"
+        spec = importlib.util.spec_from_file_location(
+            "bgimgui", path / "__init__.py", submodule_search_locations=[str(path)])
+        package = sys.modules["bgimgui"] = importlib.util.module_from_spec(spec)
+    return package
+
+
+def install(width=1280, height=720) -> EngineState:
+    """Register the fake bge modules and return the state they run on."""
+    global state
+    state = EngineState(width, height)
+
+    events = _module("bge.events", **EVENTS)
+
+    class _Logic(types.ModuleType):
+        # Devices and the current scene follow state, which reset() replaces
+        keyboard = property(lambda self: state.keyboard)
+        mouse = property(lambda self: state.mouse)
+
+    logic = _Logic("bge.logic")
+    logic.__dict__.update(
+        getFrameTime=lambda: state.frame_time,
+        getRealTime=lambda: state.frame_time,
+        getLogicTicRate=lambda: state.tic_rate,
+        setLogicTicRate=lambda rate: setattr(state, "tic_rate", rate),
+        getCurrentScene=lambda: state.scene,
+        expandPath=_expand_path,
+        endGame=_end_game,
+    )
+    sys.modules["bge.logic"] = logic
+
+    render = _module(
+        "bge.render",
+        getWindowWidth=lambda: state.width,
+        getWindowHeight=lambda: state.height,
+    )
+    texture = _module("bge.texture", Texture=Texture, ImageBuff=ImageBuff)
+    bge_types = _module(
+        "bge.types",
+        KX_Scene=Scene,
+        KX_GameObject=GameObject,
+        KX_Camera=Camera,
+        SCA_PythonController=object,
+    )
+    _module("bge", events=events, logic=logic, render=render,
+            texture=texture, types=bge_types)
+    return state
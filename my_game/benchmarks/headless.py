@@ -0,0 +1,162 @@
+"""Offscreen OpenGL contexts, so bgimgui can render without a window or display server."""
+from __future__ import annotations
+import ctypes
+import os
+import sys
+
+PLATFORMS = ("egl", "osmesa")
+
+
+def select_platform(platform: str):
+    """Pick the PyOpenGL platform, has to run before anything imports OpenGL."""
+    if platform not in PLATFORMS:
+        raise ValueError(
+            f"Unknown GL platform {platform!r}, expected one of {PLATFORMS}")
+    current = os.environ.get("PYOPENGL_PLATFORM")
+    if "OpenGL" in sys.modules and current != platform:
+        raise RuntimeError(
+            f"OpenGL was already imported for the {current or 'default'} platform")
+    os.environ["PYOPENGL_PLATFORM"] = platform
+    if platform == "egl":
+        # Mesa's EGL only runs without an X or Wayland display on the surfaceless platform
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+
+class HeadlessContext:
+    """Compatibility profile context with a width x height default framebuffer, like the engine's."""
+
+    # Same version the renderer's shaders are written against
+    GL_VERSION = (3, 3)
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+
+    def info(self):
+        from OpenGL import GL as gl
+        return {
+            "platform": os.environ.get("PYOPENGL_PLATFORM"),
+            "vendor": gl.glGetString(gl.GL_VENDOR).decode(),
+            "renderer": gl.glGetString(gl.GL_RENDERER).decode(),
+            "version": gl.glGetString(gl.GL_VERSION).decode(),
+        }
+
+    def make_current(self):
+        raise NotImplementedError
+
+    def destroy(self):
+        raise NotImplementedError
+
+
+class EGLContext(HeadlessContext):
+    def __init__(self, width: int, height: int) -> None:
+        super().__init__(width, height)
+        from OpenGL import EGL
+        self.egl = EGL
+
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("Could not initialize EGL")
+
+        config_attributes = self._attributes(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8,
+            EGL.EGL_GREEN_SIZE, 8,
+            EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_ALPHA_SIZE, 8,
+            EGL.EGL_DEPTH_SIZE, 24,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        )
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, config_attributes,
+                                   ctypes.pointer(config), 1, ctypes.pointer(count)) or not count.value:
+            raise RuntimeError("No EGL config with desktop OpenGL and a pbuffer")
+
+        self.surface = EGL.eglCreatePbufferSurface(self.display, config, self._attributes(
+            EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height))
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(
+            self.display, config, EGL.EGL_NO_CONTEXT, self._attributes(
+                EGL.EGL_CONTEXT_MAJOR_VERSION, self.GL_VERSION[0],
+                EGL.EGL_CONTEXT_MINOR_VERSION, self.GL_VERSION[1],
+                EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                EGL.EGL_CONTEXT_OPENGL_COMPATIBILITY_PROFILE_BIT,
+            ))
+        if not self.context:
+            raise RuntimeError(
+                f"Could not create an OpenGL {self.GL_VERSION} EGL context")
+        self.make_current()
+
+    def _attributes(self, *values):
+        values = values + (self.egl.EGL_NONE,)
+        return (self.egl.EGLint * len(values))(*values)
+
+    def make_current(self):
+        if not self.egl.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+            raise RuntimeError("Could not make the EGL context current")
+
+    def destroy(self):
+        EGL = self.egl
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE,
+                           EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglDestroySurface(self.display, self.surface)
+        EGL.eglTerminate(self.display)
+
+
+class OSMesaContext(HeadlessContext):
+    def __init__(self, width: int, height: int) -> None:
+        super().__init__(width, height)
+        from OpenGL import arrays, osmesa
+        self.osmesa = osmesa
+
+        self.context = None
+        # Some OSMesa builds only give a core profile past OpenGL 3.0
+        for profile in (osmesa.OSMESA_COMPAT_PROFILE, osmesa.OSMESA_CORE_PROFILE):
+            self.context = osmesa.OSMesaCreateContextAttribs([
+                osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+                osmesa.OSMESA_DEPTH_BITS, 24,
+                osmesa.OSMESA_PROFILE, profile,
+                osmesa.OSMESA_CONTEXT_MAJOR_VERSION, self.GL_VERSION[0],
+                osmesa.OSMESA_CONTEXT_MINOR_VERSION, self.GL_VERSION[1],
+                0,
+            ], None)
+            if self.context:
+                break
+        else:
+            raise RuntimeError(
+                f"Could not create an OpenGL {self.GL_VERSION} OSMesa context")
+
+        # GL_UNSIGNED_BYTE, without importing OpenGL.GL before error checking is set up
+        self._type = 0x1401
+        self.buffer = arrays.GLubyteArray.zeros((height, width, 4))
+        self.make_current()
+
+    def make_current(self):
+        if not self.osmesa.OSMesaMakeCurrent(
+                self.context, self.buffer, self._type, self.width, self.height):
+            raise RuntimeError("Could not make the OSMesa context current")
+
+    def destroy(self):
+        self.osmesa.OSMesaDestroyContext(self.context)
+        self.context = None
+
+
+def create_context(platform: str, width: int, height: int) -> HeadlessContext:
+    select_platform(platform)
+    from OpenGL.error import NullFunctionError
+    context_type = EGLContext if platform == "egl" else OSMesaContext
+    try:
+        context = context_type(width, height)
+    except (ImportError, AttributeError, NullFunctionError) as error:
+        # PyOpenGL fails with these when the platform's library isn't installed
+        raise RuntimeError(f"{platform} is not available: {error}") from error
+
+    # renderer.py turns error checking off before OpenGL.GL is first imported,
+    # which is here now. Any earlier and PyOpenGL's EGL module doesn't load.
+    import OpenGL
+    OpenGL.ERROR_CHECKING = False
+    return context
@@ -0,0 +1,162 @@
+"""Runs scenarios frame by frame and collects frame times and allocations."""
+from __future__ import annotations
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+from OpenGL import GL as gl
+
+from bgimgui import resources
+
+from .fake_bge import EngineState
+from .scenarios import Scenario
+
+
+def summarize(samples_ns):
+    """min/mean/median/p95/p99/max in milliseconds."""
+    if not len(samples_ns):
+        return None
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    return {
+        "min": float(samples.min()),
+        "mean": float(samples.mean()),
+        "median": float(np.median(samples)),
+        "p95": float(np.percentile(samples, 95)),
+        "p99": float(np.percentile(samples, 99)),
+        "max": float(samples.max()),
+    }
+
+
+class ScenarioRunner:
+    """
+    Runs one scenario at a time on the fake engine: warmup frames first, then
+    the measured frames, then MEMORY_FRAMES more under tracemalloc (which
+    slows frames down too much to time them at the same time).
+
+    A frame is the scripted input, the logic tic (update) and the scene draw
+    with its post_draw callbacks (render), finished with glFinish so the
+    driver work of the frame is part of it.
+    """
+
+    WARMUP_FRAMES = 60
+    MEMORY_FRAMES = 60
+
+    def __init__(self, engine: EngineState, frames: int | None = None,
+                 warmup: int | None = None, memory_frames: int | None = None) -> None:
+        self.engine = engine
+        self.frames = frames
+        self.warmup = self.WARMUP_FRAMES if warmup is None else warmup
+        self.memory_frames = self.MEMORY_FRAMES if memory_frames is None else memory_frames
+
+    def _frame(self, scenario: Scenario, frame: int):
+        engine = self.engine
+        engine.advance()
+        scenario.script(frame)
+
+        start = time.perf_counter_ns()
+        scenario.update(frame)
+        updated = time.perf_counter_ns()
+        engine.scene.draw()
+        gl.glFinish()
+        end = time.perf_counter_ns()
+        return updated - start, end - updated
+
+    @staticmethod
+    def _renderer_totals(scenario: Scenario):
+        totals = np.zeros(4, dtype=np.int64)
+        for renderer in scenario.renderers():
+            stats = renderer.stats
+            totals += (stats.frames_drawn, stats.total_draw_calls,
+                       stats.total_bytes_uploaded, renderer.frames_skipped)
+        return totals
+
+    def run(self, scenario_type: type[Scenario]):
+        engine = self.engine
+        engine.reset()
+        tracker = resources.tracker
+        existing = set(tracker.live)
+
+        scenario = scenario_type(engine, self.frames)
+        setup_start = time.perf_counter()
+        scenario.setup()
+        setup_ms = (time.perf_counter() - setup_start) * 1000
+
+        frame = 0
+        for frame in range(self.warmup):
+            self._frame(scenario, frame)
+
+        update_ns, render_ns, frame_ns, gpu_ms = [], [], [], []
+        totals = self._renderer_totals(scenario)
+        created = tracker.created
+        peak_gl_bytes = 0
+        collections = sum(stats["collections"] for stats in gc.get_stats())
+        for frame in range(self.warmup, self.warmup + scenario.frames):
+            update, render = self._frame(scenario, frame)
+            update_ns.append(update)
+            render_ns.append(render)
+            frame_ns.append(update + render)
+
+            readings = [timer.last_ms for timer in scenario.gpu_timers()]
+            if readings and None not in readings:
+                gpu_ms.append(sum(readings) * 1e6)
+            peak_gl_bytes = max(peak_gl_bytes, tracker.info()["bytes"])
+        collections = sum(stats["collections"] for stats in gc.get_stats()) - collections
+        created = tracker.created - created
+        frames_drawn, draw_calls, bytes_uploaded, frames_skipped = (
+            self._renderer_totals(scenario) - totals).tolist()
+
+        memory = self._measure_memory(scenario, frame + 1)
+        memory["gc_collections"] = collections
+        info = scenario.info()
+
+        scenario.teardown()
+        leaks = [repr(resource) for key, resource in tracker.live.items()
+                 if key not in existing]
+
+        return {
+            "description": scenario.DESCRIPTION,
+            "frames": scenario.frames,
+            "warmup": self.warmup,
+            "setup_ms": setup_ms,
+            "frame_ms": summarize(frame_ns),
+            "update_ms": summarize(update_ns),
+            "render_ms": summarize(render_ns),
+            "gpu_ms": summarize(gpu_ms),
+            "memory": memory,
+            "gl": {
+                "created_per_frame": created / scenario.frames,
+                "peak_bytes": peak_gl_bytes,
+                "leaks": leaks,
+            },
+            "renderer": {
+                "frames_drawn": frames_drawn,
+                "frames_skipped": frames_skipped,
+                "draw_calls_per_frame": draw_calls / max(1, frames_drawn),
+                "bytes_uploaded_per_frame": bytes_uploaded / max(1, frames_drawn),
+            },
+            "info": info,
+        }
+
+    def _measure_memory(self, scenario: Scenario, first_frame: int):
+        """Python allocations per frame: peak above the start of the frame, and what the frames kept."""
+        if not self.memory_frames:
+            return {"frames": 0}
+
+        transient = []
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        for frame in range(first_frame, first_frame + self.memory_frames):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            self._frame(scenario, frame)
+            transient.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+
+        return {
+            "frames": self.memory_frames,
+            "transient_bytes_mean": float(np.mean(transient)),
+            "transient_bytes_max": int(max(transient)),
+            "retained_bytes": retained,
+        }
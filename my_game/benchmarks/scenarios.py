@@ -0,0 +1,367 @@
+"""Scripted benchmark scenarios, each one a typical way games use bgimgui."""
+from __future__ import annotations
+import math
+import shutil
+import tempfile
+
+from imgui_bundle import imgui
+import numpy as np
+from PIL import Image
+
+from bgimgui.atlas import PanelAtlas
+from bgimgui.fonts import FontAtlasCache
+from bgimgui.image import release_dummy_texture
+from bgimgui.imgui_wrapper import BGEImguiWrapper
+from bgimgui.loader import ImageLoader
+from bgimgui.manager import PanelManager
+from bgimgui.textures import TextureRegistry
+from bgimgui.widgets import ImageGallery
+
+from .fake_bge import BLEND_DIR, EVENTS, EngineState, GameObject
+
+MAIN_FONT = str(BLEND_DIR / "Orbitron-VariableFont_wght.ttf")
+EXTRA_FONT = str(BLEND_DIR / "Blackout 2 AM.ttf")
+
+FULLSCREEN_FLAGS = (imgui.WindowFlags_.no_decoration | imgui.WindowFlags_.no_saved_settings
+                    | imgui.WindowFlags_.no_move | imgui.WindowFlags_.no_bring_to_front_on_focus)
+
+
+def sweep(frame: int, period: int, margin=0.05):
+    """Mouse position moving across the whole screen, the same path every run."""
+    phase = 2 * math.pi * frame / period
+    return (0.5 + (0.5 - margin) * math.sin(phase),
+            0.5 + (0.5 - margin) * math.sin(phase * 0.77 + 1))
+
+
+def fullscreen_window(name: str):
+    imgui.set_next_window_pos((0, 0))
+    imgui.set_next_window_size(imgui.get_io().display_size)
+    return imgui.begin(name, None, FULLSCREEN_FLAGS)
+
+
+class WindowsGUI(BGEImguiWrapper):
+    """Grid of small windows of common widgets, so frames have many short command lists."""
+
+    def __init__(self, scene, window_count: int, **kwargs) -> None:
+        self.window_count = window_count
+        super().__init__(scene, **kwargs)
+
+    def setup_gui(self):
+        self.frame = 0
+        self.values = [index / self.window_count for index in range(self.window_count)]
+        self.checks = [False] * self.window_count
+        self.texts = [""] * self.window_count
+
+    def draw(self):
+        self.frame += 1
+        flags = imgui.WindowFlags_.no_saved_settings | imgui.WindowFlags_.no_focus_on_appearing
+        columns = max(1, int(self.io.display_size.x // 160))
+        for index in range(self.window_count):
+            column, row = index % columns, index // columns
+            imgui.set_next_window_pos((10 + column * 160, 10 + row * 120), imgui.Cond_.once)
+            imgui.set_next_window_size((150, 110), imgui.Cond_.once)
+
+            imgui.begin(f"Window {index}", None, flags)
+            imgui.text(f"Frame {self.frame}")
+            _, self.values[index] = imgui.slider_float("##value", self.values[index], 0, 1)
+            _, self.checks[index] = imgui.checkbox("Enabled", self.checks[index])
+            imgui.progress_bar(((self.frame + index * 7) % 100) / 100)
+            _, self.texts[index] = imgui.input_text("##text", self.texts[index])
+            imgui.end()
+
+
+class PanelGUI(BGEImguiWrapper):
+    """What a world panel usually shows: status text, buttons and a small plot."""
+
+    def setup_gui(self):
+        self.frame = 0
+        self.clicks = 0
+        self.history = np.zeros(64, dtype=np.float32)
+
+    def draw(self):
+        self.frame += 1
+        self.history[self.frame % len(self.history)] = math.sin(self.frame * 0.1)
+
+        fullscreen_window("Panel")
+        imgui.text(f"{self.backend.panel.name}, frame {self.frame}")
+        if imgui.button("Click me"):
+            self.clicks += 1
+        imgui.same_line()
+        imgui.text(f"{self.clicks} clicks")
+        imgui.plot_lines("##history", self.history, graph_size=(-1, 60))
+        imgui.progress_bar((self.frame % 120) / 120)
+        imgui.end()
+
+
+class GalleryGUI(BGEImguiWrapper):
+    def __init__(self, scene, paths, **kwargs) -> None:
+        self.paths = paths
+        super().__init__(scene, **kwargs)
+
+    def setup_gui(self):
+        self.gallery = ImageGallery(self.paths, cell_size=(96, 96))
+
+    def draw(self):
+        fullscreen_window("Gallery")
+        self.gallery.draw()
+        imgui.end()
+
+
+class FontsGUI(BGEImguiWrapper):
+    """Loads three fonts in one batch, with sizes changing on every load."""
+
+    FONT_SIZES = (14, 16, 18, 20, 24)
+
+    def setup_gui(self):
+        self.fonts = []
+        self.loads = 0
+
+    def load_fonts(self):
+        size = self.FONT_SIZES[self.loads % len(self.FONT_SIZES)]
+        with self.backend.font_batch() as batch:
+            batch.set_main(MAIN_FONT, size)
+            batch.add(EXTRA_FONT, size * 2)
+            batch.add(MAIN_FONT, size * 1.5)
+        self.fonts = batch.fonts
+        self.loads += 1
+
+    def draw(self):
+        fullscreen_window("Fonts")
+        for index, font in enumerate(self.fonts):
+            imgui.push_font(font)
+            imgui.text(f"Font {index}: The quick brown fox jumps over the lazy dog 0123456789")
+            imgui.pop_font()
+        imgui.end()
+
+
+class Scenario:
+    """
+    One scripted run. setup() creates the GUIs, script() sets the input of a
+    frame, update() runs its logic tic and teardown() shuts everything down.
+    """
+
+    NAME = ""
+    DESCRIPTION = ""
+    # Measured frames, unless the command line asks for another count
+    FRAMES = 300
+
+    def __init__(self, engine: EngineState, frames: int | None = None) -> None:
+        self.engine = engine
+        self.scene = engine.scene
+        self.frames = frames or self.FRAMES
+        self.guis: list[BGEImguiWrapper] = []
+
+    def setup(self):
+        raise NotImplementedError
+
+    def add_gui(self, gui: BGEImguiWrapper):
+        # Runs must not depend on, or leave behind, an imgui.ini of window positions
+        gui.io.set_ini_filename("")
+        self.guis.append(gui)
+        return gui
+
+    def script(self, frame: int):
+        pass
+
+    def update(self, frame: int):
+        for gui in self.guis:
+            gui.update_gui()
+
+    def renderers(self):
+        return [gui.backend for gui in self.guis]
+
+    def gpu_timers(self):
+        return [renderer.stats.gpu_timer for renderer in self.renderers()
+                if renderer.stats.gpu_timer is not None]
+
+    def info(self):
+        """Scenario specific counters for the results."""
+        return {}
+
+    def teardown(self):
+        for gui in self.guis:
+            gui.shutdown_gui()
+            imgui.destroy_context(gui.context)
+        self.guis = []
+        release_dummy_texture()
+
+
+class ManyWindows(Scenario):
+    NAME = "many_windows"
+    DESCRIPTION = "One screen UI with many small windows, mouse sweeping over them and clicking"
+
+    WINDOWS = 48
+
+    def setup(self):
+        self.add_gui(WindowsGUI(self.scene, self.WINDOWS))
+
+    def script(self, frame: int):
+        buttons = (EVENTS["LEFTMOUSE"],) if frame % 40 < 2 else ()
+        self.engine.mouse.set(sweep(frame, 240), buttons)
+        if frame % 10 == 5:
+            self.engine.keyboard.set(text="abc"[frame % 3])
+
+
+class ManyPanels(Scenario):
+    NAME = "many_panels"
+    DESCRIPTION = "A grid of world panels ticked by one PanelManager, each with its own FBO"
+
+    COLUMNS = 6
+    ROWS = 4
+    RESOLUTION = (256, 256)
+    USE_ATLAS = False
+
+    def setup(self):
+        self.manager = PanelManager.for_scene(self.scene)
+        self.atlas = None
+        if self.USE_ATLAS:
+            material = self.scene.add_object(GameObject("AtlasMaterial"))
+            self.atlas = PanelAtlas(self.scene, material)
+
+        # Panels span -1..1, laid out in front of the camera
+        spacing = 2.2
+        for index in range(self.COLUMNS * self.ROWS):
+            column, row = index % self.COLUMNS, index // self.COLUMNS
+            position = ((column - (self.COLUMNS - 1) / 2) * spacing,
+                        ((self.ROWS - 1) / 2 - row) * spacing, -10)
+            panel = self.scene.add_object(GameObject(
+                f"Panel.{index:03d}", position, properties={"imgui_panel": index}))
+            self.manager.add(self.add_gui(PanelGUI(
+                self.scene, main=False, panel=panel,
+                resolution=self.RESOLUTION, atlas=self.atlas)))
+
+    def script(self, frame: int):
+        buttons = (EVENTS["LEFTMOUSE"],) if frame % 30 < 2 else ()
+        self.engine.mouse.set(sweep(frame, 300), buttons)
+
+    def update(self, frame: int):
+        self.manager.update()
+
+    def gpu_timers(self):
+        timers = super().gpu_timers()
+        if self.atlas is not None and self.atlas.gpu_timer is not None:
+            timers.append(self.atlas.gpu_timer)
+        return timers
+
+    def info(self):
+        picker = self.guis[0].backend.picker if self.guis else None
+        info = {"panels": len(self.guis)}
+        if picker is not None:
+            info.update(picks=picker.picks, pick_reuses=picker.reuses)
+        return info
+
+    def teardown(self):
+        self.manager.shutdown()
+        super().teardown()
+        if self.atlas is not None:
+            self.atlas.shutdown()
+            self.atlas = None
+
+
+class AtlasPanels(ManyPanels):
+    NAME = "atlas_panels"
+    DESCRIPTION = "The many_panels grid rendered into one PanelAtlas"
+
+    USE_ATLAS = True
+
+
+class ImageGalleryScenario(Scenario):
+    NAME = "image_gallery"
+    DESCRIPTION = "An ImageGallery of generated PNGs, scrolled down and back up while hovering"
+
+    IMAGES = 300
+    IMAGE_SIZE = 256
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp(prefix="bgimgui_gallery_")
+        self.add_gui(GalleryGUI(self.scene, self.make_images()))
+
+    def make_images(self):
+        # Different gradients per image so PNG sizes and decode times are realistic
+        size = self.IMAGE_SIZE
+        ramp = np.linspace(0, 255, size, dtype=np.float32)
+        paths = []
+        for index in range(self.IMAGES):
+            pixels = np.empty((size, size, 3), dtype=np.uint8)
+            pixels[..., 0] = (ramp[None, :] + index * 37) % 256
+            pixels[..., 1] = (ramp[:, None] + index * 11) % 256
+            pixels[..., 2] = (ramp[None, :] * ramp[:, None] / 255 + index * 53) % 256
+            path = f"{self.directory}/image_{index:04d}.png"
+            Image.fromarray(pixels).save(path)
+            paths.append(path)
+        return paths
+
+    def script(self, frame: int):
+        # Scroll down for the first half of the run, back up in the second
+        half = max(1, self.frames // 2)
+        wheel = EVENTS["WHEELDOWNMOUSE"] if (frame // half) % 2 == 0 else EVENTS["WHEELUPMOUSE"]
+        buttons = (wheel,) if frame % 2 == 0 else ()
+        x, y = sweep(frame, 200, margin=0.2)
+        self.engine.mouse.set((x, y), buttons)
+
+    def info(self):
+        return {
+            "loader": ImageLoader.default().info(),
+            "textures": TextureRegistry.default().info(),
+        }
+
+    def teardown(self):
+        for gui in self.guis:
+            gui.gallery.release()
+        super().teardown()
+        # Nothing of this run may stay behind for the next scenario
+        ImageLoader.default().shutdown()
+        ImageLoader._default = None
+        TextureRegistry.default().clear()
+        TextureRegistry._default = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class FontLoading(Scenario):
+    NAME = "font_loading"
+    DESCRIPTION = "Three TTF fonts rasterized and uploaded again every RELOAD_INTERVAL frames"
+
+    RELOAD_INTERVAL = 10
+    CACHED = False
+
+    def setup(self):
+        gui = FontsGUI(self.scene)
+        self.cache_dir = None
+        if self.CACHED:
+            self.cache_dir = tempfile.mkdtemp(prefix="bgimgui_fonts_")
+            gui.backend.font_cache = FontAtlasCache(self.cache_dir)
+        self.add_gui(gui)
+
+    def update(self, frame: int):
+        if frame % self.RELOAD_INTERVAL == 0:
+            self.guis[0].load_fonts()
+        super().update(frame)
+
+    def info(self):
+        gui = self.guis[0]
+        backend = gui.backend
+        info = {"font_builds": backend.font_builds,
+                "last_font_build_ms": backend.font_build_time * 1000}
+        cache = backend.font_cache
+        if self.CACHED:
+            info.update(cache_hits=cache.hits, cache_misses=cache.misses)
+            # Every size was built once, the cache has to serve the rest
+            if gui.loads > len(gui.FONT_SIZES):
+                assert cache.hits > 0, "Cached font loads never hit the cache"
+        return info
+
+    def teardown(self):
+        super().teardown()
+        if self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class CachedFontLoading(FontLoading):
+    NAME = "font_loading_cached"
+    DESCRIPTION = "font_loading with a FontAtlasCache, sizes repeat so most builds are cache hits"
+
+    CACHED = True
+
+
+SCENARIOS = {scenario.NAME: scenario for scenario in (
+    ManyWindows, ManyPanels, AtlasPanels, ImageGalleryScenario, FontLoading, CachedFontLoading)}
@@ -29,6 +29,15 @@ if src[0] != "#BGE_PATCHED_2\n":
 # Now that the patch is complete, resume normal imports
 if True:
     from .imgui_wrapper import BGEImguiWrapper
+    from .manager import PanelManager
     from .renderer import BGEImguiRenderer
+    from .visibility import VisibilityPolicy
+    from .picking import PanelPicker
+    from .atlas import PanelAtlas
+    from .fonts import SharedFontAtlas, FontAtlasCache
+    from .loader import ImageLoader
+    from .textures import TextureRegistry
+    from .resources import GLResourceLeak, GLResourceTracker
+    from .profiler import Profiler, profiler
     from .image import *
     from .gui_style import *
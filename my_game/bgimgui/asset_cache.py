@@ -0,0 +1,196 @@
+from __future__ import annotations
+import hashlib
+import os
+import pathlib
+import struct
+import threading
+
+from PIL import Image, ImageSequence, UnidentifiedImageError
+import numpy as np
+
+# Kept free of bge and OpenGL imports, so bake_assets.py can use it outside the engine
+
+
+def get_rgba_pixels(image: Image.Image):
+    if image.mode == "RGB":
+        return image.tobytes("raw", "RGBX")
+    else:
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        return image.tobytes("raw", "RGBA")
+
+
+def fit_size(size: tuple[int, int], max_size: int | None):
+    """Size of an image scaled down (never up) to fit in max_size x max_size, keeping its aspect."""
+    width, height = size
+    if max_size is None or (width <= max_size and height <= max_size):
+        return width, height
+    scale = max_size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def decode_frames(image: Image.Image, max_size: int | None = None):
+    """Yields (RGBA bytes, duration in ms) per frame, downscaled to fit max_size if given."""
+    size = fit_size(image.size, max_size)
+    if size != image.size:
+        # Lets JPEG decode at a reduced scale directly
+        image.draft("RGB", size)
+    for frame in ImageSequence.Iterator(image):
+        if frame.size != size:
+            frame = frame.convert("RGBA").resize(size, Image.Resampling.BILINEAR)
+        if (duration := frame.info.get("duration", 0)) < 1:
+            duration = 100
+        yield get_rgba_pixels(frame), duration
+
+
+class CachedImage:
+    """Frames of a baked image, memory-mapped straight from the cache file."""
+
+    def __init__(self, path: pathlib.Path, width: int, height: int,
+                 durations: np.ndarray, frames: np.ndarray) -> None:
+        self.path = path
+        self.width = width
+        self.height = height
+        # Frame durations in milliseconds, as stored in the source file
+        self.durations = durations
+        # (frame count, height, width, 4) RGBA, top row first
+        self.frames = frames
+
+    @property
+    def frame_count(self):
+        return len(self.frames)
+
+
+class DecodedImageCache:
+    """
+    Directory of decoded, GPU-ready RGBA images. Entries are keyed by a hash
+    of the source file contents, so they stay valid when the game is moved
+    or copied, and are baked ahead of time with bake_assets.py or on first load.
+
+    File layout: header (magic, version, width, height, frame count), the
+    frame durations as float32 milliseconds, then the RGBA frames starting
+    at a PIXEL_ALIGNMENT aligned offset.
+    """
+
+    MAGIC = b"BGIC"
+    FORMAT_VERSION = 1
+    HEADER = struct.Struct("<4sHHIII")
+    PIXEL_ALIGNMENT = 64
+    SUFFIX = ".rgba"
+
+    def __init__(self, directory: str | pathlib.Path, bake_on_miss=True) -> None:
+        self.directory = pathlib.Path(directory)
+        # Decode and store images missing from the cache when they're loaded
+        self.bake_on_miss = bake_on_miss
+        self.hits = 0
+        self.misses = 0
+        # (path, mtime, size) -> key, so unchanged files are only hashed once
+        self._keys: dict[tuple, str] = {}
+
+    def key(self, path: str | pathlib.Path, max_size: int | None = None):
+        path = pathlib.Path(path)
+        stat = path.stat()
+        stat_key = (str(path), stat.st_mtime_ns, stat.st_size)
+        key = self._keys.get(stat_key)
+        if key is None:
+            digest = hashlib.sha1()
+            digest.update(b"%d|" % self.FORMAT_VERSION)
+            with open(path, "rb") as source:
+                for block in iter(lambda: source.read(1 << 20), b""):
+                    digest.update(block)
+            key = self._keys[stat_key] = digest.hexdigest()
+        if max_size is not None:
+            # Thumbnails are stored next to the full size entry
+            key = f"{key}-{max_size}"
+        return key
+
+    def entry_path(self, key: str):
+        return self.directory / key[:2] / f"{key}{self.SUFFIX}"
+
+    def _pixel_offset(self, frame_count: int):
+        offset = self.HEADER.size + 4 * frame_count
+        alignment = self.PIXEL_ALIGNMENT
+        return (offset + alignment - 1) // alignment * alignment
+
+    def lookup(self, path: str | pathlib.Path, max_size: int | None = None):
+        """Memory-mapped cached image, or None if it isn't baked (or the entry is unusable)."""
+        try:
+            entry = self.entry_path(self.key(path, max_size))
+            with open(entry, "rb") as cache_file:
+                header = cache_file.read(self.HEADER.size)
+                if len(header) != self.HEADER.size:
+                    return None
+                magic, version, channels, width, height, frame_count = self.HEADER.unpack(
+                    header)
+                if magic != self.MAGIC or version != self.FORMAT_VERSION or channels != 4:
+                    return None
+                durations = np.frombuffer(
+                    cache_file.read(4 * frame_count), dtype="<f4")
+            offset = self._pixel_offset(frame_count)
+            if entry.stat().st_size != offset + frame_count * height * width * 4:
+                # Half written or truncated
+                return None
+            frames = np.memmap(entry, dtype=np.uint8, mode="r", offset=offset,
+                               shape=(frame_count, height, width, 4))
+        except (OSError, ValueError):
+            return None
+        return CachedImage(entry, width, height, durations, frames)
+
+    def bake(self, path: str | pathlib.Path, force=False, max_size: int | None = None):
+        """Decode path into the cache, unless it's already there. Returns the entry path."""
+        path = pathlib.Path(path)
+        entry = self.entry_path(self.key(path, max_size))
+        if entry.exists() and not force:
+            return entry
+
+        with Image.open(path) as image:
+            width, height = fit_size(image.size, max_size)
+            frame_count = getattr(image, "n_frames", 1)
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # Unique per process and thread, so parallel bakers never share a temp file
+            temp_path = entry.with_name(
+                f"{entry.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+            try:
+                self._write_entry(temp_path, image, width,
+                                  height, frame_count, max_size)
+                os.replace(temp_path, entry)
+            except BaseException:
+                temp_path.unlink(missing_ok=True)
+                raise
+        return entry
+
+    def _write_entry(self, temp_path: pathlib.Path, image: Image.Image,
+                     width: int, height: int, frame_count: int, max_size: int | None):
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(self.HEADER.pack(
+                self.MAGIC, self.FORMAT_VERSION, 4, width, height, frame_count))
+            # Durations are only known after decoding, reserve their space
+            cache_file.seek(self._pixel_offset(frame_count))
+
+            durations = []
+            for pixels, duration in decode_frames(image, max_size):
+                cache_file.write(pixels)
+                durations.append(duration)
+
+            if len(durations) != frame_count:
+                raise ValueError(
+                    f"{image.filename} has {len(durations)} frames, expected {frame_count}")
+            cache_file.seek(self.HEADER.size)
+            cache_file.write(np.asarray(durations, dtype="<f4").tobytes())
+
+    def load(self, path: str | pathlib.Path, max_size: int | None = None):
+        """Cached image for path, baking it first if needed and allowed. None if unavailable."""
+        cached = self.lookup(path, max_size)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        if not self.bake_on_miss:
+            return None
+        try:
+            self.bake(path, force=True, max_size=max_size)
+        except (OSError, ValueError, UnidentifiedImageError) as error:
+            print(f"Could not bake {path} into {self.directory}: {error}")
+            return None
+        return self.lookup(path, max_size)
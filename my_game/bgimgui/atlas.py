@@ -0,0 +1,254 @@
+from __future__ import annotations
+from bge.types import KX_Scene
+import bge
+
+from OpenGL import GL as gl
+
+from . import resources
+from .profiler import profiler
+from .renderer import BGEPipelineRenderer, GLStateTracker, GPUTimer
+
+
+class PanelAtlas:
+    """
+    Renders many world panels into sub-rectangles of one shared texture,
+    with a single FBO and a single GL state setup per frame.
+
+    All atlas panels must share one material (its texture gets replaced by the
+    atlas), and each panel needs its own mesh since its UVs are remapped to
+    its region of the atlas.
+    """
+
+    # Pixels left empty on every side of each region so filtering doesn't bleed
+    PADDING = 2
+
+    def __init__(self, scene: KX_Scene, material_object: bge.types.KX_GameObject,
+                 size: tuple[int, int] = (2048, 2048)) -> None:
+        self.scene = scene
+        self.size = size
+
+        # Shares the state mode with the renderers
+        self.gl_state: GLStateTracker = GLStateTracker(BGEPipelineRenderer.GL_STATE_MODE)
+
+        # Panel renderer -> (x, y, width, height), in texture pixels from the bottom left
+        self.regions: dict[BGEPipelineRenderer, tuple[int, int, int, int]] = {}
+        # Original mesh UVs of every panel, restored when it leaves the atlas
+        self._original_uvs: dict[BGEPipelineRenderer, list] = {}
+
+        # Shelf packer state for adding panels without moving the others
+        self._shelf_x = 0
+        self._shelf_y = 0
+        self._shelf_height = 0
+
+        self.repacks = 0
+        # Removals leave holes, compacted once before the next frame
+        self._repack_pending = False
+        self._clear_all = True
+
+        # Times the whole atlas pass, the panels in it have no timer of their own
+        self.gpu_timing = BGEPipelineRenderer.GPU_TIMING
+        self.gpu_timer: GPUTimer | None = None
+
+        texture = bge.texture.Texture(material_object, 0, 0)
+        texture.source = bge.texture.ImageBuff(size[0], size[1])
+        self.fbo_texture = texture
+        self.bind_id = texture.bindId
+        self.fbo_texture.refresh(False)
+
+        self._create_framebuffer()
+        self.scene.post_draw.append(self.render_call)
+
+    def _create_framebuffer(self):
+        last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+        last_fbo = gl.glGetIntegerv(gl.GL_FRAMEBUFFER_BINDING)
+
+        width, height = self.size
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.bind_id)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, width,
+                        height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+
+        self.frame_buffer = resources.gen_framebuffer(self, "panel atlas")
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.frame_buffer)
+        gl.glFramebufferTexture2D(
+            gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_TEXTURE_2D, self.bind_id, 0)
+        gl.glDrawBuffer(gl.GL_COLOR_ATTACHMENT0)
+
+        gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, last_fbo)
+
+    def add(self, renderer: BGEPipelineRenderer):
+        width, height = renderer.tex_resolution
+        padding = 2 * self.PADDING
+        if width + padding > self.size[0] or height + padding > self.size[1]:
+            raise ValueError(
+                f"Panel resolution {renderer.tex_resolution} doesn't fit in atlas of size {self.size}")
+
+        uvs = self._read_uvs(renderer.panel)
+        region = self._place(width, height)
+        if region is None:
+            # Out of room at the end of the shelves, pack everything again.
+            # Raises before anything changes if the panel doesn't fit.
+            regions = self._pack([*self.regions, renderer])
+            self._original_uvs[renderer] = uvs
+            self._set_regions(regions)
+        else:
+            self._original_uvs[renderer] = uvs
+            self.regions[renderer] = region
+            self._apply_uvs(renderer)
+
+    def remove(self, renderer: BGEPipelineRenderer):
+        if renderer not in self.regions:
+            return
+        del self.regions[renderer]
+        self._write_uvs(renderer.panel, self._original_uvs.pop(renderer))
+        self._repack_pending = True
+
+    def repack(self):
+        """Packs every panel again, tallest first. Moves regions, so all panels redraw."""
+        self._set_regions(self._pack(self.regions))
+
+    def _pack(self, renderers):
+        shelves = (self._shelf_x, self._shelf_y, self._shelf_height)
+        self._shelf_x = self._shelf_y = self._shelf_height = 0
+
+        regions = {}
+        for renderer in sorted(renderers, key=lambda renderer: (
+                -renderer.tex_resolution[1], -renderer.tex_resolution[0])):
+            region = self._place(*renderer.tex_resolution)
+            if region is None:
+                self._shelf_x, self._shelf_y, self._shelf_height = shelves
+                raise ValueError(
+                    f"Panels no longer fit in atlas of size {self.size}")
+            regions[renderer] = region
+        return regions
+
+    def _set_regions(self, regions):
+        self.regions = regions
+        for renderer in regions:
+            self._apply_uvs(renderer)
+            renderer.invalidate()
+
+        self.repacks += 1
+        self._repack_pending = False
+        self._clear_all = True
+
+    def _place(self, width: int, height: int):
+        padding = self.PADDING
+        atlas_width, atlas_height = self.size
+
+        if self._shelf_x + width + 2 * padding > atlas_width:
+            # Start a new shelf above the current one
+            self._shelf_y += self._shelf_height
+            self._shelf_x = 0
+            self._shelf_height = 0
+
+        if self._shelf_y + height + 2 * padding > atlas_height:
+            return None
+
+        region = (self._shelf_x + padding, self._shelf_y + padding, width, height)
+        self._shelf_x += width + 2 * padding
+        self._shelf_height = max(self._shelf_height, height + 2 * padding)
+        return region
+
+    def _read_uvs(self, panel: bge.types.KX_GameObject):
+        uvs = []
+        for mesh_index, mesh in enumerate(panel.meshes):
+            for material_id in range(len(mesh.materials)):
+                for index in range(mesh.getVertexArrayLength(material_id)):
+                    u, v = mesh.getVertex(material_id, index).UV
+                    uvs.append((mesh_index, material_id, index, u, v))
+        return uvs
+
+    def _write_uvs(self, panel: bge.types.KX_GameObject, uvs):
+        meshes = panel.meshes
+        for mesh_index, material_id, index, u, v in uvs:
+            meshes[mesh_index].getVertex(material_id, index).UV = [u, v]
+
+    def _apply_uvs(self, renderer: BGEPipelineRenderer):
+        x, y, width, height = self.regions[renderer]
+        atlas_width, atlas_height = self.size
+
+        remapped = [
+            (mesh_index, material_id, index,
+             (x + u * width) / atlas_width,
+             (y + v * height) / atlas_height)
+            for mesh_index, material_id, index, u, v in self._original_uvs[renderer]
+        ]
+        self._write_uvs(renderer.panel, remapped)
+
+    def get_uv_rect(self, renderer: BGEPipelineRenderer):
+        """UV offset and scale of a panel's region, for materials that remap UVs themselves."""
+        x, y, width, height = self.regions[renderer]
+        atlas_width, atlas_height = self.size
+        return (x / atlas_width, y / atlas_height), (width / atlas_width, height / atlas_height)
+
+    def render_call(self):
+        with profiler.zone("render_call", "PanelAtlas"):
+            self._render_frame()
+
+    def _render_frame(self):
+        if self._repack_pending:
+            try:
+                self.repack()
+            except ValueError:
+                # Tallest first packs differently than panels added one by
+                # one, keep the layout that fits, holes and all
+                self._repack_pending = False
+
+        frames = []
+        for renderer, region in self.regions.items():
+            frame = renderer.prepare_frame()
+            if frame is not None:
+                frames.append((renderer, region, frame))
+
+        if frames or self._clear_all:
+            state = self.gl_state
+            state.begin()
+            timed = False
+            if self.gpu_timing:
+                if self.gpu_timer is None:
+                    self.gpu_timer = GPUTimer(self)
+                timed = self.gpu_timer.begin()
+
+            state.disable("scissor_test")
+            state.bind_framebuffer(self.frame_buffer)
+            gl.glClearColor(0.0, 0.0, 0.0, 0.0)
+
+            if self._clear_all:
+                gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+                self._clear_all = False
+
+            if frames:
+                frames[0][0].setup_render_state(state)
+
+            for renderer, (x, y, _, _), (draw_data, fb_width, fb_height) in frames:
+                # Only clear this panel's region
+                state.scissor(x, y, fb_width, fb_height)
+                gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+
+                renderer.draw_pass(state, draw_data, fb_width, fb_height, x, y)
+
+            if timed:
+                self.gpu_timer.end()
+            state.end()
+
+        for renderer in self.regions:
+            renderer.frame_done()
+
+    def shutdown(self):
+        for renderer in list(self.regions):
+            self._write_uvs(renderer.panel, self._original_uvs.pop(renderer))
+        self.regions.clear()
+
+        if self.render_call in self.scene.post_draw:
+            self.scene.post_draw.remove(self.render_call)
+        resources.delete_framebuffer(self.frame_buffer)
+        self.frame_buffer = 0
+        if self.gpu_timer is not None:
+            self.gpu_timer.release()
+            self.gpu_timer = None
+        resources.tracker.check_leaks(self)
@@ -0,0 +1,374 @@
+from __future__ import annotations
+import ctypes
+import hashlib
+import json
+import os
+import pathlib
+
+from OpenGL import GL as gl
+from imgui_bundle import imgui
+import numpy as np
+
+from . import resources
+
+
+def upload_font_texture(fonts: imgui.ImFontAtlas, texture: int | None = None,
+                        pixels: np.ndarray | None = None, owner=None):
+    """
+    Builds the font atlas and uploads it, replacing texture if given. Returns the new texture.
+    Pass pixels to upload an already baked atlas (e.g. from FontAtlasCache) instead of building.
+    """
+    # save texture state
+    last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+
+    if pixels is None:
+        # width, height, pixels = self.io.fonts.get_tex_data_as_rgba32()
+        font_matrix: np.ndarray = fonts.get_tex_data_as_rgba32()
+        pixels = font_matrix.data
+    else:
+        font_matrix = pixels
+    width = font_matrix.shape[1]
+    height = font_matrix.shape[0]
+
+    if texture is not None:
+        resources.delete_textures([texture])
+
+    texture = resources.gen_texture(owner, "font atlas")
+
+    gl.glBindTexture(gl.GL_TEXTURE_2D, texture)
+    gl.glTexParameteri(
+        gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+    gl.glTexParameteri(
+        gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+    gl.glTexImage2D(
+        gl.GL_TEXTURE_2D,
+        0,
+        gl.GL_RGBA,
+        width,
+        height,
+        0,
+        gl.GL_RGBA,
+        gl.GL_UNSIGNED_BYTE,
+        pixels,
+    )
+    resources.set_size(resources.TEXTURE, texture, width * height * 4)
+
+    fonts.tex_id = texture
+    gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
+    fonts.clear_tex_data()
+    return texture
+
+
+# Raw layout of ImFontGlyph: Colored:1, Visible:1, Codepoint:30 bitfield, then floats
+GLYPH_DTYPE = np.dtype([
+    ("bits", "<u4"), ("advance_x", "<f4"),
+    ("x0", "<f4"), ("y0", "<f4"), ("x1", "<f4"), ("y1", "<f4"),
+    ("u0", "<f4"), ("v0", "<f4"), ("u1", "<f4"), ("v1", "<f4"),
+])
+
+# Font config fields that change how glyphs are rasterized
+FONT_CONFIG_FIELDS = (
+    "size_pixels", "oversample_h", "oversample_v", "pixel_snap_h",
+    "glyph_extra_spacing", "glyph_offset", "glyph_min_advance_x",
+    "glyph_max_advance_x", "rasterizer_multiply", "font_no",
+    "font_builder_flags", "ellipsis_char", "merge_mode",
+)
+
+
+def font_source(path: str, size_pixels: float, *args, **kwargs):
+    """Hashable description of a font added with add_font_from_file_ttf(path, size_pixels, *args, **kwargs)."""
+    def normalize(value):
+        if isinstance(value, imgui.ImFontConfig):
+            return tuple((field, normalize(getattr(value, field)))
+                         for field in FONT_CONFIG_FIELDS)
+        if isinstance(value, (imgui.ImVec2, list, tuple)):
+            return tuple(normalize(item) for item in value)
+        return value
+
+    return (
+        str(path),
+        float(size_pixels),
+        tuple(normalize(arg) for arg in args),
+        tuple(sorted((key, normalize(value)) for key, value in kwargs.items())),
+    )
+
+
+def _is_merge_source(source):
+    # Merged fonts don't map one-to-one to ImFonts, those atlases aren't cached
+    if isinstance(source, tuple):
+        return source == ("merge_mode", True) or any(
+            _is_merge_source(item) for item in source)
+    return False
+
+
+class FontAtlasCache:
+    """
+    On-disk cache of baked font atlases: RGBA pixels plus glyph metrics, keyed
+    by the font file hashes, sizes, glyph ranges and scaling factor.
+    Cached atlases are memory-mapped and restored without rasterizing anything.
+
+    Atlases built through the cache use ImFontAtlasFlags_.no_baked_lines, since
+    the baked line data can't be restored.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory: str | pathlib.Path) -> None:
+        self.directory = pathlib.Path(directory)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        # (path, mtime, size) -> sha1 of the file, so unchanged files aren't hashed twice
+        self._file_hashes: dict[tuple, str] = {}
+
+    def _file_hash(self, path: str):
+        stat = os.stat(path)
+        stat_key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._file_hashes.get(stat_key)
+        if digest is None:
+            with open(path, "rb") as font_file:
+                digest = hashlib.sha1(font_file.read()).hexdigest()
+            self._file_hashes[stat_key] = digest
+        return digest
+
+    def key(self, sources: list, scaling_factor: float = 1):
+        digest = hashlib.sha1()
+        digest.update(repr((self.FORMAT_VERSION, imgui.get_version(),
+                            float(scaling_factor))).encode())
+        for source in sources:
+            digest.update(self._file_hash(source[0]).encode())
+            digest.update(repr(source[1:]).encode())
+        return digest.hexdigest()
+
+    def _paths(self, key: str):
+        return (self.directory / f"{key}.json",
+                self.directory / f"{key}.pixels.npy",
+                self.directory / f"{key}.glyphs.npy")
+
+    def build(self, fonts: imgui.ImFontAtlas, sources: list, font_objects: list,
+              scaling_factor: float = 1):
+        """
+        Restores the atlas from the cache, or builds and caches it.
+        fonts must contain exactly the fonts in font_objects, added from sources
+        and not built yet. Returns the RGBA pixels to upload, or None if this
+        atlas can't be cached (then build it the normal way).
+        """
+        if (not sources or len(sources) != len(font_objects)
+                or fonts.fonts.size() != len(font_objects)
+                or any(_is_merge_source(source) for source in sources)):
+            return None
+
+        fonts.flags |= imgui.ImFontAtlasFlags_.no_baked_lines
+
+        try:
+            key = self.key(sources, scaling_factor)
+        except OSError:
+            return None
+
+        pixels = self._restore(key, fonts, font_objects)
+        if pixels is not None:
+            self.hits += 1
+            return pixels
+
+        self.misses += 1
+        pixels = fonts.get_tex_data_as_rgba32()
+        self._save(key, fonts, font_objects, pixels, sources)
+        return pixels
+
+    def _restore(self, key: str, fonts: imgui.ImFontAtlas, font_objects: list):
+        meta_path, pixels_path, glyphs_path = self._paths(key)
+        if not meta_path.exists():
+            return None
+
+        try:
+            meta = json.loads(meta_path.read_text())
+            pixels = np.load(pixels_path, mmap_mode="r")
+            glyphs = np.load(glyphs_path, mmap_mode="r")
+        except (OSError, ValueError):
+            self.stale += 1
+            return None
+
+        font_metas = meta.get("fonts", [])
+        if (meta.get("version") != self.FORMAT_VERSION
+                or meta.get("imgui") != imgui.get_version()
+                or len(font_metas) != len(font_objects)
+                or pixels.shape != (meta["tex_height"], meta["tex_width"], 4)
+                or glyphs.dtype != GLYPH_DTYPE
+                or len(glyphs) != sum(font_meta["glyphs"] for font_meta in font_metas)):
+            # Written by another version or half written, rebuild it
+            self.stale += 1
+            return None
+
+        start = 0
+        for font, font_meta in zip(font_objects, font_metas):
+            font.clear_output_data()
+            font.font_size = font_meta["font_size"]
+            font.ascent = font_meta["ascent"]
+            font.descent = font_meta["descent"]
+            font.container_atlas = fonts
+
+            end = start + font_meta["glyphs"]
+            for glyph in glyphs[start:end].tolist():
+                bits, advance_x, x0, y0, x1, y1, u0, v0, u1, v1 = glyph
+                # Values are already baked, so no config adjustments
+                font.add_glyph(None, bits >> 2, x0, y0, x1,
+                               y1, u0, v0, u1, v1, advance_x)
+            start = end
+            font.build_lookup_table()
+
+        fonts.tex_width = meta["tex_width"]
+        fonts.tex_height = meta["tex_height"]
+        fonts.tex_uv_scale = imgui.ImVec2(*meta["tex_uv_scale"])
+        fonts.tex_uv_white_pixel = imgui.ImVec2(*meta["tex_uv_white_pixel"])
+        fonts.tex_ready = True
+        return pixels
+
+    def _save(self, key: str, fonts: imgui.ImFontAtlas, font_objects: list,
+              pixels: np.ndarray, sources: list):
+        meta_path, pixels_path, glyphs_path = self._paths(key)
+
+        font_metas = []
+        glyph_arrays = []
+        for font in font_objects:
+            vector = font.glyphs
+            count = vector.size()
+            raw = (GLYPH_DTYPE.itemsize * count) * b"\0"
+            if count:
+                raw = bytes((ctypes.c_char * (GLYPH_DTYPE.itemsize * count)).from_address(
+                    vector.data_address()))
+            glyph_arrays.append(np.frombuffer(raw, dtype=GLYPH_DTYPE))
+            font_metas.append({
+                "font_size": font.font_size,
+                "ascent": font.ascent,
+                "descent": font.descent,
+                "glyphs": count,
+            })
+
+        meta = {
+            "version": self.FORMAT_VERSION,
+            "imgui": imgui.get_version(),
+            "sources": [source[0] for source in sources],
+            "hashes": [self._file_hash(source[0]) for source in sources],
+            "tex_width": fonts.tex_width,
+            "tex_height": fonts.tex_height,
+            "tex_uv_scale": list(fonts.tex_uv_scale),
+            "tex_uv_white_pixel": list(fonts.tex_uv_white_pixel),
+            "fonts": font_metas,
+        }
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # The metadata goes last, an entry without it is never read
+            self._write_npy(pixels_path, np.ascontiguousarray(pixels))
+            self._write_npy(glyphs_path, np.concatenate(glyph_arrays))
+            temp_path = meta_path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(meta))
+            os.replace(temp_path, meta_path)
+        except OSError as error:
+            print(f"Could not save font atlas cache to {self.directory}: {error}")
+            return
+
+        self._prune(key, meta["sources"], meta["hashes"])
+
+    def _prune(self, key: str, sources: list, hashes: list):
+        # Drop bakes of older versions of the same font files, other sizes
+        # and glyph ranges of the current files stay cached
+        for meta_path in self.directory.glob("*.json"):
+            old_key = meta_path.name[:-len(".json")]
+            if old_key == key:
+                continue
+            try:
+                old_meta = json.loads(meta_path.read_text())
+                if old_meta.get("sources") != sources or old_meta.get("hashes") == hashes:
+                    continue
+                for path in self._paths(old_key):
+                    path.unlink(missing_ok=True)
+            except (OSError, ValueError):
+                continue
+
+    def _write_npy(self, path: pathlib.Path, array: np.ndarray):
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "wb") as array_file:
+            np.save(array_file, array)
+        os.replace(temp_path, path)
+
+
+class SharedFontAtlas:
+    """
+    One ImFontAtlas, and one GL texture of it, shared by several imgui contexts.
+    Pass it to BGEImguiWrapper (font_atlas=...) so panels don't each rasterize
+    and upload their own copy of the same fonts.
+    """
+
+    _default: SharedFontAtlas | None = None
+
+    def __init__(self, cache_dir: str | pathlib.Path | None = None) -> None:
+        self.atlas = imgui.ImFontAtlas()
+        self.texture_id: int | None = None
+        self.fonts: dict[str, imgui.ImFont] = {}
+        # Baked atlas cache, see FontAtlasCache
+        self.cache = FontAtlasCache(cache_dir) if cache_dir is not None else None
+        # Every font in the atlas, in the order added, and where it came from
+        self._sources = []
+        self._font_objects: list[imgui.ImFont] = []
+        self.users = 0
+        self.uploads = 0
+        self._dirty = True
+
+    @classmethod
+    def default(cls):
+        """Process-wide atlas, used by wrappers when SHARE_FONT_ATLAS is set."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def add_font(self, name: str | None, path: str, font_size_in_pixels: float, *args, **kwargs):
+        """
+        Adds a font every context can use, pick it per panel with imgui.push_font,
+        io.font_default or BGEImguiRenderer.select_main_font(name).
+        The atlas is never cleared, a font already added from the same file,
+        size and config is returned instead of being added again.
+        """
+        source = font_source(path, font_size_in_pixels, *args, **kwargs)
+        if source in self._sources:
+            font = self._font_objects[self._sources.index(source)]
+        else:
+            font = self.atlas.add_font_from_file_ttf(
+                path, font_size_in_pixels, *args, **kwargs)
+            self._sources.append(source)
+            self._font_objects.append(font)
+            self._dirty = True
+        if name is not None:
+            self.fonts[name] = font
+        return font
+
+    def get_font(self, name: str):
+        return self.fonts[name]
+
+    def mark_dirty(self):
+        # Fonts were changed directly through the atlas, upload again when next used
+        self._dirty = True
+
+    def texture(self):
+        """GL texture of the atlas, only built and uploaded again if fonts changed."""
+        if self._dirty or self.texture_id is None:
+            pixels = None
+            if self.cache is not None:
+                pixels = self.cache.build(
+                    self.atlas, self._sources, self._font_objects)
+            self.texture_id = upload_font_texture(
+                self.atlas, self.texture_id, pixels, self)
+            self.uploads += 1
+            self._dirty = False
+        return self.texture_id
+
+    def acquire(self):
+        self.users += 1
+
+    def release(self):
+        self.users -= 1
+        if self.users <= 0 and self.texture_id is not None:
+            resources.delete_textures([self.texture_id])
+            self.texture_id = None
+            self.atlas.tex_id = 0
+            self._dirty = True
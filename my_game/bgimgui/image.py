@@ -1,158 +1,161 @@
-from PIL import Image, ImageSequence, UnidentifiedImageError
 from OpenGL import GL as gl
+import ctypes
 import pathlib
 from imgui_bundle import imgui
+import numpy as np
+
+from . import resources
+from .renderer import touch_texture
+from .loader import ImageLoader
+from .textures import TextureRegistry, get_rgba_pixels
 
 _dummy_texture_id = None
 
 
 def dummy_texture_id():
     global _dummy_texture_id
-    _dummy_texture_id = None
     if _dummy_texture_id is None:
-        _dummy_texture_id = gl.glGenTextures(1)
+        last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+        _dummy_texture_id = resources.gen_texture("dummy texture")
         gl.glBindTexture(gl.GL_TEXTURE_2D, _dummy_texture_id)
-        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, 0, 0, 0,
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, 1, 1, 0,
                         gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, b"\x00\x00\x00\xff")
+        resources.set_size(resources.TEXTURE, _dummy_texture_id, 4)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
     return _dummy_texture_id
 
 
-def get_rgba_pixels(image: Image.Image):
-    if image.mode == "RGB":
-        return image.tobytes("raw", "RGBX")
-    else:
-        if image.mode != "RGBA":
-            image = image.convert("RGBA")
-        return image.tobytes("raw", "RGBA")
+def release_dummy_texture():
+    global _dummy_texture_id
+    if _dummy_texture_id is not None:
+        resources.delete_textures([_dummy_texture_id])
+        _dummy_texture_id = None
 
 
 class ImageHelper:
-    def __init__(self, path: str | pathlib.Path, glob=""):
-        self.width = 1
-        self.height = 1
-        self.frame = -1
-        self.glob = glob
-        self.elapsed = 0.0
-        self.loaded = False
-        self.loading = False
-        self.applied = False
-        self.missing = False
-        self.invalid = False
-        self.prev_time = 0.0
-        self.animated = False
-        self.frames: list[bytes] = []
-        self.durations: list[float] = []
-        self.texture_ids: list[int] = []
-        self.resolved_path: pathlib.Path = None
+    # Decode on the ImageLoader threads instead of stalling the frame the image is first shown in
+    ASYNC_LOADING = True
+
+    def __init__(self, path: str | pathlib.Path, glob="", loader: ImageLoader | None = None,
+                 registry: TextureRegistry | None = None, linear=True,
+                 max_size: int | None = None):
+        self.frame = 0
+        self.loader = loader
+        # Pixels and GL textures are shared with every helper showing the same file
+        self.registry = registry or TextureRegistry.default()
+        self.texture = self.registry.acquire(path, glob, linear, max_size)
         self.path: pathlib.Path = pathlib.Path(path)
-        self.resolve()
+        self.glob = glob
+
+    @property
+    def width(self):
+        return self.texture.width
+
+    @property
+    def height(self):
+        return self.texture.height
+
+    @property
+    def loaded(self):
+        return self.texture.loaded
+
+    @property
+    def applied(self):
+        return self.texture.applied
+
+    @property
+    def missing(self):
+        return self.texture.missing
+
+    @property
+    def invalid(self):
+        return self.texture.invalid
+
+    @property
+    def animated(self):
+        return self.texture.animated
+
+    @property
+    def resolved_path(self):
+        return self.texture.resolved_path
 
     def resolve(self):
-        self.resolved_path = self.path
-        if self.glob:
-            paths = list(self.resolved_path.glob(self.glob))
-            if not paths:
-                self.missing = True
-                return
-            # If you want you can setup preferred extensions like this:
-            # paths.sort(key=lambda path: path.suffix != ".gif")
-            # This will prefer .gif files!
-            self.resolved_path = paths[0]
-        self.missing = not self.resolved_path.is_file()
+        self.texture.resolve()
 
     def reload(self):
-        self.loaded = False
-        self.loading = True
-        self.applied = False
-        self.resolve()
-
-        self.frame = -1
-        self.elapsed = 0.0
-        self.frames.clear()
-        self.invalid = False
-        self.animated = False
-        self.durations.clear()
-        self.width, self.height = (1, 1)
-
-        if self.missing:
-            self.loaded = True
-            self.loading = False
-            return
+        self.frame = 0
+        self.texture.reload()
 
-        try:
-            image = Image.open(self.resolved_path)
-        except UnidentifiedImageError:
-            self.invalid = True
-            self.loaded = True
-            self.loading = False
-            return
+    def apply(self):
+        self.texture.apply()
 
-        self.width, self.height = image.size
-        for frame in ImageSequence.Iterator(image):
-            self.frames.append(get_rgba_pixels(frame))
-            if (duration := frame.info.get("duration", 0)) < 1:
-                duration = 100
-            self.durations.append(duration / 1250)
-            # Technically this should be / 1000 (millis to seconds) but I found that 1250 works better...
-        self.animated = len(self.durations) > 1
+    def release(self):
+        """Stop using the shared texture, it stays cached until the registry needs the memory."""
+        if self.texture is not None:
+            self.registry.release(self.texture)
+            self.texture = None
 
-        image.close()
-        self.loaded = True
-        self.loading = False
+    def get_loader(self):
+        return self.loader or ImageLoader.default()
 
-    def apply(self):
-        if self.texture_ids:
-            gl.glDeleteTextures([self.texture_ids])
-            self.texture_ids.clear()
-        texture_gen = gl.glGenTextures(len(self.frames))
-        self.texture_ids.extend([texture_gen] if len(
-            self.frames) == 1 else texture_gen)
-        for frame, texture_id in zip(self.frames, self.texture_ids):
-            gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_BORDER)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_BORDER)
-            gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, self.width,
-                            self.height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, frame)
-        self.frames.clear()
-        self.applied = True
+    def prefetch(self):
+        """Start loading in the background before the image is shown, after visible images."""
+        if self.ASYNC_LOADING and not self.texture.loaded:
+            self.get_loader().prefetch(self.texture)
+
+    @property
+    def sheet_texture_id(self):
+        """GL texture holding the current frame, see frame_uvs() for where it is in it."""
+        return self.frame_uvs()[0]
 
     @property
     def texture_id(self):
-        if not self.loaded:
-            if not self.loading:
-                self.loading = True
-                self.applied = False
-                # This next self.reload() actually loads the image and does all the conversion. It takes time and resources!
+        # Drawing the whole texture of an animation shows every frame of its sprite sheet
+        raise AttributeError(
+            "ImageHelper.texture_id is gone, animation frames are cells of one sprite sheet. "
+            "Draw with render(), or with the texture and UVs from frame_uvs()")
+
+    def frame_uvs(self, uv0=(0, 0), uv1=(1, 1)):
+        """
+        Texture and UVs to draw the current frame with. Animation frames are
+        cells of a sprite sheet, uv0/uv1 select a part of the frame.
+        """
+        texture = self.texture
+        self.registry.touch(texture)
+
+        if not texture.loaded:
+            if self.ASYNC_LOADING:
+                self.get_loader().request(texture, ImageLoader.VISIBLE)
+            elif not texture.loading:
+                # This next reload() actually loads the image and does all the conversion. It takes time and resources!
                 self.reload()
-                # You can (and maybe should) run this in a thread! threading.Thread(target=self.reload, daemon=True).start()
-                # Or maybe setup an image thread and queue images to load one by one?
-                # You could do this with https://gist.github.com/Willy-JL/bb410bcc761f8bf5649180f22b7f3b44 like so:
-                # sync_thread.queue(self.reload)
-            return dummy_texture_id()
-
-        if self.missing or self.invalid:
-            return dummy_texture_id()
-
-        if not self.applied:
-            self.apply()
-
-        if self.animated:
-            if self.prev_time != (new_time := imgui.get_time()):
-                self.prev_time = new_time
-                self.elapsed += imgui.get_io().delta_time
-                while (excess := self.elapsed - self.durations[max(self.frame, 0)]) > 0:
-                    self.elapsed = excess
-                    self.frame += 1
-                    if self.frame == len(self.durations) - 1:
-                        self.frame = 0
-
-        return self.texture_ids[self.frame]
+            return dummy_texture_id(), uv0, uv1
+
+        if texture.missing or texture.invalid:
+            return dummy_texture_id(), uv0, uv1
+
+        if not texture.applied:
+            if texture.queued:
+                # The loader uploads it within its per-frame budget
+                return dummy_texture_id(), uv0, uv1
+            texture.apply()
+            if not texture.applied:
+                return dummy_texture_id(), uv0, uv1
+
+        # Every helper showing this animation follows the same clock
+        self.frame = texture.current_frame(self.registry.now())
+        return texture.frame_uvs(self.frame, uv0, uv1)
+
+    @staticmethod
+    def _split_uvs(args):
+        # Leading uv0, uv1 positional arguments of imgui.image/add_image
+        if len(args) >= 2:
+            return args[0], args[1], args[2:]
+        return (0, 0), (1, 1), args
 
     def render(self, width: int, height: int, *args, **kwargs):
         if imgui.is_rect_visible(imgui.ImVec2(width, height)):
@@ -165,15 +168,18 @@ class ImageHelper:
                 draw_list = imgui.get_window_draw_list()
                 alpha_color = imgui.get_color_u32(
                     imgui.ImVec4(1.0, 1.0, 1.0, 1.0))
-                draw_list.add_image_rounded(self.texture_id,
+                texture_id, uv0, uv1 = self.frame_uvs()
+                draw_list.add_image_rounded(texture_id,
                                             pos, pos2, imgui.ImVec2(
-                                                0, 0), imgui.ImVec2(1, 1),
+                                                *uv0), imgui.ImVec2(*uv1),
                                             alpha_color, *args, flags=flags.value, **kwargs)
 
                 imgui.dummy(imgui.ImVec2(width, height))
             else:
-                imgui.image(self.texture_id, imgui.ImVec2(
-                    width, height), *args, **kwargs)
+                uv0, uv1, args = self._split_uvs(args)
+                texture_id, uv0, uv1 = self.frame_uvs(uv0, uv1)
+                imgui.image(texture_id, imgui.ImVec2(
+                    width, height), imgui.ImVec2(*uv0), imgui.ImVec2(*uv1), *args, **kwargs)
             return True
         else:
             # Skip if outside view
@@ -203,9 +209,171 @@ class ImageHelper:
         return (left, top), (right, bottom)
 
 
+class DynamicTexture:
+    """
+    Texture for pixels that change every frame (camera feeds, minimaps, previews).
+
+    update() copies the new pixels into the next of a ring of pixel buffers,
+    so writing them never waits for a transfer still reading the previous
+    buffer. flush() starts the transfer from that buffer into the texture with
+    glTexSubImage2D, render() and texture_id flush, so the pixels of the last
+    update() are always the ones drawn.
+    """
+
+    # Number of pixel buffers in the ring, 2 or 3
+    PBO_COUNT = 2
+
+    FORMATS = {
+        1: (gl.GL_R8, gl.GL_RED),
+        2: (gl.GL_RG8, gl.GL_RG),
+        3: (gl.GL_RGB8, gl.GL_RGB),
+        4: (gl.GL_RGBA8, gl.GL_RGBA),
+    }
+
+    def __init__(self, width: int, height: int, channels=4, linear=True,
+                 pbo_count: int | None = None):
+        if channels not in self.FORMATS:
+            raise ValueError(f"Unsupported channel count {channels}")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.linear = linear
+        self.pbo_count = max(2, pbo_count or self.PBO_COUNT)
+
+        self._texture = None
+        self._pbos: list[int] = []
+        self._pbo_index = 0
+        # Whether the current pixel buffer holds pixels not uploaded yet
+        self._pending = False
+        self.updates = 0
+
+        self._create()
+
+    @property
+    def size_bytes(self):
+        return self.width * self.height * self.channels
+
+    def _create(self):
+        last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+        last_unpack = gl.glGetIntegerv(gl.GL_PIXEL_UNPACK_BUFFER_BINDING)
+
+        internal_format, pixel_format = self.FORMATS[self.channels]
+        gl_filter = gl.GL_LINEAR if self.linear else gl.GL_NEAREST
+
+        self._texture = resources.gen_texture(self, "dynamic texture")
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self._texture)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl_filter)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl_filter)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        if self.channels == 1:
+            # Show single channel data as grayscale instead of red
+            gl.glTexParameteriv(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_SWIZZLE_RGBA,
+                                [gl.GL_RED, gl.GL_RED, gl.GL_RED, gl.GL_ONE])
+        # Storage is allocated once, updates only replace the contents
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, internal_format, self.width,
+                        self.height, 0, pixel_format, gl.GL_UNSIGNED_BYTE, None)
+        resources.set_size(resources.TEXTURE, self._texture, self.size_bytes)
+
+        self._pbos = resources.gen_buffers(self.pbo_count, self, "upload PBO")
+        for pbo in self._pbos:
+            gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, pbo)
+            gl.glBufferData(gl.GL_PIXEL_UNPACK_BUFFER,
+                            self.size_bytes, None, gl.GL_STREAM_DRAW)
+            resources.set_size(resources.BUFFER, pbo, self.size_bytes)
+        self._pbo_index = 0
+        self._pending = False
+
+        gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, last_unpack)
+
+    def _as_bytes(self, pixels):
+        # Accepts numpy arrays and anything with the buffer protocol
+        if not isinstance(pixels, np.ndarray):
+            pixels = np.frombuffer(pixels, dtype=np.uint8)
+        pixels = np.ascontiguousarray(pixels)
+        if pixels.dtype != np.uint8:
+            raise TypeError(f"Expected uint8 pixels, got {pixels.dtype}")
+        if pixels.nbytes != self.size_bytes:
+            raise ValueError(
+                f"Expected {self.size_bytes} bytes for {self.width}x{self.height}x{self.channels}, "
+                f"got {pixels.nbytes}")
+        return pixels
+
+    def update(self, pixels):
+        """Queue new pixels, rows from the top like PIL images and imgui.image UVs."""
+        pixels = self._as_bytes(pixels)
+
+        last_unpack = gl.glGetIntegerv(gl.GL_PIXEL_UNPACK_BUFFER_BINDING)
+
+        # Pixels queued but never drawn are replaced, not uploaded
+        self._pbo_index = (self._pbo_index + 1) % self.pbo_count
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self._pbos[self._pbo_index])
+        # Orphan the old storage so we never wait for a transfer still reading it
+        gl.glBufferData(gl.GL_PIXEL_UNPACK_BUFFER,
+                        self.size_bytes, None, gl.GL_STREAM_DRAW)
+        gl.glBufferSubData(gl.GL_PIXEL_UNPACK_BUFFER, 0, self.size_bytes,
+                           ctypes.c_void_p(pixels.ctypes.data))
+        self._pending = True
+        self.updates += 1
+
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, last_unpack)
+
+    def flush(self):
+        """Upload the pixels of the last update(), the CPU doesn't wait for the transfer."""
+        if not self._pending:
+            return
+
+        last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+        last_unpack = gl.glGetIntegerv(gl.GL_PIXEL_UNPACK_BUFFER_BINDING)
+        last_alignment = gl.glGetIntegerv(gl.GL_UNPACK_ALIGNMENT)
+
+        _, pixel_format = self.FORMATS[self.channels]
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self._texture)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self._pbos[self._pbo_index])
+        gl.glTexSubImage2D(gl.GL_TEXTURE_2D, 0, 0, 0, self.width, self.height,
+                           pixel_format, gl.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        touch_texture(self._texture)
+        self._pending = False
+
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, last_alignment)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, last_unpack)
+
+    def resize(self, width: int, height: int):
+        if (width, height) == (self.width, self.height):
+            return
+        self.release()
+        self.width = width
+        self.height = height
+        self._create()
+
+    @property
+    def texture_id(self):
+        self.flush()
+        return self._texture
+
+    def render(self, width: int, height: int, *args, **kwargs):
+        self.flush()
+        imgui.image(self._texture, imgui.ImVec2(width, height), *args, **kwargs)
+
+    def release(self):
+        if self._pbos:
+            resources.delete_buffers(self._pbos)
+            self._pbos = []
+        if self._texture is not None:
+            resources.delete_textures([self._texture])
+            self._texture = None
+
+
 class ForegroundImageHelper(ImageHelper):
-    def __init__(self, path: str | pathlib.Path, glob="", position=(0, 0)):
-        super().__init__(path, glob)
+    def __init__(self, path: str | pathlib.Path, glob="", position=(0, 0), **kwargs):
+        super().__init__(path, glob, **kwargs)
         self.image_position = position
 
     def setImagePosition(self, x, y):
@@ -224,17 +392,20 @@ class ForegroundImageHelper(ImageHelper):
                 draw_list = imgui.get_foreground_draw_list()
                 alpha_color = imgui.get_color_u32(
                     imgui.ImVec4(1.0, 1.0, 1.0, 1.0))
-                draw_list.add_image_rounded(self.texture_id,
+                texture_id, uv0, uv1 = self.frame_uvs()
+                draw_list.add_image_rounded(texture_id,
                                             pos, pos2, imgui.ImVec2(
-                                                0, 0), imgui.ImVec2(1, 1),
+                                                *uv0), imgui.ImVec2(*uv1),
                                             alpha_color, *args, flags=flags.value, **kwargs)
 
             else:
                 pos = position
                 pos2 = imgui.ImVec2(pos[0] + width, pos[1] + height)
                 draw_list = imgui.get_foreground_draw_list()
-                draw_list.add_image(self.texture_id, pos,
-                                    pos2, *args, **kwargs)
+                uv0, uv1, args = self._split_uvs(args)
+                texture_id, uv0, uv1 = self.frame_uvs(uv0, uv1)
+                draw_list.add_image(texture_id, pos,
+                                    pos2, imgui.ImVec2(*uv0), imgui.ImVec2(*uv1), *args, **kwargs)
 
             return True
         else:
@@ -244,8 +415,8 @@ class ForegroundImageHelper(ImageHelper):
 
 
 class BackgroundImageHelper(ImageHelper):
-    def __init__(self, path: str | pathlib.Path, glob="", position=(0, 0)):
-        super().__init__(path, glob)
+    def __init__(self, path: str | pathlib.Path, glob="", position=(0, 0), **kwargs):
+        super().__init__(path, glob, **kwargs)
         self.image_position = position
 
     def setImagePosition(self, x, y):
@@ -263,16 +434,19 @@ class BackgroundImageHelper(ImageHelper):
                 draw_list = imgui.get_background_draw_list()
                 alpha_color = imgui.get_color_u32(
                     imgui.ImVec4(1.0, 1.0, 1.0, 1.0))
-                draw_list.add_image_rounded(self.texture_id,
+                texture_id, uv0, uv1 = self.frame_uvs()
+                draw_list.add_image_rounded(texture_id,
                                             pos, pos2, imgui.ImVec2(
-                                                0, 0), imgui.ImVec2(1, 1),
+                                                *uv0), imgui.ImVec2(*uv1),
                                             alpha_color, *args, flags=flags.value, **kwargs)
             else:
                 pos = position
                 pos2 = imgui.ImVec2(pos[0] + width, pos[1] + height)
                 draw_list = imgui.get_background_draw_list()
-                draw_list.add_image(self.texture_id, pos,
-                                    pos2, *args, **kwargs)
+                uv0, uv1, args = self._split_uvs(args)
+                texture_id, uv0, uv1 = self.frame_uvs(uv0, uv1)
+                draw_list.add_image(texture_id, pos,
+                                    pos2, imgui.ImVec2(*uv0), imgui.ImVec2(*uv1), *args, **kwargs)
 
             return True
         else:
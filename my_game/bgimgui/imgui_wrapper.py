@@ -3,15 +3,56 @@ from imgui_bundle import imgui
 from bge.types import KX_Scene
 import bge.logic
 
-from .renderer import BGEImguiRenderer
+from .renderer import BGEImguiRenderer, InputState
+from .visibility import VisibilityPolicy
+from .atlas import PanelAtlas
+from .fonts import SharedFontAtlas
+from .loader import ImageLoader
+from .profiler import profiler
+from .textures import TextureRegistry
 
 
 class BGEImguiWrapper:
+    # Give every wrapper without its own font_atlas the process-wide shared one
+    SHARE_FONT_ATLAS = False
+    # Only build the UI when something changed (input, animated images, finished
+    # image loads, mark_dirty()), otherwise the last frame is drawn again
+    IDLE_MODE = False
+    # Seconds between frames built anyway while idle, for caret blinking and
+    # tooltip delays. None never wakes up on its own.
+    IDLE_KEEP_ALIVE = 0.5
+    # Frames built after a change, imgui needs a few to settle layout and hovering
+    IDLE_SETTLE_FRAMES = 3
+
     def __init__(self, scene: KX_Scene, cursor_path=None, main=True,
                  panel: bge.types.KX_GameObject | None = None,
-                 resolution: tuple[int, int] | None = None) -> None:
+                 resolution: tuple[int, int] | None = None,
+                 visibility: VisibilityPolicy | None = None,
+                 atlas: PanelAtlas | None = None,
+                 font_atlas: SharedFontAtlas | None = None) -> None:
+
+        # Render into a shared panel atlas instead of a texture of our own
+        self.atlas = atlas
+
+        # Fonts shared with other contexts instead of built per context
+        if font_atlas is None and self.SHARE_FONT_ATLAS:
+            font_atlas = SharedFontAtlas.default()
+        self.font_atlas = font_atlas
+        # Set when a PanelManager ticks this wrapper
+        self.manager = None
+
+        self.idle_mode = self.IDLE_MODE
+        self.frames_built = 0
+        self.frames_idle = 0
+        self._dirty_frames = self.IDLE_SETTLE_FRAMES
+        self._animating = False
+        self._last_build = None
+        self._loader_revision = None
+        self._display_size = None
 
         self.create_backend(scene, cursor_path, main, panel, resolution)
+        self.backend.set_visibility_policy(visibility)
+        self.backend.profile_scope = f"{type(self).__name__} {self.backend.profile_scope}"
 
         self.io = self.backend.io
         self.io.config_flags |= imgui.ConfigFlags_.docking_enable
@@ -19,10 +60,11 @@ class BGEImguiWrapper:
         self.setup_gui()
 
     def create_backend(self, scene, cursor_path, main, panel, resolution):
-        self.context = imgui.create_context()
+        shared_fonts = self.font_atlas.atlas if self.font_atlas else None
+        self.context = imgui.create_context(shared_fonts)
         imgui.set_current_context(self.context)
         self.backend = BGEImguiRenderer(
-            scene, cursor_path, main, panel, resolution
+            scene, cursor_path, main, panel, resolution, self.atlas, self.font_atlas
         )
 
     def setup_gui(self) -> None:
@@ -33,23 +75,83 @@ class BGEImguiWrapper:
         # For child classes to override
         raise NotImplementedError
 
-    def update_gui(self):
+    def update_gui(self, inputs: InputState | None = None):
         backend = self.backend
+
+        # Upload images decoded in the background and evict textures over
+        # the VRAM budget, once per frame for all panels, hidden ones included
+        frame = bge.logic.getFrameTime()
+        TextureRegistry.update_default(frame)
+        ImageLoader.update_default(frame)
+
+        # Hidden panels don't build or render any UI
+        if not backend.update_visibility():
+            return
+
         imgui.set_current_context(self.context)
 
+        # Zones opened while drawing (windows, custom zones) belong to this GUI
+        profiler.scope = backend.profile_scope
+
         # Update inputs like mouse/keyboard
-        backend.update_io()
+        resumed = backend.resumed
+        with profiler.zone("update_io"):
+            backend.update_io(inputs)
+
+        if self.idle_mode and not self._needs_frame(frame, resumed):
+            # The renderer keeps drawing the last draw data
+            self.frames_idle += 1
+            return
+
+        registry = TextureRegistry.default()
+        animated_draws = registry.animated_draws
 
         imgui.new_frame()
 
-        self.draw()
+        with profiler.zone("draw"):
+            self.draw()
 
-        backend.draw_cursor()
+            backend.draw_cursor()
 
-        imgui.end_frame()
+        with profiler.zone("imgui.render"):
+            imgui.end_frame()
 
-        imgui.render()
+            imgui.render()
         backend.render(imgui.get_draw_data())
 
+        self._animating = registry.animated_draws != animated_draws
+        self._dirty_frames = max(0, self._dirty_frames - 1)
+        self._last_build = frame
+        self.frames_built += 1
+
+    def mark_dirty(self):
+        """Build the UI again in idle mode, e.g. after game code changed values it shows."""
+        self._dirty_frames = self.IDLE_SETTLE_FRAMES
+
+    def _needs_frame(self, now: float, resumed: bool):
+        backend = self.backend
+        if resumed or backend.input_events or backend.input_held:
+            self.mark_dirty()
+
+        # Placeholders get replaced once their image is uploaded
+        revision = ImageLoader.default().revision
+        if revision != self._loader_revision:
+            self._loader_revision = revision
+            self.mark_dirty()
+
+        if backend.saved_disp_size != self._display_size:
+            self._display_size = backend.saved_disp_size
+            self.mark_dirty()
+
+        if self._dirty_frames > 0 or self._animating:
+            return True
+        keep_alive = self.IDLE_KEEP_ALIVE
+        return keep_alive is not None and (
+            self._last_build is None or now - self._last_build >= keep_alive)
+
     def shutdown_gui(self):
+        if self.manager is not None:
+            self.manager.remove(self)
         self.backend.shutdown()
+        # Cursors and images nothing uses anymore
+        TextureRegistry.default().purge_unused()
@@ -0,0 +1,216 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import itertools
+import queue
+import threading
+import time
+
+if TYPE_CHECKING:
+    from .textures import ImageTexture
+
+
+class ImageLoader:
+    """
+    Decodes images on a pool of worker threads and uploads them on the main
+    thread, spending at most upload_budget_ms per frame on GL uploads.
+
+    Images shown on screen are decoded before prefetched ones. Call update()
+    once per frame from the main thread (BGEImguiWrapper.update_gui does it
+    for the default loader).
+    """
+
+    # Priorities, lower loads first
+    VISIBLE = 0
+    PREFETCH = 1
+
+    WORKERS = 2
+    # Images waiting for upload, workers block when it's full so decoded
+    # pixels don't pile up in memory
+    RESULT_QUEUE_SIZE = 8
+    # Images uploaded chunk by chunk at once, more wait in the results queue
+    MAX_UPLOADING = 16
+    UPLOAD_BUDGET_MS = 4.0
+
+    _default: ImageLoader | None = None
+
+    def __init__(self, workers: int | None = None, upload_budget_ms: float | None = None,
+                 result_queue_size: int | None = None) -> None:
+        self.workers = workers or self.WORKERS
+        self.upload_budget_ms = self.UPLOAD_BUDGET_MS if upload_budget_ms is None else upload_budget_ms
+        self.max_uploading = self.MAX_UPLOADING
+
+        self._requests: queue.PriorityQueue = queue.PriorityQueue()
+        self._results: queue.Queue = queue.Queue(
+            result_queue_size or self.RESULT_QUEUE_SIZE)
+        # Images whose chunks are being uploaded, in the order they get their next chunk
+        self._uploading: list[ImageTexture] = []
+        # Image -> lowest priority it was requested with, for images not decoded yet
+        self._queued: dict[ImageTexture, int] = {}
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+        self._threads: list[threading.Thread] = []
+        self._running = False
+        self._last_frame = None
+
+        self.requested = 0
+        self.decoded = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.last_upload_ms = 0.0
+        # Bumped whenever an image finishes uploading, never reset, so idle
+        # UIs know to draw again and replace the placeholder
+        self.revision = 0
+
+    @classmethod
+    def default(cls):
+        """Process-wide loader, used by ImageHelper when ASYNC_LOADING is set."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def update_default(cls, frame=None):
+        if cls._default is not None:
+            cls._default.update(frame)
+
+    def _start(self):
+        self._running = True
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"ImageLoader-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def request(self, image: ImageTexture, priority=VISIBLE):
+        """Queue an image for loading, or move it up if it's already queued with a lower priority."""
+        if image.applied:
+            return
+        with self._lock:
+            queued_priority = self._queued.get(image)
+            if queued_priority is not None and queued_priority <= priority:
+                return
+            if queued_priority is None:
+                if image.loading or image.loaded:
+                    # Already decoding or waiting for its upload
+                    return
+                self.requested += 1
+            self._queued[image] = priority
+            image.queued = True
+
+        if not self._running:
+            self._start()
+        self._requests.put((priority, next(self._order), image))
+
+    def prefetch(self, image: ImageTexture):
+        self.request(image, self.PREFETCH)
+
+    def _work(self):
+        while self._running:
+            priority, _, image = self._requests.get()
+            if image is None:
+                break
+
+            with self._lock:
+                # Skip entries superseded by a higher priority request
+                if self._queued.get(image) != priority:
+                    continue
+                del self._queued[image]
+                image.loading = True
+
+            handed_off = []
+
+            def ready(image):
+                # Uploads start while the rest of the frames decode
+                handed_off.append(image)
+                self._results.put(image)
+
+            try:
+                image.reload(ready)
+                with self._lock:
+                    self.decoded += 1
+            except Exception as error:
+                print(f"Failed to load image {image.path}: {error}")
+                image.invalid = True
+                image.loaded = True
+                image.loading = False
+                with self._lock:
+                    self.failed += 1
+                if not handed_off:
+                    self._results.put(image)
+
+    def update(self, frame=None):
+        """Upload decoded images until this frame's budget is spent. Pass a frame key to only run once per frame."""
+        if frame is not None:
+            if frame == self._last_frame:
+                return
+            self._last_frame = frame
+
+        start = time.perf_counter()
+        deadline = start + self.upload_budget_ms / 1000
+        uploading = self._uploading
+        while len(uploading) < self.max_uploading:
+            try:
+                uploading.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+
+        for _ in range(len(uploading)):
+            # upload() always uploads a chunk if one is decoded, images it
+            # returns False for go to the back, so the next frame starts with
+            # the ones this frame's budget didn't reach
+            image = uploading.pop(0)
+            if image.upload(deadline):
+                image.queued = False
+                self.revision += 1
+                with self._lock:
+                    self.uploaded += 1
+            else:
+                uploading.append(image)
+            if time.perf_counter() >= deadline:
+                break
+        self.last_upload_ms = (time.perf_counter() - start) * 1000
+
+    def progress(self):
+        """Fraction of requested images that are loaded and uploaded, 1.0 when idle."""
+        if not self.requested:
+            return 1.0
+        return self.uploaded / self.requested
+
+    @property
+    def pending(self):
+        return self.requested - self.uploaded
+
+    @property
+    def idle(self):
+        return self.pending == 0
+
+    def reset_progress(self):
+        """Start counting progress from zero, e.g. when a new loading screen starts."""
+        with self._lock:
+            self.requested -= self.uploaded
+            self.decoded = self.uploaded = self.failed = 0
+
+    def info(self):
+        return {
+            "requested": self.requested,
+            "uploaded": self.uploaded,
+            "pending": self.pending,
+            "failed": self.failed,
+            "queued_results": self._results.qsize(),
+            "uploading": len(self._uploading),
+            "last_upload_ms": self.last_upload_ms,
+        }
+
+    def shutdown(self):
+        self._running = False
+        for _ in self._threads:
+            self._requests.put((-1, next(self._order), None))
+        self._threads.clear()
+        # Let blocked workers finish their put
+        while True:
+            try:
+                self._results.get_nowait()
+            except queue.Empty:
+                break
+        if ImageLoader._default is self:
+            ImageLoader._default = None
@@ -0,0 +1,116 @@
+from __future__ import annotations
+from bge.types import KX_Scene
+import bge
+
+from .imgui_wrapper import BGEImguiWrapper
+from .renderer import BGE_MOUSE_BUTTON_MAP, BGEImguiRenderer, InputState
+
+
+class PanelManager:
+    """
+    Ticks every BGEImguiWrapper of a scene from one update() call, instead of
+    a runGUI logic brick per panel. Input is read once per frame, pointer
+    input only goes to the panel under the mouse and keyboard input only to
+    the focused one, so typing never reaches several UIs at once.
+
+    Screen (main) UIs always get the pointer, and take it from the panels
+    while imgui wants the mouse. Without a focused panel the keyboard goes
+    to the first screen UI.
+    """
+
+    # Focus the panel under the mouse when a mouse button is pressed
+    FOCUS_ON_CLICK = True
+
+    _managers: dict[KX_Scene, PanelManager] = {}
+
+    def __init__(self, scene: KX_Scene) -> None:
+        self.scene = scene
+        self.wrappers: list[BGEImguiWrapper] = []
+        self.focused: BGEImguiWrapper | None = None
+        self.hovered: BGEImguiWrapper | None = None
+        self._buttons_down = frozenset()
+
+    @classmethod
+    def for_scene(cls, scene: KX_Scene):
+        manager = cls._managers.get(scene)
+        if manager is None:
+            manager = cls._managers[scene] = cls(scene)
+        return manager
+
+    def add(self, wrapper: BGEImguiWrapper):
+        if wrapper.manager is not None and wrapper.manager is not self:
+            wrapper.manager.remove(wrapper)
+        if wrapper not in self.wrappers:
+            self.wrappers.append(wrapper)
+        wrapper.manager = self
+        return wrapper
+
+    def remove(self, wrapper: BGEImguiWrapper):
+        if wrapper in self.wrappers:
+            self.wrappers.remove(wrapper)
+        wrapper.manager = None
+        if self.focused is wrapper:
+            self.focused = None
+        if self.hovered is wrapper:
+            self.hovered = None
+        if not self.wrappers and PanelManager._managers.get(self.scene) is self:
+            del PanelManager._managers[self.scene]
+
+    def focus(self, wrapper: BGEImguiWrapper | None):
+        """Send keyboard input to wrapper, None gives it back to the screen UI."""
+        self.focused = wrapper
+
+    def _panel_under_mouse(self, inputs: InputState):
+        panels = [wrapper for wrapper in self.wrappers if not wrapper.backend.main]
+        if not panels:
+            return None
+
+        camera = self.scene.active_camera
+        picker = panels[0].backend.picker
+        if picker is not None:
+            hit = picker.pick(camera, inputs.mouse_position,
+                              BGEImguiRenderer.INTERACTION_DIST, bge.logic.getFrameTime())
+            hit_obj = hit.panel if hit is not None else None
+        elif BGEImguiRenderer.JUST_RAYCASTED:
+            hit_obj = BGEImguiRenderer.CAST_DATA[0]
+        else:
+            hit_obj = panels[0].backend.camera_raycast(camera, bge.logic.mouse)[0]
+
+        if hit_obj is None:
+            return None
+        for wrapper in panels:
+            if wrapper.backend.panel is hit_obj:
+                return wrapper
+        return None
+
+    def _route(self, inputs: InputState):
+        screens = [wrapper for wrapper in self.wrappers if wrapper.backend.main]
+        # Screen UIs sit on top, the panels behind them don't get the mouse
+        capturing = next((wrapper for wrapper in screens
+                          if wrapper.io.want_capture_mouse), None)
+        hovered = None if capturing is not None else self._panel_under_mouse(inputs)
+
+        buttons = inputs.buttons.intersection(BGE_MOUSE_BUTTON_MAP)
+        if self.FOCUS_ON_CLICK and buttons - self._buttons_down:
+            self.focused = hovered or capturing
+        self._buttons_down = buttons
+        self.hovered = hovered
+
+        keyboard_target = self.focused or (screens[0] if screens else None)
+        for wrapper in self.wrappers:
+            backend = wrapper.backend
+            backend.pointer_focus = backend.main or wrapper is hovered
+            backend.keyboard_focus = wrapper is keyboard_target
+
+    def update(self):
+        """Read input once, route it and update every wrapper. Call once per frame."""
+        if not self.wrappers:
+            return
+        inputs = InputState.sample()
+        self._route(inputs)
+        for wrapper in list(self.wrappers):
+            wrapper.update_gui(inputs)
+
+    def shutdown(self):
+        for wrapper in list(self.wrappers):
+            wrapper.shutdown_gui()
@@ -0,0 +1,183 @@
+from __future__ import annotations
+from typing import NamedTuple
+import bge
+
+import numpy as np
+
+
+class PanelHit(NamedTuple):
+    panel: bge.types.KX_GameObject
+    context_id: int
+    # Top left is 0, 0 like imgui coordinates
+    u: float
+    v: float
+    distance: float
+    point: np.ndarray
+
+
+class PanelPicker:
+    """
+    Finds the world panel under the mouse by intersecting the mouse ray with
+    every panel quad in one NumPy pass, instead of a physics raycast.
+
+    Panels are planes spanning -1..1 on their local X and Y axes (the default
+    plane), transformed by the object's world matrix. The last hit is reused
+    while the mouse, camera and panels don't move. Static panels are assumed
+    never to move, BGEImguiRenderer registers panels with an "imgui_static"
+    game property as static.
+    """
+
+    # Also cast a physics ray to the hit, so panels behind other objects can't be used
+    OCCLUSION_TEST = False
+
+    _pickers: dict[bge.types.KX_Scene, PanelPicker] = {}
+
+    def __init__(self, occlusion_test: bool | None = None) -> None:
+        self.occlusion_test = self.OCCLUSION_TEST if occlusion_test is None else occlusion_test
+
+        self.panels: list[bge.types.KX_GameObject] = []
+        self.context_ids: list[int] = []
+        # Static panels never have their transform read again
+        self._static = np.empty(0, dtype=bool)
+        self._world = np.empty((0, 4, 4))
+        self._inverse = np.empty((0, 4, 4))
+
+        self._last_frame = None
+        self._last_key = None
+        self.last_hit: PanelHit | None = None
+
+        # Intersection passes run, and picks answered from the last result
+        self.picks = 0
+        self.reuses = 0
+
+    @classmethod
+    def for_scene(cls, scene: bge.types.KX_Scene):
+        """Picker shared by every panel of a scene."""
+        picker = cls._pickers.get(scene)
+        if picker is None:
+            picker = cls._pickers[scene] = cls()
+        return picker
+
+    @classmethod
+    def release_scene(cls, scene: bge.types.KX_Scene):
+        picker = cls._pickers.get(scene)
+        if picker is not None and not picker.panels:
+            del cls._pickers[scene]
+
+    @staticmethod
+    def _invert(matrices: np.ndarray):
+        try:
+            return np.linalg.inv(matrices)
+        except np.linalg.LinAlgError:
+            # A panel scaled to zero, it can't be hit
+            inverse = np.full_like(matrices, np.nan)
+            for index, matrix in enumerate(matrices):
+                if np.linalg.det(matrix) != 0:
+                    inverse[index] = np.linalg.inv(matrix)
+            return inverse
+
+    def register(self, panel: bge.types.KX_GameObject, context_id: int, static=False):
+        world = np.array(panel.worldTransform, dtype=np.float64)[None]
+        self.panels.append(panel)
+        self.context_ids.append(context_id)
+        self._static = np.append(self._static, static)
+        self._world = np.concatenate((self._world, world))
+        self._inverse = np.concatenate((self._inverse, self._invert(world)))
+        self._last_key = None
+
+    def unregister(self, panel: bge.types.KX_GameObject):
+        for index, registered in enumerate(self.panels):
+            if registered is panel:
+                break
+        else:
+            return
+        del self.panels[index]
+        del self.context_ids[index]
+        self._static = np.delete(self._static, index)
+        self._world = np.delete(self._world, index, axis=0)
+        self._inverse = np.delete(self._inverse, index, axis=0)
+        self._last_key = None
+        self.last_hit = None
+
+    def _update_transforms(self):
+        """Read the transforms of moving panels, returns whether any changed."""
+        dynamic = np.flatnonzero(~self._static)
+        if not len(dynamic):
+            return False
+        world = np.array([self.panels[index].worldTransform for index in dynamic],
+                         dtype=np.float64)
+        changed = np.any(world != self._world[dynamic], axis=(1, 2))
+        if not changed.any():
+            return False
+        changed_indices = dynamic[changed]
+        self._world[changed_indices] = world[changed]
+        self._inverse[changed_indices] = self._invert(world[changed])
+        return True
+
+    def pick(self, camera: bge.types.KX_Camera, position, max_distance=np.inf, frame=None):
+        """
+        Panel under the screen position (0..1, like mouse.position) seen from camera, or None.
+        Pass a frame key so every panel asking in the same frame shares one pick.
+        """
+        if frame is not None and frame == self._last_frame:
+            self.reuses += 1
+            return self.last_hit
+        self._last_frame = frame
+
+        if camera is None or not self.panels:
+            self.last_hit = None
+            return None
+
+        moved = self._update_transforms()
+        camera_matrix = np.array(camera.worldTransform, dtype=np.float64)
+        key = (tuple(position), camera_matrix.tobytes(),
+               np.array(camera.projection_matrix).tobytes(), max_distance)
+        if not moved and key == self._last_key:
+            self.reuses += 1
+            return self.last_hit
+        self._last_key = key
+
+        self.picks += 1
+        hit = self._intersect(camera, position, max_distance, camera_matrix)
+        if hit is not None and self.occlusion_test and self._occluded(camera, hit):
+            hit = None
+        self.last_hit = hit
+        return hit
+
+    def _intersect(self, camera, position, max_distance, camera_matrix):
+        origin = camera_matrix[:3, 3]
+        direction = -np.array(camera.getScreenVect(*position), dtype=np.float64)
+        length = np.linalg.norm(direction)
+        if length == 0:
+            return None
+        direction /= length
+
+        # Ray in the local space of every panel, the quad lies on local z = 0
+        rotation = self._inverse[:, :3, :3]
+        local_origin = rotation @ origin + self._inverse[:, :3, 3]
+        local_direction = rotation @ direction
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Affine transforms keep the ray parameter, so t is the world distance
+            t = -local_origin[:, 2] / local_direction[:, 2]
+            local = local_origin + t[:, None] * local_direction
+            hits = ((t > 0) & (t <= max_distance)
+                    & (np.abs(local[:, 0]) <= 1) & (np.abs(local[:, 1]) <= 1))
+        if not hits.any():
+            return None
+
+        index = int(np.argmin(np.where(hits, t, np.inf)))
+        x, y = local[index, :2]
+        return PanelHit(self.panels[index], self.context_ids[index],
+                        float(x + 1) / 2, float(1 - y) / 2, float(t[index]),
+                        origin + direction * t[index])
+
+    def _occluded(self, camera, hit: PanelHit):
+        # Rays from a parented camera can hit the parent, same fix as camera_raycast
+        parent = camera.parent
+        if parent is not None:
+            camera.removeParent()
+        obstacle, _, _ = camera.rayCast(
+            hit.point.tolist(), None, hit.distance + 0.01)
+        if parent is not None:
+            camera.setParent(parent)
+        return obstacle is not None and obstacle is not hit.panel
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import contextlib
+import time
+
+import numpy as np
+
+
+class ZoneStats:
+    """Rolling window of the last durations of one zone, in nanoseconds."""
+
+    def __init__(self, window: int) -> None:
+        self.samples = np.zeros(window, dtype=np.int64)
+        self.count = 0
+        self.calls = 0
+        self._index = 0
+
+    def add(self, duration_ns: int):
+        self.samples[self._index] = duration_ns
+        self._index = (self._index + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+        self.calls += 1
+
+    def history(self):
+        """Samples oldest first."""
+        if self.count < len(self.samples):
+            return self.samples[:self.count]
+        return np.roll(self.samples, -self._index)
+
+    def summary(self):
+        """min/avg/p99/last in milliseconds."""
+        history = self.history()
+        if not len(history):
+            return {"min": 0.0, "avg": 0.0, "p99": 0.0, "last": 0.0}
+        return {
+            "min": float(history.min()) / 1e6,
+            "avg": float(history.mean()) / 1e6,
+            "p99": float(np.percentile(history, 99)) / 1e6,
+            "last": float(self.samples[self._index - 1]) / 1e6,
+        }
+
+
+class _Zone:
+    __slots__ = ("profiler", "key", "start")
+
+    def __init__(self, profiler: Profiler, key: tuple[str, str]) -> None:
+        self.profiler = profiler
+        self.key = key
+
+    def __enter__(self):
+        self.profiler._enter(self.key)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler._exit(self.key, time.perf_counter_ns() - self.start)
+
+
+_NO_ZONE = contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    Times named zones with perf_counter_ns, grouped by scope (one per GUI,
+    set by BGEImguiWrapper.update_gui), and keeps the last WINDOW durations of
+    each for min/avg/p99. Shown by widgets.ProfilerWindow.
+
+    Disabled, a zone is a shared no-op context manager.
+
+        with profiler.zone("inventory grid"):
+            ...
+    """
+
+    ENABLED = False
+    # Samples kept per zone
+    WINDOW = 300
+
+    def __init__(self, window: int | None = None) -> None:
+        self.enabled = self.ENABLED
+        self.window = window or self.WINDOW
+        self.zones: dict[tuple[str, str], ZoneStats] = {}
+        # Scope of zones that don't name one
+        self.scope = ""
+        # Open zones, nested zones with the same key (e.g. an override
+        # calling super()) only count once
+        self._open: dict[tuple[str, str], int] = {}
+
+    def zone(self, name: str, scope: str | None = None):
+        if not self.enabled:
+            return _NO_ZONE
+        return _Zone(self, (self.scope if scope is None else scope, name))
+
+    def _enter(self, key):
+        self._open[key] = self._open.get(key, 0) + 1
+
+    def _exit(self, key, duration_ns: int):
+        depth = self._open.pop(key) - 1
+        if depth:
+            self._open[key] = depth
+        else:
+            self.record(key[1], duration_ns, key[0])
+
+    def record(self, name: str, duration_ns: int, scope: str | None = None):
+        key = (self.scope if scope is None else scope, name)
+        stats = self.zones.get(key)
+        if stats is None:
+            stats = self.zones[key] = ZoneStats(self.window)
+        stats.add(duration_ns)
+
+    def summary(self):
+        """(scope, name, stats) of every zone, slowest on average first."""
+        rows = [(scope, name, stats.summary())
+                for (scope, name), stats in self.zones.items()]
+        rows.sort(key=lambda row: row[2]["avg"], reverse=True)
+        return rows
+
+    def reset(self):
+        self.zones.clear()
+
+
+profiler = Profiler()
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from typing import TYPE_CHECKING
 from bge.types import KX_Scene
 import bge.logic
 
@@ -6,6 +7,8 @@ import ctypes
 import glob
 import os
 import pathlib
+import time
+import zlib
 
 import OpenGL
 # ENABLE ERROR CHECKING IF YOU NEED TO DEBUG SHADER ISSUES
@@ -13,15 +16,52 @@ OpenGL.ERROR_CHECKING = False
 
 if True:
     from OpenGL import GL as gl
-    from PIL import Image
     import numpy as np
 
     from imgui_bundle.python_backends.base_backend import BaseOpenGLRenderer
     from imgui_bundle import imgui
 
+    from . import resources
+    from .profiler import profiler
+    from .visibility import VisibilityPolicy
+    from .picking import PanelPicker
+    from .shader_cache import ShaderProgram, acquire_program, release_program
+    from .textures import ImageTexture, TextureRegistry
+    from .fonts import FontAtlasCache, SharedFontAtlas, font_source, upload_font_texture
+
+if TYPE_CHECKING:
+    from .atlas import PanelAtlas
+
 
 class BGEPipelineRenderer(BaseOpenGLRenderer):
     """Basic OpenGL integration base class."""
+
+    # Stream vertex/index data through grow-only ring buffers instead of
+    # reallocating the buffers with glBufferData for every command list.
+    STREAM_BUFFERS = True
+    # Number of frames the ring holds. Fences make sure a slot is never
+    # overwritten while the GPU may still be reading it.
+    STREAM_SLOTS = 3
+    # Seconds of low usage before the ring buffers shrink back down
+    STREAM_SHRINK_DELAY = 10.0
+    # Fill the ring through unsynchronized mapped ranges instead of glBufferSubData
+    STREAM_MAPPED = False
+    # Copy every command list into one staging area and upload it in one go,
+    # instead of one upload and bind per command list
+    MERGE_CMD_LISTS = False
+    # How GL state is saved/restored around the UI pass, see set_gl_state_mode()
+    GL_STATE_MODE = "tracked"
+    # Skip the FBO clear, redraw and depsgraph update of panels when the
+    # draw data is identical to the previous frame
+    SKIP_UNCHANGED_PANELS = True
+    # Directory to keep linked shader program binaries in between launches,
+    # e.g. bge.logic.expandPath("//shader_cache"). None disables it.
+    PROGRAM_BINARY_CACHE = None
+    # Directory to keep baked font atlases in between launches, so fonts
+    # aren't rasterized again on startup. None disables it.
+    FONT_CACHE_DIR = None
+    # Measure the GPU time of the UI pass with timer queries, see stats.gpu_time_ms
+    GPU_TIMING = False
     VERTEX_SHADER_SRC = """
     #version 330
 
@@ -55,7 +95,10 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
 
     def __init__(self, scene: KX_Scene, main=True,
                  panel: bge.types.KX_GameObject | None = None,
-                 resolution: tuple[int, int] | None = None):
+                 resolution: tuple[int, int] | None = None,
+                 atlas: PanelAtlas | None = None,
+                 font_atlas: SharedFontAtlas | None = None):
+        self._program: ShaderProgram | None = None
         self._shader_handle = None
         self._vert_handle = None
         self._fragment_handle = None
@@ -70,9 +113,45 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
         self._vbo_handle = None
         self._elements_handle = None
         self._vao_handle = None
+        self.frame_buffer = None
+        self.vertex_stream: StreamingBuffer | None = None
+        self.index_stream: StreamingBuffer | None = None
+        self.merge_cmd_lists = self.MERGE_CMD_LISTS
+        self._vtx_staging = np.empty(0, dtype=np.uint8)
+        self._idx_staging = np.empty(0, dtype=np.uint8)
+        self.gl_state = GLStateTracker(self.GL_STATE_MODE)
+        self.commands = DrawCommandProcessor()
+        self.stats = RendererStats(self)
+        self.gpu_timing = self.GPU_TIMING
+        self.skip_unchanged = self.SKIP_UNCHANGED_PANELS
+        self.frames_skipped = 0
+        self._last_fingerprint = None
+        self.visibility: VisibilityPolicy | None = None
+        self.visible = True
+        self.resumed = False
         self.data = None
+        # Idle UIs draw the same draw data again, its clip rects are only scaled once
+        self._data_scaled = False
+        self.atlas = None
+
+        # Font atlas shared with other contexts, see fonts.SharedFontAtlas
+        self.font_atlas = font_atlas
+        if font_atlas is not None:
+            font_atlas.acquire()
+        self.font_cache = FontAtlasCache(
+            self.FONT_CACHE_DIR) if self.FONT_CACHE_DIR is not None else None
+        # Fonts added through set_main_font/add_extra_font, used as the cache key
+        self.font_sources = []
+        self._font_objects = []
+        # Open font_batch() blocks, the atlas is only built when the last one closes
+        self._font_batches = 0
+        self._fonts_pending = False
+        self.font_builds = 0
+        self.font_build_time = 0.0
 
         self.main = main
+        # Groups this renderer's profiler zones, BGEImguiWrapper names it after the GUI
+        self.profile_scope = "screen" if main else getattr(panel, "name", "panel")
         if not main:
             if panel is None:
                 bge.logic.endGame()
@@ -84,6 +163,13 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
                 raise ValueError(
                     "Pass a resolution tuple for non-main UI viewport")
             self.panel = panel
+            self.tex_resolution = resolution
+
+        if not main and atlas is not None:
+            # The atlas owns the texture and FBO, and renders this panel into it
+            self.atlas = atlas
+
+        elif not main:
             texture = bge.texture.Texture(panel, 0, 0)
 
             # Initialize the texture
@@ -96,16 +182,23 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
             data = bge.texture.ImageBuff(resolution[0], resolution[1])
             texture.source = data
 
-            # Save the bind ID and resolution for the FBO later
+            # Save the bind ID for the FBO later
             self.bind_id = texture.bindId
-            self.tex_resolution = resolution
             self.fbo_texture = texture
 
             # Refresh texture once to apply changes
             self.fbo_texture.refresh(False)
 
         super(BGEPipelineRenderer, self).__init__()
-        self.scene.post_draw.append(self.render_call)
+        if self.atlas is not None:
+            try:
+                self.atlas.add(self)
+            except ValueError:
+                # Doesn't fit in the atlas, delete what was created for it
+                BGEPipelineRenderer._invalidate_device_objects(self)
+                raise
+        else:
+            self.scene.post_draw.append(self.render_call)
 
         if self.main:
             width, height = bge.render.getWindowWidth(), bge.render.getWindowHeight()
@@ -116,40 +209,27 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
         self.io.display_size = width, height
 
     def refresh_font_texture(self):
-        # save texture state
-        last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+        if self._font_batches:
+            # Inside font_batch(), built once when the batch ends
+            self._fonts_pending = True
+            return
 
-        # width, height, pixels = self.io.fonts.get_tex_data_as_rgba32()
-        font_matrix: np.ndarray = self.io.fonts.get_tex_data_as_rgba32()
-        width = font_matrix.shape[1]
-        height = font_matrix.shape[0]
-        pixels = font_matrix.data
-
-        if self._font_texture is not None:
-            gl.glDeleteTextures([self._font_texture])
-
-        self._font_texture = gl.glGenTextures(1)
-
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self._font_texture)
-        gl.glTexParameteri(
-            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
-        gl.glTexParameteri(
-            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
-        gl.glTexImage2D(
-            gl.GL_TEXTURE_2D,
-            0,
-            gl.GL_RGBA,
-            width,
-            height,
-            0,
-            gl.GL_RGBA,
-            gl.GL_UNSIGNED_BYTE,
-            pixels,
-        )
+        start = time.perf_counter()
+        if self.font_atlas is not None:
+            # Shared atlas, only rebuilt and uploaded when its fonts changed
+            self._font_texture = self.font_atlas.texture()
+        else:
+            pixels = None
+            if self.font_cache is not None:
+                pixels = self.font_cache.build(
+                    self.io.fonts, self.font_sources, self._font_objects)
 
-        self.io.fonts.tex_id = self._font_texture
-        gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
-        self.io.fonts.clear_tex_data()
+            self._font_texture = upload_font_texture(
+                self.io.fonts, self._font_texture, pixels, self)
+
+        self.font_build_time = time.perf_counter() - start
+        self.font_builds += 1
+        self._fonts_pending = False
 
     def _create_device_objects(self):
         # save state
@@ -160,40 +240,21 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
 
         last_vertex_array = gl.glGetIntegerv(gl.GL_VERTEX_ARRAY_BINDING)
 
-        self._shader_handle = gl.glCreateProgram()
-        # note: no need to store shader parts handles after linking
-        vertex_shader = gl.glCreateShader(gl.GL_VERTEX_SHADER)
-        fragment_shader = gl.glCreateShader(gl.GL_FRAGMENT_SHADER)
-
-        gl.glShaderSource(vertex_shader, self.VERTEX_SHADER_SRC)
-        gl.glShaderSource(fragment_shader, self.FRAGMENT_SHADER_SRC)
-        gl.glCompileShader(vertex_shader)
-        gl.glCompileShader(fragment_shader)
-
-        gl.glAttachShader(self._shader_handle, vertex_shader)
-        gl.glAttachShader(self._shader_handle, fragment_shader)
-
-        gl.glLinkProgram(self._shader_handle)
-
-        # note: after linking shaders can be removed
-        gl.glDeleteShader(vertex_shader)
-        gl.glDeleteShader(fragment_shader)
+        # Compiled once per process and shared by every renderer
+        self._program = acquire_program(
+            self.VERTEX_SHADER_SRC, self.FRAGMENT_SHADER_SRC, self.PROGRAM_BINARY_CACHE)
+        self._shader_handle = self._program.handle
 
-        self._attrib_location_tex = gl.glGetUniformLocation(
-            self._shader_handle, "Texture")
-        self._attrib_proj_mtx = gl.glGetUniformLocation(
-            self._shader_handle, "ProjMtx")
-        self._attrib_location_position = gl.glGetAttribLocation(
-            self._shader_handle, "Position")
-        self._attrib_location_uv = gl.glGetAttribLocation(
-            self._shader_handle, "UV")
-        self._attrib_location_color = gl.glGetAttribLocation(
-            self._shader_handle, "Color")
+        self._attrib_location_tex = self._program.uniform("Texture")
+        self._attrib_proj_mtx = self._program.uniform("ProjMtx")
+        self._attrib_location_position = self._program.attribute("Position")
+        self._attrib_location_uv = self._program.attribute("UV")
+        self._attrib_location_color = self._program.attribute("Color")
 
-        self._vbo_handle = gl.glGenBuffers(1)
-        self._elements_handle = gl.glGenBuffers(1)
+        self._vbo_handle = resources.gen_buffer(self, "vertices")
+        self._elements_handle = resources.gen_buffer(self, "indices")
 
-        self._vao_handle = gl.glGenVertexArrays(1)
+        self._vao_handle = resources.gen_vertex_array(self)
         gl.glBindVertexArray(self._vao_handle)
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._vbo_handle)
 
@@ -208,8 +269,16 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
         gl.glVertexAttribPointer(self._attrib_location_color, 4, gl.GL_UNSIGNED_BYTE,
                                  gl.GL_TRUE, imgui.VERTEX_SIZE, ctypes.c_void_p(imgui.VERTEX_BUFFER_COL_OFFSET))
 
+        if self.STREAM_BUFFERS:
+            self.vertex_stream = StreamingBuffer(
+                gl.GL_ARRAY_BUFFER, self._vbo_handle, imgui.VERTEX_SIZE,
+                self.STREAM_SLOTS, self.STREAM_SHRINK_DELAY, self.STREAM_MAPPED)
+            self.index_stream = StreamingBuffer(
+                gl.GL_ELEMENT_ARRAY_BUFFER, self._elements_handle, imgui.INDEX_SIZE,
+                self.STREAM_SLOTS, self.STREAM_SHRINK_DELAY, self.STREAM_MAPPED)
+
         # If not main render, use the FBO
-        if not self.main:
+        if not self.main and self.atlas is None:
             gl.glBindTexture(gl.GL_TEXTURE_2D, self.bind_id)
 
             width, height = self.tex_resolution
@@ -221,7 +290,7 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
             gl.glTexParameteri(
                 gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
 
-            self.frame_buffer = gl.glGenFramebuffers(1)
+            self.frame_buffer = resources.gen_framebuffer(self, "panel")
             gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.frame_buffer)
 
             gl.glFramebufferTexture2D(
@@ -237,56 +306,117 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
     def render(self, draw_data):
         # Since we are rendering in the post_draw callback, simply update the draw data
         self.data = draw_data
+        self._data_scaled = False
+
+    def set_visibility_policy(self, policy: VisibilityPolicy | None):
+        # Only used for panels, the main UI is always visible
+        self.visibility = policy
+        if policy is None:
+            self.visible = True
+
+    def update_visibility(self):
+        """Re-evaluate the visibility policy, returns whether the panel should update."""
+        if self.main or self.visibility is None:
+            return True
+
+        visible = self.visibility.is_visible(
+            self.panel, self.scene.active_camera)
+        if visible and not self.visible:
+            self.resumed = True
+        elif self.visible and not visible:
+            # Nothing reaches a hidden panel, don't leave keys and buttons stuck down
+            self.release_input()
+        self.visible = visible
+        return visible
 
     def render_call(self):
-        if self.data is None:
-            return
+        with profiler.zone("render_call", self.profile_scope):
+            self._render_frame()
 
-        draw_data = self.data
+    def _render_frame(self):
+        frame = self.prepare_frame()
+        if frame is not None:
+            draw_data, fb_width, fb_height = frame
 
-        # perf: local for faster access
-        io = self.io
+            state = self.gl_state
+            state.begin()
+            timer = self.stats.begin_gpu_timer() if self.gpu_timing else None
 
-        display_width, display_height = io.display_size
-        fb_width = int(display_width * io.display_framebuffer_scale[0])
-        fb_height = int(display_height * io.display_framebuffer_scale[1])
+            if not self.main:
+                state.disable("scissor_test")
+                state.bind_framebuffer(self.frame_buffer)
 
-        if fb_width == 0 or fb_height == 0:
-            return
+                # Clears any color information in the FBO, makes transparent background
+                gl.glClearColor(0.0, 0.0, 0.0, 0.0)
 
-        draw_data.scale_clip_rects(io.display_framebuffer_scale)
+                gl.glClear(gl.GL_COLOR_BUFFER_BIT)
 
-        # backup GL state
-        # todo: provide cleaner version of this backup-restore code
-        common_gl_state_tuple = get_common_gl_state()
-        last_program = gl.glGetIntegerv(gl.GL_CURRENT_PROGRAM)
-        last_active_texture = gl.glGetIntegerv(gl.GL_ACTIVE_TEXTURE)
-        last_array_buffer = gl.glGetIntegerv(gl.GL_ARRAY_BUFFER_BINDING)
-        last_element_array_buffer = gl.glGetIntegerv(
-            gl.GL_ELEMENT_ARRAY_BUFFER_BINDING)
-        last_vertex_array = gl.glGetIntegerv(gl.GL_VERTEX_ARRAY_BINDING)
+            self.setup_render_state(state)
+            self.draw_pass(state, draw_data, fb_width, fb_height)
 
-        last_fbo = gl.glGetIntegerv(gl.GL_FRAMEBUFFER_BINDING)
+            if timer is not None:
+                timer.end()
+            # restore modified GL state
+            state.end()
 
-        if not self.main:
-            gl.glDisable(gl.GL_SCISSOR_TEST)
-            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.frame_buffer)
+        self.frame_done()
+
+    def frame_done(self):
+        # Called once per rendered frame, for child classes to override
+        pass
+
+    def prepare_frame(self):
+        """
+        Returns (draw_data, fb_width, fb_height) if this frame needs drawing, otherwise None.
+        With setup_render_state() and draw_pass() it lets a PanelAtlas draw
+        many panels in one pass.
+        """
+        if self.data is None or not self.visible:
+            return None
 
-            # Clears any color information in the FBO, makes transparent background
-            gl.glClearColor(0.0, 0.0, 0.0, 0.0)
+        draw_data = self.data
 
-            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        # perf: local for faster access
+        io = self.io
 
-        gl.glEnable(gl.GL_BLEND)
-        gl.glBlendEquation(gl.GL_FUNC_ADD)
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glDisable(gl.GL_CULL_FACE)
-        gl.glDisable(gl.GL_DEPTH_TEST)
-        gl.glEnable(gl.GL_SCISSOR_TEST)
-        gl.glActiveTexture(gl.GL_TEXTURE0)
-        gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
+        display_width, display_height = io.display_size
+        fb_width = int(display_width * io.display_framebuffer_scale[0])
+        fb_height = int(display_height * io.display_framebuffer_scale[1])
 
-        gl.glViewport(0, 0, int(fb_width), int(fb_height))
+        if fb_width == 0 or fb_height == 0:
+            return None
+
+        if not self._data_scaled:
+            draw_data.scale_clip_rects(io.display_framebuffer_scale)
+            self._data_scaled = True
+
+        # Panels keep their FBO contents, so an unchanged frame needs no redraw
+        if not self.main and self.skip_unchanged:
+            fingerprint = fingerprint_draw_data(draw_data, self._last_fingerprint)
+            # After a layout change the next frame is drawn too, to get its CRC
+            if fingerprint[1] is not None and fingerprint == self._last_fingerprint:
+                self.frames_skipped += 1
+                return None
+            self._last_fingerprint = fingerprint
+
+        return draw_data, fb_width, fb_height
+
+    def setup_render_state(self, state: GLStateTracker):
+        state.enable("blend")
+        state.blend_equation(gl.GL_FUNC_ADD)
+        state.blend_func(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        state.disable("cull_face")
+        state.disable("depth_test")
+        state.enable("scissor_test")
+        state.active_texture(gl.GL_TEXTURE0)
+        state.polygon_mode(gl.GL_FILL)
+
+    def draw_pass(self, state: GLStateTracker, draw_data, fb_width: int, fb_height: int,
+                  x: int = 0, y: int = 0):
+        # x/y offset the pass inside the bound framebuffer, used by the panel atlas
+        display_width, display_height = self.io.display_size
+
+        state.viewport(x, y, int(fb_width), int(fb_height))
 
         ortho_projection = (ctypes.c_float * 16)(
             2.0 / display_width, 0.0,                    0.0, 0.0,
@@ -295,86 +425,212 @@ class BGEPipelineRenderer(BaseOpenGLRenderer):
             -1.0,                1.0,                    0.0, 1.0,
         )
 
-        gl.glUseProgram(self._shader_handle)
+        state.use_program(self._shader_handle)
         gl.glUniform1i(self._attrib_location_tex, 0)
         gl.glUniformMatrix4fv(self._attrib_proj_mtx, 1,
                               gl.GL_FALSE, ortho_projection)
 
-        gl.glBindVertexArray(self._vao_handle)
+        state.bind_vertex_array(self._vao_handle)
+
+        processor = self.commands
+        processor.begin_frame(state, fb_width, fb_height, x, y)
+
+        if self.merge_cmd_lists:
+            self._draw_merged(draw_data, processor)
+        elif self.vertex_stream is not None:
+            self._draw_streamed(draw_data, processor)
+        else:
+            self._draw_per_list(draw_data, processor)
+        self.stats.record(draw_data, processor)
+
+        if not self.main:
+            # Fix for UPBGE depsgraph
+            self.panel.worldPosition.x += 0.01
+            self.panel.worldPosition.x -= 0.01
 
+    def invalidate(self):
+        # Force the next frame to be redrawn even if the draw data didn't change
+        self._last_fingerprint = None
+
+    def set_gl_state_mode(self, mode: str):
+        """
+        Choose how GL state is saved and restored around the UI pass:
+        "full" queries and restores everything every frame,
+        "tracked" queries the engine state every frame but not the program and
+        buffer bindings, which it leaves unbound, and only restores what the UI
+        pass changed,
+        "trust" never queries and restores changed state to the engine defaults.
+        Only use "trust" when nothing else changes GL state from the defaults,
+        otherwise the UI draws with and leaves behind the wrong state.
+        """
+        self.gl_state = GLStateTracker(mode)
+
+    def _draw_per_list(self, draw_data, processor: DrawCommandProcessor):
+        # Fallback path, reallocates the buffers for every command list
+        state = processor.state
         for commands in draw_data.cmd_lists:
 
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._vbo_handle)
+            state.bind_buffer(gl.GL_ARRAY_BUFFER, self._vbo_handle)
             # todo: check this (sizes)
+            vtx_size = commands.vtx_buffer.size() * imgui.VERTEX_SIZE
             gl.glBufferData(
                 gl.GL_ARRAY_BUFFER,
-                commands.vtx_buffer.size() * imgui.VERTEX_SIZE,
+                vtx_size,
                 ctypes.c_void_p(commands.vtx_buffer.data_address()),
                 gl.GL_STREAM_DRAW,
             )
+            resources.set_size(resources.BUFFER, self._vbo_handle, vtx_size)
 
-            gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self._elements_handle)
+            state.bind_buffer(
+                gl.GL_ELEMENT_ARRAY_BUFFER, self._elements_handle)
             # todo: check this (sizes)
+            idx_size = commands.idx_buffer.size() * imgui.INDEX_SIZE
             gl.glBufferData(
                 gl.GL_ELEMENT_ARRAY_BUFFER,
-                commands.idx_buffer.size() * imgui.INDEX_SIZE,
+                idx_size,
                 ctypes.c_void_p(commands.idx_buffer.data_address()),
                 gl.GL_STREAM_DRAW,
             )
+            resources.set_size(resources.BUFFER, self._elements_handle, idx_size)
 
-            # todo: allow to iterate over _CmdList
-            for command in commands.cmd_buffer:
-                gl.glBindTexture(gl.GL_TEXTURE_2D, command.texture_id)
-
-                # todo: use named tuple
-                x, y, z, w = command.clip_rect
-                gl.glScissor(int(x), int(fb_height - w),
-                             int(z - x), int(w - y))
-
-                if imgui.INDEX_SIZE == 2:
-                    gltype = gl.GL_UNSIGNED_SHORT
-                else:
-                    gltype = gl.GL_UNSIGNED_INT
+            processor.process(commands.cmd_buffer, 0, 0)
 
-                gl.glDrawElements(
-                    gl.GL_TRIANGLES,
-                    command.elem_count,
-                    gltype,
-                    ctypes.c_void_p(command.idx_offset * imgui.INDEX_SIZE)
-                )
+    def _draw_streamed(self, draw_data, processor: DrawCommandProcessor):
+        vertex_stream = self.vertex_stream
+        index_stream = self.index_stream
 
-        if not self.main:
-            # Fix for UPBGE depsgraph
-            self.panel.worldPosition.x += 0.01
-            self.panel.worldPosition.x -= 0.01
+        state = processor.state
+        state.bind_buffer(gl.GL_ARRAY_BUFFER, self._vbo_handle)
+        state.bind_buffer(gl.GL_ELEMENT_ARRAY_BUFFER, self._elements_handle)
 
-        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, last_fbo)
+        # Totals are known up front, so the ring only grows once per frame
+        vertex_stream.begin_frame(draw_data.total_vtx_count * imgui.VERTEX_SIZE)
+        index_stream.begin_frame(draw_data.total_idx_count * imgui.INDEX_SIZE)
 
-        # restore modified GL state
-        restore_common_gl_state(common_gl_state_tuple)
-        gl.glUseProgram(last_program)
-        gl.glActiveTexture(last_active_texture)
-        gl.glBindVertexArray(last_vertex_array)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, last_array_buffer)
-        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, last_element_array_buffer)
+        for commands in draw_data.cmd_lists:
+            vtx_offset = vertex_stream.write(
+                commands.vtx_buffer.data_address(),
+                commands.vtx_buffer.size() * imgui.VERTEX_SIZE)
+            idx_offset = index_stream.write(
+                commands.idx_buffer.data_address(),
+                commands.idx_buffer.size() * imgui.INDEX_SIZE)
+
+            processor.process(commands.cmd_buffer,
+                              vtx_offset // imgui.VERTEX_SIZE, idx_offset)
+
+        vertex_stream.end_frame()
+        index_stream.end_frame()
+
+    def _draw_merged(self, draw_data, processor: DrawCommandProcessor):
+        vtx_total = draw_data.total_vtx_count * imgui.VERTEX_SIZE
+        idx_total = draw_data.total_idx_count * imgui.INDEX_SIZE
+
+        # Staging areas only ever grow
+        if self._vtx_staging.size < vtx_total:
+            self._vtx_staging = np.empty(vtx_total * 2, dtype=np.uint8)
+        if self._idx_staging.size < idx_total:
+            self._idx_staging = np.empty(idx_total * 2, dtype=np.uint8)
+        vtx_address = self._vtx_staging.ctypes.data
+        idx_address = self._idx_staging.ctypes.data
+
+        # Copy all lists back to back, remembering where each one starts
+        cmd_lists = draw_data.cmd_lists
+        list_offsets = []
+        vtx_cursor = idx_cursor = 0
+        for commands in cmd_lists:
+            vtx_size = commands.vtx_buffer.size() * imgui.VERTEX_SIZE
+            idx_size = commands.idx_buffer.size() * imgui.INDEX_SIZE
+            ctypes.memmove(vtx_address + vtx_cursor,
+                           commands.vtx_buffer.data_address(), vtx_size)
+            ctypes.memmove(idx_address + idx_cursor,
+                           commands.idx_buffer.data_address(), idx_size)
+            list_offsets.append((vtx_cursor, idx_cursor))
+            vtx_cursor += vtx_size
+            idx_cursor += idx_size
+
+        state = processor.state
+        state.bind_buffer(gl.GL_ARRAY_BUFFER, self._vbo_handle)
+        state.bind_buffer(gl.GL_ELEMENT_ARRAY_BUFFER, self._elements_handle)
+
+        vertex_stream = self.vertex_stream
+        index_stream = self.index_stream
+        if vertex_stream is not None:
+            vertex_stream.begin_frame(vtx_total)
+            index_stream.begin_frame(idx_total)
+            vtx_base = vertex_stream.write(vtx_address, vtx_total)
+            idx_base = index_stream.write(idx_address, idx_total)
+        else:
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, vtx_total,
+                            ctypes.c_void_p(vtx_address), gl.GL_STREAM_DRAW)
+            gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, idx_total,
+                            ctypes.c_void_p(idx_address), gl.GL_STREAM_DRAW)
+            resources.set_size(resources.BUFFER, self._vbo_handle, vtx_total)
+            resources.set_size(resources.BUFFER, self._elements_handle, idx_total)
+            vtx_base = idx_base = 0
+
+        for commands, (vtx_offset, idx_offset) in zip(cmd_lists, list_offsets):
+            processor.process(commands.cmd_buffer,
+                              (vtx_base + vtx_offset) // imgui.VERTEX_SIZE,
+                              idx_base + idx_offset)
+
+        if vertex_stream is not None:
+            vertex_stream.end_frame()
+            index_stream.end_frame()
+
+    def get_stats(self):
+        """Counters of the last drawn frame, GPU time and totals, see RendererStats."""
+        return self.stats.info()
+
+    def get_stream_info(self):
+        """Capacity and reallocation counters of the streaming buffers, for tuning."""
+        if self.vertex_stream is None:
+            return None
+        return {
+            "vertex": self.vertex_stream.info(),
+            "index": self.index_stream.info(),
+        }
 
     def _invalidate_device_objects(self):
-        if self._vao_handle > -1:
-            gl.glDeleteVertexArrays(1, [self._vao_handle])
-        if self._vbo_handle > -1:
-            gl.glDeleteBuffers(1, [self._vbo_handle])
-        if self._elements_handle > -1:
-            gl.glDeleteBuffers(1, [self._elements_handle])
+        if self.atlas is not None:
+            self.atlas.remove(self)
+        elif self.render_call in self.scene.post_draw:
+            self.scene.post_draw.remove(self.render_call)
+
+        if self.vertex_stream is not None:
+            self.vertex_stream.release()
+            self.index_stream.release()
+            self.vertex_stream = self.index_stream = None
+
+        if self._vao_handle:
+            resources.delete_vertex_array(self._vao_handle)
+        if self._vbo_handle:
+            resources.delete_buffers([self._vbo_handle])
+        if self._elements_handle:
+            resources.delete_buffers([self._elements_handle])
         self._vao_handle = self._vbo_handle = self._elements_handle = 0
 
-        gl.glDeleteProgram(self._shader_handle)
+        if self.frame_buffer:
+            resources.delete_framebuffer(self.frame_buffer)
+            self.frame_buffer = None
+        self.stats.release()
+
+        if self._program is not None:
+            release_program(self._program)
+            self._program = None
         self._shader_handle = 0
 
-        if self._font_texture > -1:
-            gl.glDeleteTextures([self._font_texture])
-        self.io.fonts.tex_id = 0
+        if self.font_atlas is not None:
+            # The last renderer using the shared atlas deletes its texture
+            self.font_atlas.release()
+        else:
+            if self._font_texture:
+                resources.delete_textures([self._font_texture])
+            self.io.fonts.tex_id = 0
         self._font_texture = 0
 
+        # Anything this renderer created and didn't delete is a leak
+        resources.tracker.check_leaks(self)
+
 
 BGE_KEY_EVENT_MAP = {
     bge.events.TABKEY: imgui.Key.tab,
@@ -417,21 +673,57 @@ BGE_MODIFIER_EVENT_MAP = {
     bge.events.RIGHTSHIFTKEY: imgui.Key.im_gui_mod_shift,
 }
 
+BGE_MOUSE_BUTTON_MAP = {
+    bge.events.LEFTMOUSE: 0,
+    bge.events.RIGHTMOUSE: 1,
+    bge.events.MIDDLEMOUSE: 2,
+}
+
+
+class InputState:
+    """Keyboard and mouse state of one frame, read once and shared by every panel."""
+
+    __slots__ = ("keys", "text", "mouse_position", "buttons")
+
+    def __init__(self, keys, text: str, mouse_position: tuple[float, float], buttons) -> None:
+        self.keys = keys
+        self.text = text
+        self.mouse_position = mouse_position
+        self.buttons = buttons
+
+    @classmethod
+    def sample(cls, keyboard=None, mouse=None):
+        keyboard = keyboard or bge.logic.keyboard
+        mouse = mouse or bge.logic.mouse
+        return cls(frozenset(keyboard.activeInputs), keyboard.text,
+                   tuple(mouse.position), frozenset(mouse.activeInputs))
+
 
 class BGEImguiRenderer(BGEPipelineRenderer):
 
     INTERACTION_DIST = 100
     JUST_RAYCASTED = False
     CAST_DATA = (None, None, None)
+    # Find the panel under the mouse with PanelPicker instead of a physics raycast
+    ANALYTIC_PICKING = True
 
     def __init__(self, scene, cursor_path=None, main=True,
                  panel: bge.types.KX_GameObject | None = None,
-                 resolution: tuple[int, int] | None = None):
+                 resolution: tuple[int, int] | None = None,
+                 atlas: PanelAtlas | None = None,
+                 font_atlas: SharedFontAtlas | None = None):
         self.scene = scene
-        super().__init__(scene, main, panel, resolution)
+        super().__init__(scene, main, panel, resolution, atlas, font_atlas)
 
+        self.picker: PanelPicker | None = None
         if panel:
             self.context_id = int(panel["imgui_panel"])
+            if self.ANALYTIC_PICKING:
+                self.picker = PanelPicker.for_scene(scene)
+                # Panels with an "imgui_static" game property never move, their
+                # transform is only read once
+                self.picker.register(panel, self.context_id,
+                                     static=bool(panel.get("imgui_static", False)))
 
         self.io.backend_flags |= imgui.BackendFlags_.has_set_mouse_pos
 
@@ -448,6 +740,10 @@ class BGEImguiRenderer(BGEPipelineRenderer):
             self.show_cursor = True
 
         self.accept_input = True
+        # Set by PanelManager, a panel only gets the pointer while hovered
+        # and the keyboard while focused
+        self.pointer_focus = True
+        self.keyboard_focus = True
         self.font_scaling_factor = 1
 
         # Check for RanGE so deltaTime can be updated
@@ -455,9 +751,21 @@ class BGEImguiRenderer(BGEPipelineRenderer):
             self.useDeltaTime = True
         else:
             self.useDeltaTime = False
+        self._last_frame_time = None
+        # Time since the last frame imgui built, idle GUIs skip building frames
+        self._unbuilt_time = 0.0
+        self._delta_frame = None
 
         self._map_keys()
 
+    def _invalidate_device_objects(self):
+        self.cursor_renderer.release_cursors()
+        if self.picker is not None:
+            self.picker.unregister(self.panel)
+            PanelPicker.release_scene(self.scene)
+            self.picker = None
+        super()._invalidate_device_objects()
+
     def get_screen_size(self):
         return self.saved_disp_size
 
@@ -467,7 +775,24 @@ class BGEImguiRenderer(BGEPipelineRenderer):
     def _map_keys(self):
         self.key_map = BGE_KEY_EVENT_MAP.copy()
         self.modifier_map = BGE_MODIFIER_EVENT_MAP.copy()
-        self.active_modifiers = set()
+        self._build_input_lookup()
+
+        # Input state last sent to imgui, only changes are sent as events
+        self._keys_down: set = set()
+        self._buttons_down: set = set()
+        self._last_mouse_pos = None
+        # Events sent to imgui in the last update_io() call, and in total
+        self.input_events = 0
+        self.input_events_total = 0
+
+    def _build_input_lookup(self):
+        # bge key -> every imgui key it holds down, so only active inputs need checking.
+        # Call again after changing key_map or modifier_map.
+        lookup: dict[int, tuple] = {}
+        for mapping in (self.key_map, self.modifier_map):
+            for key, event in mapping.items():
+                lookup[key] = lookup.get(key, ()) + (event,)
+        self._key_lookup = lookup
 
     def update_screen_size(self):
         if not self.main:
@@ -486,16 +811,49 @@ class BGEImguiRenderer(BGEPipelineRenderer):
             self.saved_disp_size = width, height
             self.io.display_size = width, height
 
-    def update_io(self):
+    def update_io(self, inputs: InputState | None = None):
         io = self.io
 
         self.update_screen_size()
+        self.update_delta_time(io)
 
+        self.input_events = 0
         # # Only accept user input if this flag true
         if self.accept_input:
-            self.update_mouse_pos(io)
-            self.update_mouse_btns(io)
-            self.update_keyboard(io)
+            if inputs is None:
+                inputs = InputState.sample(self.keyboard, self.mouse)
+            if self.pointer_focus:
+                self.update_mouse_pos(io, inputs)
+                self.update_mouse_btns(io, inputs)
+            else:
+                self._release_pointer(io)
+            if self.keyboard_focus:
+                self.update_keyboard(io, inputs)
+            elif self._keys_down:
+                self._send_keys(io, set())
+        else:
+            # Don't leave keys stuck down while input is ignored
+            self.release_input()
+        self.input_events_total += self.input_events
+
+    def release_input(self):
+        """Release every held key and mouse button, and move the pointer off panels."""
+        io = self.io
+        self._release_pointer(io)
+        if self._keys_down:
+            self._send_keys(io, set())
+
+    @property
+    def input_held(self):
+        """Whether any key or mouse button is held down, imgui needs frames for key repeat and dragging."""
+        return bool(self._keys_down or self._buttons_down)
+
+    def _release_pointer(self, io: imgui.IO):
+        if self._buttons_down:
+            self._send_buttons(io, set())
+        if not self.main:
+            # Nothing on the panel is hovered anymore
+            self._send_mouse_pos(io, -imgui.FLT_MAX, -imgui.FLT_MAX)
 
     def camera_raycast(self, camera, mouse):
         # Weird fix for raycasting from camera
@@ -520,13 +878,13 @@ class BGEImguiRenderer(BGEPipelineRenderer):
         BGEImguiRenderer.CAST_DATA = data
         return data
 
-    def render_call(self):
-        # Override render call for camera raycast
-        super().render_call()
+    def frame_done(self):
+        # Reset the shared raycast once the frame is rendered
         BGEImguiRenderer.JUST_RAYCASTED = False
 
-    def update_mouse_pos(self, io: imgui.IO):
+    def update_mouse_pos(self, io: imgui.IO, inputs: InputState | None = None):
         mouse = self.mouse
+        position = inputs.mouse_position if inputs is not None else mouse.position
 
         if io.want_set_mouse_pos:
             mouse.position = (io.mouse_pos.x / self.io.display_size.x,
@@ -534,84 +892,134 @@ class BGEImguiRenderer(BGEPipelineRenderer):
             return
 
         if self.main:
-            x, y = ((mouse.position[0] * self.io.display_size[0]),
-                    (mouse.position[1] * self.io.display_size[1]))
+            x, y = ((position[0] * self.io.display_size[0]),
+                    (position[1] * self.io.display_size[1]))
         else:
-
-            # This is to ensure with multiple panels, you only raycast once
-            # per frame. Might not be worth the performance increase though,
-            # need to test more.
-            if BGEImguiRenderer.JUST_RAYCASTED:
-                hit_obj, point, _ = BGEImguiRenderer.CAST_DATA
-
+            if self.picker is not None:
+                hit = self.picker.pick(self.scene.active_camera, position,
+                                       self.INTERACTION_DIST, bge.logic.getFrameTime())
+                uv = (hit.u, hit.v) if hit is not None and hit.context_id == self.context_id else None
             else:
-                hit_obj, point, _ = self.camera_raycast(
-                    self.scene.active_camera, mouse)
-
-            if hit_obj and (hit_obj["imgui_panel"] == self.context_id):
-                hit_obj: bge.types.KX_GameObject
-
-                scale = hit_obj.localScale
-
-                dist, _, mouse_vec = hit_obj.getVectTo(point)
-                mouse_vec.magnitude *= dist
-                # Adjust scaling
-                mouse_vec.x /= scale.x
-                mouse_vec.y /= scale.y
-                # Reverse Y direction
-                mouse_vec.y *= -1
-                # Correct Translation
-                mouse_vec.x += 1
-                mouse_vec.y += 1
-                mouse_vec.x /= 2
-                mouse_vec.y /= 2
-
-                x, y = ((mouse_vec.x * self.io.display_size[0]),
-                        (mouse_vec.y * self.io.display_size[1]))
+                uv = self._raycast_uv(mouse)
 
+            if uv is not None:
+                x, y = ((uv[0] * self.io.display_size[0]),
+                        (uv[1] * self.io.display_size[1]))
             else:
                 x, y = -imgui.FLT_MAX, -imgui.FLT_MAX
 
-        io.add_mouse_pos_event(x, y)
+        self._send_mouse_pos(io, x, y)
         self.cursor_renderer.update_position(x, y)
 
-    def update_mouse_btns(self, io: imgui.IO):
-        mouse = self.mouse
-
-        active_btns = mouse.activeInputs
+    def _send_mouse_pos(self, io: imgui.IO, x: float, y: float):
+        if (x, y) != self._last_mouse_pos:
+            io.add_mouse_pos_event(x, y)
+            self._last_mouse_pos = x, y
+            self.input_events += 1
 
-        io.add_mouse_button_event(0, bge.events.LEFTMOUSE in active_btns)
-        io.add_mouse_button_event(1, bge.events.RIGHTMOUSE in active_btns)
+    def _raycast_uv(self, mouse):
+        # This is to ensure with multiple panels, you only raycast once
+        # per frame. Might not be worth the performance increase though,
+        # need to test more.
+        if BGEImguiRenderer.JUST_RAYCASTED:
+            hit_obj, point, _ = BGEImguiRenderer.CAST_DATA
 
-        io.add_mouse_button_event(2, bge.events.MIDDLEMOUSE in active_btns)
+        else:
+            hit_obj, point, _ = self.camera_raycast(
+                self.scene.active_camera, mouse)
+
+        if not hit_obj or hit_obj["imgui_panel"] != self.context_id:
+            return None
+        hit_obj: bge.types.KX_GameObject
+
+        scale = hit_obj.localScale
+
+        dist, _, mouse_vec = hit_obj.getVectTo(point)
+        mouse_vec.magnitude *= dist
+        # Adjust scaling
+        mouse_vec.x /= scale.x
+        mouse_vec.y /= scale.y
+        # Reverse Y direction
+        mouse_vec.y *= -1
+        # Correct Translation
+        mouse_vec.x += 1
+        mouse_vec.y += 1
+        mouse_vec.x /= 2
+        mouse_vec.y /= 2
+        return mouse_vec.x, mouse_vec.y
+
+    def update_mouse_btns(self, io: imgui.IO, inputs: InputState | None = None):
+        active_btns = inputs.buttons if inputs is not None else self.mouse.activeInputs
+
+        pressed = {button for key, button in BGE_MOUSE_BUTTON_MAP.items()
+                   if key in active_btns}
+        self._send_buttons(io, pressed)
 
         if bge.events.WHEELUPMOUSE in active_btns:
             io.add_mouse_wheel_event(0, 0.5)
+            self.input_events += 1
         elif bge.events.WHEELDOWNMOUSE in active_btns:
             io.add_mouse_wheel_event(0, -0.5)
-        else:
-            io.add_mouse_wheel_event(0, 0)
-
-        if self.useDeltaTime:
-            # Update deltatime in range, may not be necessary
-            io.delta_time = bge.logic.deltaTime()
-
-    def update_keyboard(self, io: imgui.IO):
-        keyboard = self.keyboard
-        active_keys = keyboard.activeInputs
+            self.input_events += 1
 
-        for key, event in self.key_map.items():
-            io.add_key_event(event, key in active_keys)
+    def _send_buttons(self, io: imgui.IO, pressed: set):
+        for button in pressed - self._buttons_down:
+            io.add_mouse_button_event(button, True)
+        for button in self._buttons_down - pressed:
+            io.add_mouse_button_event(button, False)
+        self.input_events += len(pressed ^ self._buttons_down)
+        self._buttons_down = pressed
 
-        self.active_modifiers.clear()
-        for key, event in self.modifier_map.items():
-            if event not in self.active_modifiers:
-                io.add_key_event(event, key in active_keys)
-                self.active_modifiers.add(event)
+    def update_delta_time(self, io: imgui.IO):
+        now = time.perf_counter()
 
-        text = keyboard.text
+        restart = self._last_frame_time is None or self.resumed
+        if self.useDeltaTime:
+            # Update deltatime in range, may not be necessary
+            delta = bge.logic.deltaTime()
+        elif restart:
+            # First frame, or the panel was hidden for a while. Don't let
+            # the hidden time show up as one huge frame.
+            delta = 1 / bge.logic.getLogicTicRate()
+        else:
+            delta = now - self._last_frame_time
+
+        self.resumed = False
+        self._last_frame_time = now
+
+        # Ticks without a new frame (idle mode) add up, so imgui's clock
+        # keeps up with the engine's
+        frame_count = imgui.get_frame_count()
+        if restart or frame_count != self._delta_frame:
+            self._delta_frame = frame_count
+            self._unbuilt_time = 0.0
+        self._unbuilt_time += delta
+        io.delta_time = max(self._unbuilt_time, 1e-6)
+
+    def update_keyboard(self, io: imgui.IO, inputs: InputState | None = None):
+        if inputs is None:
+            inputs = InputState.sample(self.keyboard, self.mouse)
+        lookup = self._key_lookup
+
+        pressed = set()
+        for key in inputs.keys:
+            events = lookup.get(key)
+            if events is not None:
+                pressed.update(events)
+        self._send_keys(io, pressed)
+
+        text = inputs.text
         for character in text:
             io.add_input_character(ord(character))
+        self.input_events += len(text)
+
+    def _send_keys(self, io: imgui.IO, pressed: set):
+        for event in pressed - self._keys_down:
+            io.add_key_event(event, True)
+        for event in self._keys_down - pressed:
+            io.add_key_event(event, False)
+        self.input_events += len(pressed ^ self._keys_down)
+        self._keys_down = pressed
 
     def set_scaling_factors(self, font_scaling_factor: int, screen_scaling_factor: int = 1):
         io = self.io
@@ -628,31 +1036,87 @@ class BGEImguiRenderer(BGEPipelineRenderer):
     def set_main_font(self, path: str, font_size_in_pixels: int, *args, **kwargs):
         io = self.io
 
-        io.fonts.clear()
-        self.main_font = io.fonts.add_font_from_file_ttf(
-            path, self.font_scaling_factor * font_size_in_pixels, *args, **kwargs)
+        size = self.font_scaling_factor * font_size_in_pixels
+        if self.font_atlas is not None:
+            # Other contexts use fonts of a shared atlas, add to it instead of clearing it
+            self.main_font = self.font_atlas.add_font(None, path, size, *args, **kwargs)
+            io.font_default = self.main_font
+        else:
+            io.fonts.clear()
+            self.main_font = io.fonts.add_font_from_file_ttf(
+                path, size, *args, **kwargs)
+        self.font_sources = [font_source(path, size, *args, **kwargs)]
+        self._font_objects = [self.main_font]
+
+        self.refresh_font_texture()
 
+    def select_main_font(self, name: str):
+        """Use a font added to the shared atlas with SharedFontAtlas.add_font as this context's default."""
+        if self.font_atlas is None:
+            raise ValueError("select_main_font needs a shared font_atlas")
+        self.main_font = self.font_atlas.get_font(name)
+        self.io.font_default = self.main_font
         self.refresh_font_texture()
 
     def add_extra_font(self, path: str, font_size_in_pixels: int, *args, **kwargs):
         io = self.io
-        newFont = io.fonts.add_font_from_file_ttf(
-            path, self.font_scaling_factor * font_size_in_pixels, *args, **kwargs)
+        size = self.font_scaling_factor * font_size_in_pixels
+        if self.font_atlas is not None:
+            newFont = self.font_atlas.add_font(None, path, size, *args, **kwargs)
+        else:
+            newFont = io.fonts.add_font_from_file_ttf(
+                path, size, *args, **kwargs)
+        self.font_sources.append(font_source(path, size, *args, **kwargs))
+        self._font_objects.append(newFont)
         self.refresh_font_texture()
         return newFont
 
+    def font_batch(self):
+        """
+        Queue several fonts and build and upload the atlas only once, e.g.
+            with backend.font_batch() as fonts:
+                fonts.set_main(path, 20)
+                big = fonts.add(path, 40)
+        """
+        return FontBatch(self)
+
     def draw_cursor(self):
         if self.show_cursor:
             self.cursor_renderer.draw_cursor()
 
 
-def get_rgba_pixels(image: Image.Image):
-    if image.mode == "RGB":
-        return image.tobytes("raw", "RGBX")
-    else:
-        if image.mode != "RGBA":
-            image = image.convert("RGBA")
-        return image.tobytes("raw", "RGBA")
+class FontBatch:
+    """Fonts added through a batch are built and uploaded together when the with block ends."""
+
+    def __init__(self, renderer: BGEImguiRenderer) -> None:
+        self.renderer = renderer
+        self.fonts: list[imgui.ImFont] = []
+        # Seconds spent building and uploading the atlas, set when the batch ends
+        self.build_time: float | None = None
+
+    def set_main(self, path: str, font_size_in_pixels: int, *args, **kwargs):
+        self.renderer.set_main_font(path, font_size_in_pixels, *args, **kwargs)
+        font = self.renderer.main_font
+        self.fonts = [font]
+        return font
+
+    def add(self, path: str, font_size_in_pixels: int, *args, **kwargs):
+        font = self.renderer.add_extra_font(
+            path, font_size_in_pixels, *args, **kwargs)
+        self.fonts.append(font)
+        return font
+
+    def __enter__(self):
+        self.renderer._font_batches += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        renderer = self.renderer
+        renderer._font_batches -= 1
+        if renderer._font_batches == 0 and renderer._fonts_pending:
+            renderer.refresh_font_texture()
+            self.build_time = renderer.font_build_time
+        return False
 
 
 class CursorRenderer:
@@ -663,7 +1127,8 @@ class CursorRenderer:
 
         self.cursor_width = 25
         self.cursor_height = 25
-        self.cursorDict = {}
+        self.registry = TextureRegistry.default()
+        self.cursorDict: dict[str, ImageTexture] = {}
 
     def set_size(self, width: int, height: int):
         self.cursor_width = width
@@ -679,32 +1144,20 @@ class CursorRenderer:
 
         cursor_list = glob.glob(file_path + '/**/*.png', recursive=True)
 
-        self.cursorDict = {}
+        self.release_cursors()
 
         for cursor_file in cursor_list:
             path = pathlib.Path(cursor_file)
-            image = Image.open(path)
-            width, height = image.size
-            cursorPixels = get_rgba_pixels(image)
-
             fileName = os.path.basename(path)
             fileWithoutExtension = os.path.splitext(fileName)[0]
 
-            texID = gl.glGenTextures(1)
+            # Shared with any image widget showing the same file
+            self.cursorDict[fileWithoutExtension] = self.registry.acquire(path)
 
-            gl.glBindTexture(gl.GL_TEXTURE_2D, texID)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_BORDER)
-            gl.glTexParameteri(
-                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_BORDER)
-            gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, width,
-                            height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, cursorPixels)
-            image.close()
-            self.cursorDict[fileWithoutExtension] = texID
+    def release_cursors(self):
+        for texture in self.cursorDict.values():
+            self.registry.release(texture)
+        self.cursorDict = {}
 
     def draw_cursor(self):
         width = self.cursor_width
@@ -720,13 +1173,720 @@ class CursorRenderer:
 
         match imgui.get_mouse_cursor():
             case imgui.MouseCursor_.arrow:
-                textureID = self.cursorDict["arrow"]
+                texture = self.cursorDict["arrow"]
             case imgui.MouseCursor_.resize_nwse:
-                textureID = self.cursorDict["resize"]
+                texture = self.cursorDict["resize"]
             case _:
-                textureID = self.cursorDict["arrow"]
+                texture = self.cursorDict["arrow"]
+
+        # Cursors are tiny, load them right away (again, if evicted)
+        self.registry.touch(texture)
+        if not texture.ensure_applied():
+            return
+        draw_list.add_image(texture.texture_ids[0], pos, pos2)
+
+
+class StreamingBuffer:
+    """
+    Grow-only GL buffer split into a ring of per-frame slots.
+    Every frame writes into the next slot, and a fence placed after the frame's
+    draws is waited on before that slot is written again.
+    """
+
+    MIN_SLOT_SIZE = 64 * 1024
+    # Max time in nanoseconds to wait on a fence before writing anyway
+    FENCE_TIMEOUT = 100_000_000
+
+    def __init__(self, target, handle, alignment: int, slots=3,
+                 shrink_delay=10.0, mapped=False) -> None:
+        self.target = target
+        self.handle = handle
+        self.alignment = alignment
+        self.slots = max(1, slots)
+        self.shrink_delay = shrink_delay
+        self.mapped = mapped
+
+        self.slot = -1
+        self.slot_size = 0
+        self.cursor = 0
+        self.fences = [None] * self.slots
+
+        # Usage tracking, exposed for tuning
+        self.high_water = 0
+        self.reallocations = 0
+        self.shrinks = 0
+        self.fence_waits = 0
+        self._window_peak = 0
+        self._last_busy = time.monotonic()
+
+    @property
+    def capacity(self):
+        return self.slot_size * self.slots
+
+    def _slot_size_for(self, size: int):
+        size = max(size, self.MIN_SLOT_SIZE)
+        # Grow to the next power of two so we don't reallocate every few frames
+        size = 1 << (size - 1).bit_length()
+        return -(-size // self.alignment) * self.alignment
+
+    def _allocate(self, slot_size: int):
+        # Orphans the old storage, the driver keeps it alive for pending draws
+        self._delete_fences()
+        self.slot_size = slot_size
+        gl.glBufferData(self.target, self.capacity, None, gl.GL_DYNAMIC_DRAW)
+        resources.set_size(resources.BUFFER, self.handle, self.capacity)
+        self.reallocations += 1
+
+    def _wait_slot(self, slot: int):
+        fence = self.fences[slot]
+        if fence is None:
+            return
+        result = gl.glClientWaitSync(fence, 0, 0)
+        if result == gl.GL_TIMEOUT_EXPIRED:
+            self.fence_waits += 1
+            gl.glClientWaitSync(
+                fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, self.FENCE_TIMEOUT)
+        gl.glDeleteSync(fence)
+        self.fences[slot] = None
+
+    def _delete_fences(self):
+        for fence in self.fences:
+            if fence is not None:
+                gl.glDeleteSync(fence)
+        self.fences = [None] * self.slots
+
+    def begin_frame(self, size: int):
+        """Start a frame needing size bytes. The buffer must be bound to its target."""
+        self.high_water = max(self.high_water, size)
+        self._window_peak = max(self._window_peak, size)
+
+        now = time.monotonic()
+        if size > self.slot_size:
+            self._allocate(self._slot_size_for(size))
+            self._last_busy = now
+            self._window_peak = size
+        elif size > self.slot_size // 4:
+            self._last_busy = now
+            self._window_peak = size
+        elif (now - self._last_busy > self.shrink_delay
+              and self.slot_size > self.MIN_SLOT_SIZE):
+            # Usage stayed low for a while, give the memory back
+            self._allocate(self._slot_size_for(self._window_peak))
+            self.shrinks += 1
+            self._last_busy = now
+            self._window_peak = size
+
+        self.slot = (self.slot + 1) % self.slots
+        self._wait_slot(self.slot)
+        self.cursor = self.slot * self.slot_size
+
+    def write(self, address: int, size: int):
+        """Copy size bytes from address into the current slot, returns the byte offset."""
+        offset = self.cursor
+        if size <= 0:
+            return offset
+
+        if self.mapped:
+            pointer = gl.glMapBufferRange(
+                self.target, offset, size,
+                gl.GL_MAP_WRITE_BIT | gl.GL_MAP_INVALIDATE_RANGE_BIT | gl.GL_MAP_UNSYNCHRONIZED_BIT)
+            ctypes.memmove(pointer, address, size)
+            gl.glUnmapBuffer(self.target)
+        else:
+            gl.glBufferSubData(self.target, offset, size,
+                               ctypes.c_void_p(address))
+
+        self.cursor = offset + size
+        return offset
+
+    def end_frame(self):
+        # Call after the draws that read this slot have been issued
+        self.fences[self.slot] = gl.glFenceSync(
+            gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def info(self):
+        return {
+            "capacity": self.capacity,
+            "slot_size": self.slot_size,
+            "high_water": self.high_water,
+            "reallocations": self.reallocations,
+            "shrinks": self.shrinks,
+            "fence_waits": self.fence_waits,
+        }
+
+    def release(self):
+        # The buffer handle itself is owned (and deleted) by the renderer
+        self._delete_fences()
+
+
+# Content revisions of textures that change without changing their id
+_texture_revisions: dict[int, int] = {}
+
+
+def touch_texture(texture_id: int):
+    """Mark a texture's contents as changed, so unchanged-frame checks redraw panels showing it."""
+    _texture_revisions[texture_id] = _texture_revisions.get(texture_id, 0) + 1
 
-        draw_list.add_image(textureID, pos, pos2)
+
+def fingerprint_draw_data(draw_data, previous=None):
+    """
+    Cheap per-frame fingerprint of draw data, as (layout, crc).
+    The layout is the display size, the buffer sizes and the texture (and its
+    revision), clip rect and range of every command. Only when it matches the
+    previous fingerprint's is the CRC of the vertex/index bytes taken, which
+    catches e.g. moved sliders, recolored widgets and animated images, whose
+    frames are UVs into one sprite sheet. Otherwise crc is None.
+    """
+    command_keys = []
+    buffers = []
+    revisions = _texture_revisions
+
+    for commands in draw_data.cmd_lists:
+        buffers.append((commands.vtx_buffer.size(), commands.idx_buffer.size()))
+        for command in commands.cmd_buffer:
+            texture = command.texture_id
+            command_keys.append((
+                texture,
+                revisions.get(texture, 0),
+                tuple(command.clip_rect),
+                command.elem_count,
+                command.idx_offset,
+                command.vtx_offset,
+            ))
+
+    layout = (tuple(draw_data.display_size), tuple(buffers), tuple(command_keys))
+    if previous is None or layout != previous[0]:
+        return layout, None
+
+    crc = 0
+    for commands, (vtx_count, idx_count) in zip(draw_data.cmd_lists, buffers):
+        if vtx_count:
+            crc = zlib.crc32((ctypes.c_char * (vtx_count * imgui.VERTEX_SIZE)).from_address(
+                commands.vtx_buffer.data_address()), crc)
+        if idx_count:
+            crc = zlib.crc32((ctypes.c_char * (idx_count * imgui.INDEX_SIZE)).from_address(
+                commands.idx_buffer.data_address()), crc)
+    return layout, crc
+
+
+class GPUTimer:
+    """
+    GL_TIME_ELAPSED queries in a ring, each read back once its result is
+    available a frame or two later, so timing never stalls on the GPU.
+    A frame is left untimed if its query slot is still busy.
+    """
+
+    QUERIES = 3
+
+    def __init__(self, owner=None, queries: int | None = None) -> None:
+        self.queries = resources.gen_queries(
+            queries or self.QUERIES, owner, "GPU timer")
+        self._pending = [False] * len(self.queries)
+        # PyOpenGL can't allocate GLuint64 results itself
+        self._result = ctypes.c_uint64()
+        self._index = 0
+        self._running = False
+
+        # Milliseconds of the most recent frame read back, None until the first one
+        self.last_ms: float | None = None
+        self.samples = 0
+        self.dropped = 0
+
+    def _collect(self):
+        count = len(self.queries)
+        # Oldest query first, results become available in order
+        for offset in range(count):
+            index = (self._index + offset) % count
+            if not self._pending[index]:
+                continue
+            query = self.queries[index]
+            if not gl.glGetQueryObjectiv(query, gl.GL_QUERY_RESULT_AVAILABLE):
+                break
+            gl.glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT, ctypes.byref(self._result))
+            self.last_ms = self._result.value / 1e6
+            self._pending[index] = False
+            self.samples += 1
+
+    def begin(self):
+        self._collect()
+        if self._pending[self._index]:
+            self.dropped += 1
+            return False
+        gl.glBeginQuery(gl.GL_TIME_ELAPSED, self.queries[self._index])
+        self._running = True
+        return True
+
+    def end(self):
+        if not self._running:
+            return
+        gl.glEndQuery(gl.GL_TIME_ELAPSED)
+        self._running = False
+        self._pending[self._index] = True
+        self._index = (self._index + 1) % len(self.queries)
+
+    def release(self):
+        resources.delete_queries(self.queries)
+        self.queries = []
+
+
+class RendererStats:
+    """
+    What a renderer measures, in one place: counters of the last drawn frame,
+    running totals and, with gpu_timing, the GPU time of its pass.
+    """
+
+    def __init__(self, renderer: BGEPipelineRenderer) -> None:
+        self.renderer = renderer
+        self.gpu_timer: GPUTimer | None = None
+
+        # Last drawn frame
+        self.cmd_lists = 0
+        self.draw_calls = 0
+        self.vertices = 0
+        self.indices = 0
+        self.texture_binds = 0
+        self.bytes_uploaded = 0
+
+        # Totals
+        self.frames_drawn = 0
+        self.total_draw_calls = 0
+        self.total_bytes_uploaded = 0
+
+    def record(self, draw_data, processor: DrawCommandProcessor):
+        self.cmd_lists = draw_data.cmd_lists_count
+        self.draw_calls = processor.draws_issued
+        self.vertices = draw_data.total_vtx_count
+        self.indices = draw_data.total_idx_count
+        self.texture_binds = processor.texture_binds
+        # Every path uploads all vertices and indices once per drawn frame
+        self.bytes_uploaded = (self.vertices * imgui.VERTEX_SIZE
+                               + self.indices * imgui.INDEX_SIZE)
+
+        self.frames_drawn += 1
+        self.total_draw_calls += self.draw_calls
+        self.total_bytes_uploaded += self.bytes_uploaded
+
+    def begin_gpu_timer(self):
+        """Start timing the pass, returns the timer to end() or None if this frame isn't timed."""
+        if self.gpu_timer is None:
+            self.gpu_timer = GPUTimer(self.renderer)
+        return self.gpu_timer if self.gpu_timer.begin() else None
+
+    @property
+    def gpu_time_ms(self):
+        return self.gpu_timer.last_ms if self.gpu_timer is not None else None
+
+    def info(self):
+        renderer = self.renderer
+        return {
+            "cmd_lists": self.cmd_lists,
+            "draw_calls": self.draw_calls,
+            "vertices": self.vertices,
+            "indices": self.indices,
+            "texture_binds": self.texture_binds,
+            "bytes_uploaded": self.bytes_uploaded,
+            "gpu_time_ms": self.gpu_time_ms,
+            "gpu_frames_dropped": self.gpu_timer.dropped if self.gpu_timer is not None else 0,
+            "frames_drawn": self.frames_drawn,
+            "frames_skipped": renderer.frames_skipped,
+            "total_draw_calls": self.total_draw_calls,
+            "total_bytes_uploaded": self.total_bytes_uploaded,
+            "commands": renderer.commands.info(),
+            "streams": renderer.get_stream_info(),
+            "font_builds": renderer.font_builds,
+            "font_build_ms": renderer.font_build_time * 1000,
+            "input_events": getattr(renderer, "input_events", 0),
+        }
+
+    def release(self):
+        if self.gpu_timer is not None:
+            self.gpu_timer.release()
+            self.gpu_timer = None
+
+
+class DrawCommandProcessor:
+    """
+    Turns imgui draw commands into GL draws.
+    Commands that are fully clipped are dropped, texture/scissor changes go
+    through the state tracker so unchanged state is skipped, and adjacent
+    commands sharing texture, clip rect and a contiguous index range are
+    merged into one draw.
+    """
+
+    def __init__(self) -> None:
+        if imgui.INDEX_SIZE == 2:
+            self.gltype = gl.GL_UNSIGNED_SHORT
+        else:
+            self.gltype = gl.GL_UNSIGNED_INT
+
+        self.state: GLStateTracker | None = None
+        self.fb_width = 0
+        self.fb_height = 0
+        self.offset_x = 0
+        self.offset_y = 0
+
+        # Per frame counters
+        self.draws_issued = 0
+        self.draws_merged = 0
+        self.draws_culled = 0
+        self.state_changes_skipped = 0
+        self.texture_binds = 0
+
+    def begin_frame(self, state: GLStateTracker, fb_width: int, fb_height: int,
+                    offset_x: int = 0, offset_y: int = 0):
+        self.state = state
+        self.fb_width = fb_width
+        self.fb_height = fb_height
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+        self.draws_issued = 0
+        self.draws_merged = 0
+        self.draws_culled = 0
+        self.state_changes_skipped = 0
+        self.texture_binds = 0
+
+    def process(self, cmd_buffer, base_vertex: int, idx_base: int):
+        """Draw one command list whose buffers start at base_vertex / idx_base (bytes)."""
+        fb_width = self.fb_width
+        fb_height = self.fb_height
+        offset_x = self.offset_x
+        offset_y = self.offset_y
+
+        # Pending draw: texture, scissor, vertex offset, first index, index count
+        pending = None
+
+        for command in cmd_buffer:
+            count = command.elem_count
+            x, y, z, w = command.clip_rect
+
+            # Drop commands that can't produce any pixels
+            if (count == 0 or z <= x or w <= y or z <= 0 or w <= 0
+                    or x >= fb_width or y >= fb_height):
+                self.draws_culled += 1
+                continue
+
+            scissor = (int(x) + offset_x, int(fb_height - w) + offset_y,
+                       int(z - x), int(w - y))
+            texture = command.texture_id
+            vtx_offset = command.vtx_offset
+            idx_offset = command.idx_offset
+
+            if (pending is not None
+                    and pending[0] == texture
+                    and pending[1] == scissor
+                    and pending[2] == vtx_offset
+                    and pending[3] + pending[4] == idx_offset):
+                pending[4] += count
+                self.draws_merged += 1
+                continue
+
+            if pending is not None:
+                self._draw(pending, base_vertex, idx_base)
+            pending = [texture, scissor, vtx_offset, idx_offset, count]
+
+        if pending is not None:
+            self._draw(pending, base_vertex, idx_base)
+
+    def _draw(self, pending, base_vertex: int, idx_base: int):
+        texture, scissor, vtx_offset, idx_offset, count = pending
+        state = self.state
+
+        if state.bind_texture(texture):
+            self.texture_binds += 1
+        else:
+            self.state_changes_skipped += 1
+        if not state.scissor(*scissor):
+            self.state_changes_skipped += 1
+
+        offset = ctypes.c_void_p(idx_base + idx_offset * imgui.INDEX_SIZE)
+        base_vertex += vtx_offset
+        if base_vertex:
+            gl.glDrawElementsBaseVertex(
+                gl.GL_TRIANGLES, count, self.gltype, offset, base_vertex)
+        else:
+            gl.glDrawElements(gl.GL_TRIANGLES, count, self.gltype, offset)
+        self.draws_issued += 1
+
+    def info(self):
+        return {
+            "draws_issued": self.draws_issued,
+            "draws_merged": self.draws_merged,
+            "draws_culled": self.draws_culled,
+            "state_changes_skipped": self.state_changes_skipped,
+            "texture_binds": self.texture_binds,
+        }
+
+
+class GLStateTracker:
+    """
+    Shadow copy of the GL state touched by the UI pass.
+    Redundant state changes are skipped, and at the end of the pass only the
+    state that was actually changed is restored.
+
+    In "tracked" mode everything but the bindings of what the UI pass brings
+    its own of (program, vertex array and buffers) is read every frame. Those
+    are left unbound afterwards, like in "trust" mode, as the engine binds
+    its own before every draw.
+    """
+
+    FULL = "full"
+    TRACKED = "tracked"
+    TRUST = "trust"
+    MODES = (FULL, TRACKED, TRUST)
+
+    CAPABILITIES = {
+        "blend": gl.GL_BLEND,
+        "cull_face": gl.GL_CULL_FACE,
+        "depth_test": gl.GL_DEPTH_TEST,
+        "scissor_test": gl.GL_SCISSOR_TEST,
+    }
+
+    BUFFER_KEYS = {
+        gl.GL_ARRAY_BUFFER: "array_buffer",
+        gl.GL_ELEMENT_ARRAY_BUFFER: "element_array_buffer",
+    }
+
+    # Same order the old render_call restored the state in
+    RESTORE_ORDER = (
+        "framebuffer",
+        "texture",
+        "blend_equation",
+        "blend_func",
+        "polygon_mode",
+        "blend",
+        "cull_face",
+        "depth_test",
+        "scissor_test",
+        "scissor_box",
+        "viewport",
+        "program",
+        "active_texture",
+        "vertex_array",
+        "array_buffer",
+        "element_array_buffer",
+    )
+
+    # What the engine is assumed to have bound when the post_draw callbacks run:
+    # GL's initial state, with the depth test and face culling the scene pass
+    # leaves enabled. Written against UPBGE 0.4, check them again when "trust"
+    # mode is used with another engine. Viewport and scissor box default to
+    # the whole window. tests/test_gl_state.py checks every mode restores them.
+    ENGINE_DEFAULTS = {
+        "framebuffer": 0,
+        "texture": 0,
+        "blend_equation": (gl.GL_FUNC_ADD, gl.GL_FUNC_ADD),
+        "blend_func": (gl.GL_ONE, gl.GL_ZERO),
+        "polygon_mode": gl.GL_FILL,
+        "blend": False,
+        "cull_face": True,
+        "depth_test": True,
+        "scissor_test": False,
+        "program": 0,
+        "active_texture": gl.GL_TEXTURE0,
+        "vertex_array": 0,
+        "array_buffer": 0,
+        "element_array_buffer": 0,
+    }
+
+    # Bound by the UI pass itself, not queried in "tracked" mode
+    OWNED_KEYS = ("program", "vertex_array", "array_buffer", "element_array_buffer")
+
+    def __init__(self, mode=TRACKED) -> None:
+        if mode not in self.MODES:
+            raise ValueError(
+                f"Unknown GL state mode {mode!r}, expected one of {self.MODES}")
+        self.mode = mode
+
+        self.saved: dict | None = None
+        self.current = {}
+        self.dirty = set()
+
+        # Per frame counters
+        self.queries = 0
+        self.skipped = 0
+
+    def begin(self):
+        self.queries = 0
+        self.skipped = 0
+        self.dirty.clear()
+
+        if self.mode == GLStateTracker.FULL:
+            self.saved = self._query()
+        else:
+            self.saved = self._engine_defaults()
+            if self.mode == GLStateTracker.TRACKED:
+                self.saved.update(self._query_engine_state())
+
+        self.current = dict(self.saved)
+        if self.mode == GLStateTracker.TRACKED:
+            # The engine's bindings are unknown, always bind our own objects
+            for key in self.OWNED_KEYS:
+                self.current[key] = None
+
+    def end(self):
+        if self.mode == GLStateTracker.FULL:
+            changed = self.saved.keys()
+        else:
+            changed = self.dirty
+
+        saved = self.saved
+        for key in self.RESTORE_ORDER:
+            if key in changed:
+                self._apply(key, saved[key])
+        self.dirty.clear()
+
+    def _query(self):
+        state = self._query_engine_state()
+        state.update({
+            "program": int(gl.glGetIntegerv(gl.GL_CURRENT_PROGRAM)),
+            "array_buffer": int(gl.glGetIntegerv(gl.GL_ARRAY_BUFFER_BINDING)),
+            "element_array_buffer": int(gl.glGetIntegerv(
+                gl.GL_ELEMENT_ARRAY_BUFFER_BINDING)),
+            "vertex_array": int(gl.glGetIntegerv(gl.GL_VERTEX_ARRAY_BINDING)),
+        })
+        self.queries += 4
+        return state
+
+    def _query_engine_state(self):
+        (
+            last_texture,
+            last_viewport,
+            last_enable_blend,
+            last_enable_cull_face,
+            last_enable_depth_test,
+            last_enable_scissor_test,
+            last_scissor_box,
+            last_blend_src,
+            last_blend_dst,
+            last_blend_equation_rgb,
+            last_blend_equation_alpha,
+            last_front_and_back_polygon_mode,
+        ) = get_common_gl_state()
+
+        state = {
+            "texture": int(last_texture),
+            "viewport": tuple(int(value) for value in last_viewport),
+            "blend": bool(last_enable_blend),
+            "cull_face": bool(last_enable_cull_face),
+            "depth_test": bool(last_enable_depth_test),
+            "scissor_test": bool(last_enable_scissor_test),
+            "scissor_box": tuple(int(value) for value in last_scissor_box),
+            "blend_func": (int(last_blend_src), int(last_blend_dst)),
+            "blend_equation": (int(last_blend_equation_rgb),
+                               int(last_blend_equation_alpha)),
+            "polygon_mode": int(last_front_and_back_polygon_mode),
+            "active_texture": int(gl.glGetIntegerv(gl.GL_ACTIVE_TEXTURE)),
+            "framebuffer": int(gl.glGetIntegerv(gl.GL_FRAMEBUFFER_BINDING)),
+        }
+        self.queries += 14
+        return state
+
+    def _engine_defaults(self):
+        state = dict(self.ENGINE_DEFAULTS)
+        window = (0, 0, bge.render.getWindowWidth(),
+                  bge.render.getWindowHeight())
+        state["viewport"] = window
+        state["scissor_box"] = window
+        return state
+
+    def _apply(self, key, value):
+        match key:
+            case "framebuffer":
+                gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, value)
+            case "texture":
+                gl.glBindTexture(gl.GL_TEXTURE_2D, value)
+            case "blend_equation":
+                gl.glBlendEquationSeparate(*value)
+            case "blend_func":
+                gl.glBlendFunc(*value)
+            case "polygon_mode":
+                gl.glPolygonMode(gl.GL_FRONT_AND_BACK, value)
+            case "blend" | "cull_face" | "depth_test" | "scissor_test":
+                if value:
+                    gl.glEnable(self.CAPABILITIES[key])
+                else:
+                    gl.glDisable(self.CAPABILITIES[key])
+            case "scissor_box":
+                gl.glScissor(*value)
+            case "viewport":
+                gl.glViewport(*value)
+            case "program":
+                gl.glUseProgram(value)
+            case "active_texture":
+                gl.glActiveTexture(value)
+            case "vertex_array":
+                gl.glBindVertexArray(value)
+            case "array_buffer":
+                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, value)
+            case "element_array_buffer":
+                gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, value)
+
+    def _set(self, key, value):
+        if self.current.get(key) == value:
+            self.skipped += 1
+            return False
+        self.current[key] = value
+        self.dirty.add(key)
+        self._apply(key, value)
+        return True
+
+    def touch(self, *keys):
+        # Mark state changed outside the tracker, its shadow value is unknown now
+        for key in keys:
+            self.current[key] = None
+            self.dirty.add(key)
+
+    def enable(self, key: str):
+        self._set(key, True)
+
+    def disable(self, key: str):
+        self._set(key, False)
+
+    def bind_framebuffer(self, framebuffer: int):
+        self._set("framebuffer", framebuffer)
+
+    def bind_texture(self, texture: int):
+        return self._set("texture", texture)
+
+    def blend_equation(self, mode):
+        self._set("blend_equation", (mode, mode))
+
+    def blend_func(self, src, dst):
+        self._set("blend_func", (src, dst))
+
+    def polygon_mode(self, mode):
+        self._set("polygon_mode", mode)
+
+    def scissor(self, x: int, y: int, width: int, height: int):
+        return self._set("scissor_box", (x, y, width, height))
+
+    def viewport(self, x: int, y: int, width: int, height: int):
+        self._set("viewport", (x, y, width, height))
+
+    def use_program(self, program: int):
+        self._set("program", program)
+
+    def active_texture(self, unit):
+        self._set("active_texture", unit)
+
+    def bind_vertex_array(self, vertex_array: int):
+        if self._set("vertex_array", vertex_array):
+            # The element buffer binding is part of the vertex array state
+            self.current["element_array_buffer"] = None
+
+    def bind_buffer(self, target, buffer: int):
+        key = self.BUFFER_KEYS[target]
+        if self.current.get(key) == buffer:
+            self.skipped += 1
+            return
+        gl.glBindBuffer(target, buffer)
+        self.current[key] = buffer
+        # Binding an element buffer into our own vertex array leaves the
+        # engine's vertex array untouched, so there is nothing to restore
+        if (target != gl.GL_ELEMENT_ARRAY_BUFFER
+                or self.current["vertex_array"] == self.saved["vertex_array"]):
+            self.dirty.add(key)
 
 
 def get_common_gl_state():
@@ -734,7 +1894,7 @@ def get_common_gl_state():
     Backups the current OpenGL state
     Returns a tuple of results for glGet / glIsEnabled calls
     NOTE: when adding more backuped state in the future,
-    make sure to update function `restore_common_gl_state`
+    make sure to update GLStateTracker._query_engine_state
     """
     last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
     last_viewport = gl.glGetIntegerv(gl.GL_VIEWPORT)
@@ -762,56 +1922,3 @@ def get_common_gl_state():
         last_blend_equation_alpha,
         last_front_and_back_polygon_mode,
     )
-
-
-def restore_common_gl_state(common_gl_state_tuple):
-    """
-    Takes a tuple after calling function `get_common_gl_state`,
-    to set the given OpenGL state back as it was before rendering the UI
-    """
-    (
-        last_texture,
-        last_viewport,
-        last_enable_blend,
-        last_enable_cull_face,
-        last_enable_depth_test,
-        last_enable_scissor_test,
-        last_scissor_box,
-        last_blend_src,
-        last_blend_dst,
-        last_blend_equation_rgb,
-        last_blend_equation_alpha,
-        last_front_and_back_polygon_mode,
-    ) = common_gl_state_tuple
-
-    gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
-    gl.glBlendEquationSeparate(
-        last_blend_equation_rgb, last_blend_equation_alpha)
-    gl.glBlendFunc(last_blend_src, last_blend_dst)
-
-    gl.glPolygonMode(gl.GL_FRONT_AND_BACK, last_front_and_back_polygon_mode)
-
-    if last_enable_blend:
-        gl.glEnable(gl.GL_BLEND)
-    else:
-        gl.glDisable(gl.GL_BLEND)
-
-    if last_enable_cull_face:
-        gl.glEnable(gl.GL_CULL_FACE)
-    else:
-        gl.glDisable(gl.GL_CULL_FACE)
-
-    if last_enable_depth_test:
-        gl.glEnable(gl.GL_DEPTH_TEST)
-    else:
-        gl.glDisable(gl.GL_DEPTH_TEST)
-
-    if last_enable_scissor_test:
-        gl.glEnable(gl.GL_SCISSOR_TEST)
-    else:
-        gl.glDisable(gl.GL_SCISSOR_TEST)
-
-    gl.glScissor(last_scissor_box[0], last_scissor_box[1],
-                 last_scissor_box[2], last_scissor_box[3])
-    gl.glViewport(last_viewport[0], last_viewport[1],
-                  last_viewport[2], last_viewport[3])
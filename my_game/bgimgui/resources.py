@@ -0,0 +1,201 @@
+from __future__ import annotations
+import os
+
+from OpenGL import GL as gl
+
+TEXTURE = "texture"
+BUFFER = "buffer"
+FRAMEBUFFER = "framebuffer"
+VERTEX_ARRAY = "vertex_array"
+PROGRAM = "program"
+QUERY = "query"
+
+
+class GLResourceLeak(RuntimeError):
+    pass
+
+
+class GLResource:
+    def __init__(self, kind: str, handle: int, owner: str, owner_id, label: str) -> None:
+        self.kind = kind
+        self.handle = handle
+        self.owner = owner
+        self.owner_id = owner_id
+        self.label = label
+        self.size = 0
+
+    def __repr__(self) -> str:
+        label = f" {self.label}" if self.label else ""
+        return f"<{self.kind} {self.handle}{label}, {self.size} bytes, owner {self.owner}>"
+
+
+class GLResourceTracker:
+    """
+    Records every GL object bgimgui creates with its owner and byte size.
+    Everything should go through the gen_*/delete_* helpers below, so the
+    live totals are exact and anything left over after a shutdown is a leak.
+    """
+
+    # Raise GLResourceLeak from check_leaks() instead of printing, for tests.
+    # Also enabled by the BGIMGUI_STRICT_GL environment variable.
+    STRICT = bool(os.environ.get("BGIMGUI_STRICT_GL"))
+
+    def __init__(self) -> None:
+        self.live: dict[tuple[str, int], GLResource] = {}
+        self.created = 0
+        self.deleted = 0
+
+    @staticmethod
+    def _describe(owner):
+        # Objects are only remembered by id, so tracking never keeps them alive
+        if owner is None or isinstance(owner, str):
+            owner = owner or "bgimgui"
+            return owner, owner
+        return f"{type(owner).__name__}@{id(owner):x}", id(owner)
+
+    def add(self, kind: str, handle: int, owner=None, label=""):
+        name, owner_id = self._describe(owner)
+        self.live[(kind, int(handle))] = GLResource(
+            kind, int(handle), name, owner_id, label)
+        self.created += 1
+
+    def remove(self, kind: str, handle: int):
+        if self.live.pop((kind, int(handle)), None) is not None:
+            self.deleted += 1
+
+    def set_size(self, kind: str, handle: int, size: int):
+        resource = self.live.get((kind, int(handle)))
+        if resource is not None:
+            resource.size = int(size)
+
+    def owned_by(self, owner):
+        owner_id = self._describe(owner)[1]
+        return [resource for resource in self.live.values() if resource.owner_id == owner_id]
+
+    def totals(self):
+        """Live count and bytes per kind."""
+        totals = {}
+        for resource in self.live.values():
+            count, size = totals.get(resource.kind, (0, 0))
+            totals[resource.kind] = (count + 1, size + resource.size)
+        return totals
+
+    def info(self):
+        return {
+            "live": len(self.live),
+            "bytes": sum(resource.size for resource in self.live.values()),
+            "created": self.created,
+            "deleted": self.deleted,
+            "totals": self.totals(),
+        }
+
+    def check_leaks(self, owner=None):
+        """Resources still alive for owner (everything if None). Raises in STRICT mode."""
+        leaks = list(self.live.values()) if owner is None else self.owned_by(owner)
+        if leaks:
+            message = f"{len(leaks)} GL resources left behind: " + \
+                ", ".join(repr(resource) for resource in leaks)
+            if self.STRICT:
+                raise GLResourceLeak(message)
+            print(message)
+        return leaks
+
+
+tracker = GLResourceTracker()
+
+
+def _as_list(handles, count: int):
+    # PyOpenGL returns a bare int for a single object
+    if count == 1 and not hasattr(handles, "__len__"):
+        return [int(handles)]
+    return [int(handle) for handle in handles]
+
+
+def gen_textures(count: int, owner=None, label=""):
+    textures = _as_list(gl.glGenTextures(count), count)
+    for texture in textures:
+        tracker.add(TEXTURE, texture, owner, label)
+    return textures
+
+
+def gen_texture(owner=None, label=""):
+    return gen_textures(1, owner, label)[0]
+
+
+def delete_textures(textures):
+    textures = [int(texture) for texture in textures]
+    if textures:
+        gl.glDeleteTextures(textures)
+        for texture in textures:
+            tracker.remove(TEXTURE, texture)
+
+
+def gen_buffers(count: int, owner=None, label=""):
+    buffers = _as_list(gl.glGenBuffers(count), count)
+    for buffer in buffers:
+        tracker.add(BUFFER, buffer, owner, label)
+    return buffers
+
+
+def gen_buffer(owner=None, label=""):
+    return gen_buffers(1, owner, label)[0]
+
+
+def delete_buffers(buffers):
+    buffers = [int(buffer) for buffer in buffers]
+    if buffers:
+        gl.glDeleteBuffers(len(buffers), buffers)
+        for buffer in buffers:
+            tracker.remove(BUFFER, buffer)
+
+
+def gen_framebuffer(owner=None, label=""):
+    framebuffer = int(gl.glGenFramebuffers(1))
+    tracker.add(FRAMEBUFFER, framebuffer, owner, label)
+    return framebuffer
+
+
+def delete_framebuffer(framebuffer: int):
+    gl.glDeleteFramebuffers(1, [int(framebuffer)])
+    tracker.remove(FRAMEBUFFER, framebuffer)
+
+
+def gen_vertex_array(owner=None, label=""):
+    vertex_array = int(gl.glGenVertexArrays(1))
+    tracker.add(VERTEX_ARRAY, vertex_array, owner, label)
+    return vertex_array
+
+
+def delete_vertex_array(vertex_array: int):
+    gl.glDeleteVertexArrays(1, [int(vertex_array)])
+    tracker.remove(VERTEX_ARRAY, vertex_array)
+
+
+def create_program(owner=None, label=""):
+    program = int(gl.glCreateProgram())
+    tracker.add(PROGRAM, program, owner, label)
+    return program
+
+
+def delete_program(program: int):
+    gl.glDeleteProgram(int(program))
+    tracker.remove(PROGRAM, program)
+
+
+def gen_queries(count: int, owner=None, label=""):
+    queries = _as_list(gl.glGenQueries(count), count)
+    for query in queries:
+        tracker.add(QUERY, query, owner, label)
+    return queries
+
+
+def delete_queries(queries):
+    queries = [int(query) for query in queries]
+    if queries:
+        gl.glDeleteQueries(len(queries), queries)
+        for query in queries:
+            tracker.remove(QUERY, query)
+
+
+def set_size(kind: str, handle: int, size: int):
+    tracker.set_size(kind, handle, size)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import ctypes
+import hashlib
+import os
+import pathlib
+import struct
+
+from OpenGL import GL as gl
+
+from . import resources
+
+
+class ShaderProgram:
+    """A linked GL program shared by every renderer using the same shader sources."""
+
+    def __init__(self, key: str, handle: int) -> None:
+        self.key = key
+        self.handle = handle
+        self.refs = 0
+        self.from_binary = False
+        self._uniforms: dict[str, int] = {}
+        self._attributes: dict[str, int] = {}
+
+    def uniform(self, name: str):
+        location = self._uniforms.get(name)
+        if location is None:
+            location = self._uniforms[name] = gl.glGetUniformLocation(
+                self.handle, name)
+        return location
+
+    def attribute(self, name: str):
+        location = self._attributes.get(name)
+        if location is None:
+            location = self._attributes[name] = gl.glGetAttribLocation(
+                self.handle, name)
+        return location
+
+
+# Process-wide cache, shader source key -> program
+_programs: dict[str, ShaderProgram] = {}
+
+
+def _program_key(vertex_src: str, fragment_src: str):
+    digest = hashlib.sha1()
+    digest.update(vertex_src.encode())
+    digest.update(b"\0")
+    digest.update(fragment_src.encode())
+    return digest.hexdigest()
+
+
+def _binary_path(cache_dir: str | pathlib.Path, key: str):
+    # Binaries are only valid for the driver that produced them
+    driver = b"%s|%s|%s" % (gl.glGetString(gl.GL_VENDOR) or b"",
+                            gl.glGetString(gl.GL_RENDERER) or b"",
+                            gl.glGetString(gl.GL_VERSION) or b"")
+    driver_hash = hashlib.sha1(driver).hexdigest()[:12]
+    return pathlib.Path(cache_dir) / f"{key}-{driver_hash}.bin"
+
+
+def _supports_binaries():
+    return gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+
+def _load_binary(path: pathlib.Path):
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    if len(data) < 4:
+        return None
+
+    binary_format, = struct.unpack("<I", data[:4])
+    binary = data[4:]
+
+    program = resources.create_program("shader cache")
+    gl.glProgramBinary(program, binary_format, binary, len(binary))
+    if not gl.glGetProgramiv(program, gl.GL_LINK_STATUS):
+        # Driver update or corrupt file, fall back to compiling
+        resources.delete_program(program)
+        return None
+    return program
+
+
+def _save_binary(path: pathlib.Path, program: int):
+    length = int(gl.glGetProgramiv(program, gl.GL_PROGRAM_BINARY_LENGTH))
+    if length <= 0:
+        return
+
+    binary = (ctypes.c_ubyte * length)()
+    written = gl.GLsizei(0)
+    binary_format = gl.GLenum(0)
+    gl.glGetProgramBinary(program, length, ctypes.byref(written),
+                          ctypes.byref(binary_format), binary)
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first so a crash never leaves a truncated binary
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "wb") as binary_file:
+            binary_file.write(struct.pack("<I", binary_format.value))
+            binary_file.write(bytes(binary)[:written.value])
+        os.replace(temp_path, path)
+    except OSError as error:
+        print(f"Could not save shader binary to {path}: {error}")
+
+
+def _compile_program(vertex_src: str, fragment_src: str, retrievable: bool):
+    program = resources.create_program("shader cache")
+    # note: no need to store shader parts handles after linking
+    vertex_shader = gl.glCreateShader(gl.GL_VERTEX_SHADER)
+    fragment_shader = gl.glCreateShader(gl.GL_FRAGMENT_SHADER)
+
+    gl.glShaderSource(vertex_shader, vertex_src)
+    gl.glShaderSource(fragment_shader, fragment_src)
+    gl.glCompileShader(vertex_shader)
+    gl.glCompileShader(fragment_shader)
+
+    gl.glAttachShader(program, vertex_shader)
+    gl.glAttachShader(program, fragment_shader)
+
+    if retrievable:
+        gl.glProgramParameteri(
+            program, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE)
+
+    gl.glLinkProgram(program)
+
+    # note: after linking shaders can be removed
+    gl.glDetachShader(program, vertex_shader)
+    gl.glDetachShader(program, fragment_shader)
+    gl.glDeleteShader(vertex_shader)
+    gl.glDeleteShader(fragment_shader)
+    return program
+
+
+def acquire_program(vertex_src: str, fragment_src: str,
+                    binary_cache_dir: str | pathlib.Path | None = None):
+    """
+    Get a linked program for these sources, compiling it only the first time.
+    Pass binary_cache_dir to also keep linked program binaries on disk between launches.
+    Every acquire must be paired with release_program().
+    """
+    key = _program_key(vertex_src, fragment_src)
+
+    program = _programs.get(key)
+    if program is None:
+        use_binaries = binary_cache_dir is not None and _supports_binaries()
+        handle = None
+        if use_binaries:
+            path = _binary_path(binary_cache_dir, key)
+            handle = _load_binary(path)
+
+        if handle is None:
+            handle = _compile_program(vertex_src, fragment_src, use_binaries)
+            if use_binaries:
+                _save_binary(path, handle)
+            program = ShaderProgram(key, handle)
+        else:
+            program = ShaderProgram(key, handle)
+            program.from_binary = True
+
+        _programs[key] = program
+
+    program.refs += 1
+    return program
+
+
+def release_program(program: ShaderProgram):
+    program.refs -= 1
+    if program.refs <= 0:
+        resources.delete_program(program.handle)
+        program.handle = 0
+        if _programs.get(program.key) is program:
+            del _programs[program.key]
+
+
+def live_programs():
+    return {key: program.refs for key, program in _programs.items()}
@@ -0,0 +1,456 @@
+from __future__ import annotations
+from collections import OrderedDict
+import bisect
+import itertools
+import pathlib
+import queue
+import time
+
+from OpenGL import GL as gl
+from PIL import Image, UnidentifiedImageError
+import numpy as np
+
+from . import resources
+from .asset_cache import DecodedImageCache, decode_frames, fit_size, get_rgba_pixels
+
+
+class ImageTexture:
+    """
+    Decoded pixels and GL textures of one image file, shared by every
+    ImageHelper showing it. Get these from a TextureRegistry.
+
+    All frames of an animation go into sprite sheets (a grid of frames per
+    texture) and are looked up by UV. Frames are decoded in chunks of
+    CHUNK_FRAMES; when loaded through an ImageLoader the decoder waits while
+    CHUNKS_AHEAD chunks are queued for upload, so only a few chunks of
+    pixels are ever in memory at once.
+    """
+
+    CHUNK_FRAMES = 8
+    CHUNKS_AHEAD = 2
+    # Largest sheet side, frames that don't fit spill into more sheets
+    SHEET_MAX_SIZE = 4096
+    # Pixels around each frame of a linear filtered sheet, filled with the
+    # frame's edge pixels so filtering never blends in the neighbouring frames
+    SHEET_PADDING = 1
+
+    def __init__(self, key: tuple, path: pathlib.Path, glob="", linear=True,
+                 cache: DecodedImageCache | None = None, max_size: int | None = None) -> None:
+        self.key = key
+        self.path = path
+        self.glob = glob
+        self.linear = linear
+        # Downscale to fit max_size x max_size when decoding, for thumbnails
+        self.max_size = max_size
+        # Decoded image cache to load from instead of decoding, see asset_cache.py
+        self.cache = cache
+        self.width = 1
+        self.height = 1
+        self.loaded = False
+        self.loading = False
+        self.applied = False
+        self.missing = False
+        self.invalid = False
+        # Waiting in an ImageLoader, which also does the upload
+        self.queued = False
+        self.animated = False
+        self.durations: list[float] = []
+        self.texture_ids: list[int] = []
+        self.resolved_path: pathlib.Path = None
+
+        # Sheet layout, see _layout()
+        self.frame_count = 0
+        self.columns = 1
+        self.frames_per_sheet = 1
+        self.padding = 0
+        self.sheet_sizes: list[tuple[int, int]] = []
+        self.uploaded_frames = 0
+        self._allocated = False
+        # (first frame, pixels) chunks from the decoder, None once it's done
+        self._chunks: queue.Queue | None = None
+        self._cumulative: list[float] = []
+        # Shared animation clock, time the animation started at
+        self.start_time = None
+
+        # Registry bookkeeping
+        self.refs = 0
+        self.last_drawn = None
+        self.evictions = 0
+        self.resolve()
+
+    def resolve(self):
+        self.resolved_path = self.path
+        if self.glob:
+            paths = list(self.resolved_path.glob(self.glob))
+            if not paths:
+                self.missing = True
+                return
+            # If you want you can setup preferred extensions like this:
+            # paths.sort(key=lambda path: path.suffix != ".gif")
+            # This will prefer .gif files!
+            self.resolved_path = paths[0]
+        self.missing = not self.resolved_path.is_file()
+
+    @property
+    def size_bytes(self):
+        """GPU memory held by the uploaded sheets."""
+        if not self.texture_ids:
+            return 0
+        return sum(width * height * 4 for width, height in self.sheet_sizes)
+
+    def _layout(self, frame_count: int):
+        self.frame_count = frame_count
+        # A single frame has no neighbours to bleed into it
+        self.padding = self.SHEET_PADDING if self.linear and frame_count > 1 else 0
+        width, height = self.cell_size
+        self.columns = max(1, min(frame_count, self.SHEET_MAX_SIZE // width))
+        rows_per_sheet = max(1, self.SHEET_MAX_SIZE // height)
+        self.frames_per_sheet = self.columns * rows_per_sheet
+
+        self.sheet_sizes = []
+        remaining = frame_count
+        while remaining > 0:
+            frames = min(remaining, self.frames_per_sheet)
+            rows = -(-frames // self.columns)
+            columns = min(frames, self.columns)
+            self.sheet_sizes.append((columns * width, rows * height))
+            remaining -= frames
+
+    @property
+    def cell_size(self):
+        return self.width + 2 * self.padding, self.height + 2 * self.padding
+
+    def _pad(self, pixels: np.ndarray):
+        # Extrude the edge pixels of a frame into its padding
+        padding = self.padding
+        if not padding:
+            return pixels
+        frame = pixels.reshape(self.height, self.width, 4)
+        return np.pad(frame, ((padding, padding), (padding, padding), (0, 0)), mode="edge")
+
+    def reload(self, ready=None):
+        """
+        Decodes the image, safe to run on a loader thread. With ready given,
+        ready(self) is called as soon as the size is known and chunks get
+        uploaded (see upload()) while the rest is still decoding.
+        """
+        self.loaded = False
+        self.loading = True
+        self.applied = False
+        self.resolve()
+
+        self.invalid = False
+        self.animated = False
+        self.durations = []
+        self._cumulative = []
+        self.width, self.height = (1, 1)
+        self.frame_count = 0
+        self.uploaded_frames = 0
+        self.start_time = None
+        self._chunks = None
+        # Old sheets are replaced on the main thread, in upload()
+        self._allocated = False
+
+        if self.missing:
+            self._finish_reload(ready)
+            return
+
+        cached = None
+        if self.cache is not None:
+            # Baked pixels are memory-mapped, no decoding at all
+            cached = self.cache.load(self.resolved_path, self.max_size)
+
+        if cached is not None:
+            image = None
+            self.width, self.height = cached.width, cached.height
+            frame_count = cached.frame_count
+            frames = zip((pixels.reshape(-1) for pixels in cached.frames),
+                         cached.durations.tolist())
+        else:
+            try:
+                image = Image.open(self.resolved_path)
+            except UnidentifiedImageError:
+                self.invalid = True
+                self._finish_reload(ready)
+                return
+            self.width, self.height = fit_size(image.size, self.max_size)
+            frame_count = getattr(image, "n_frames", 1)
+            frames = ((np.frombuffer(pixels, dtype=np.uint8), duration)
+                      for pixels, duration in decode_frames(image, self.max_size))
+
+        self._layout(frame_count)
+        chunks = self._chunks = queue.Queue(
+            self.CHUNKS_AHEAD if ready is not None else 0)
+        if ready is not None:
+            ready(self)
+
+        durations = []
+        try:
+            chunk = []
+            first = 0
+            for pixels, duration in frames:
+                chunk.append(self._pad(pixels))
+                durations.append(duration / 1250)
+                # Technically this should be / 1000 (millis to seconds) but I found that 1250 works better...
+                if len(chunk) == self.CHUNK_FRAMES:
+                    chunks.put((first, chunk))
+                    first += len(chunk)
+                    chunk = []
+            if chunk:
+                chunks.put((first, chunk))
+        except (OSError, ValueError) as error:
+            print(f"Failed to decode {self.resolved_path}: {error}")
+            self.invalid = True
+        finally:
+            if image is not None:
+                image.close()
+            self.durations = durations
+            self._cumulative = list(itertools.accumulate(durations))
+            self.animated = len(durations) > 1
+            self.loaded = True
+            self.loading = False
+            chunks.put(None)
+
+    def _finish_reload(self, ready):
+        self.loaded = True
+        self.loading = False
+        if ready is not None:
+            ready(self)
+
+    def _allocate(self):
+        last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+        gl_filter = gl.GL_LINEAR if self.linear else gl.GL_NEAREST
+        for width, height in self.sheet_sizes:
+            texture_id = resources.gen_texture(self, self.path.name)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
+            gl.glTexParameteri(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl_filter)
+            gl.glTexParameteri(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl_filter)
+            gl.glTexParameteri(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_BORDER)
+            gl.glTexParameteri(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_BORDER)
+            gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, width,
+                            height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None)
+            resources.set_size(resources.TEXTURE, texture_id, width * height * 4)
+            self.texture_ids.append(texture_id)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
+
+    def _upload_chunk(self, first: int, frames: list):
+        last_texture = gl.glGetIntegerv(gl.GL_TEXTURE_BINDING_2D)
+        cell_width, cell_height = self.cell_size
+        for index, pixels in enumerate(frames, first):
+            sheet, cell = divmod(index, self.frames_per_sheet)
+            row, column = divmod(cell, self.columns)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture_ids[sheet])
+            gl.glTexSubImage2D(gl.GL_TEXTURE_2D, 0, column * cell_width, row * cell_height,
+                               cell_width, cell_height, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, pixels)
+        self.uploaded_frames = first + len(frames)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, last_texture)
+
+    def upload(self, deadline: float | None = None):
+        """
+        Upload decoded chunks, on the main thread. Without a deadline
+        (a time.perf_counter() value) it waits for the decoder to finish.
+        Returns True once the image is fully uploaded or has nothing to upload.
+        """
+        if self._chunks is None:
+            return True
+        if not self._allocated:
+            self.delete_textures()
+            self._allocate()
+            self._allocated = True
+
+        uploaded = False
+        while True:
+            if uploaded and deadline is not None and time.perf_counter() >= deadline:
+                return False
+            try:
+                chunk = self._chunks.get(block=deadline is None)
+            except queue.Empty:
+                return False
+            if chunk is None:
+                break
+            self._upload_chunk(*chunk)
+            uploaded = True
+
+        self._chunks = None
+        if self.invalid:
+            self.delete_textures()
+        else:
+            self.applied = True
+        return True
+
+    def apply(self):
+        self.upload()
+
+    def ensure_applied(self):
+        """Load and upload right away if needed, for small images that can't wait for a loader."""
+        if not self.loaded and not self.loading:
+            self.reload()
+        if self.loaded and not self.applied and not self.queued:
+            self.upload()
+        return self.applied
+
+    def current_frame(self, now: float):
+        """Frame shown at time now, every user of an animation plays it on the same clock."""
+        if not self.animated:
+            return 0
+        if self.start_time is None:
+            self.start_time = now
+        elapsed = (now - self.start_time) % self._cumulative[-1]
+        return min(bisect.bisect_right(self._cumulative, elapsed), self.frame_count - 1)
+
+    def frame_uvs(self, frame: int, uv0=(0, 0), uv1=(1, 1)):
+        """Texture and UVs of a frame, uv0/uv1 select a part of the frame (e.g. crop_to_ratio)."""
+        sheet, cell = divmod(frame, self.frames_per_sheet)
+        row, column = divmod(cell, self.columns)
+        sheet_width, sheet_height = self.sheet_sizes[sheet]
+        cell_width, cell_height = self.cell_size
+        scale_u = self.width / sheet_width
+        scale_v = self.height / sheet_height
+        u = (column * cell_width + self.padding) / sheet_width
+        v = (row * cell_height + self.padding) / sheet_height
+        return (self.texture_ids[sheet],
+                (u + uv0[0] * scale_u, v + uv0[1] * scale_v),
+                (u + uv1[0] * scale_u, v + uv1[1] * scale_v))
+
+    def delete_textures(self):
+        if self.texture_ids:
+            resources.delete_textures(self.texture_ids)
+            self.texture_ids.clear()
+
+    def evict(self):
+        """Free the GPU copy, it's loaded again the next time it's drawn."""
+        self.delete_textures()
+        self._allocated = False
+        self._chunks = None
+        self.loaded = False
+        self.applied = False
+        self.evictions += 1
+
+
+class TextureRegistry:
+    """
+    Shares one ImageTexture per file and load options between every user, and
+    keeps the uploaded textures under BUDGET_BYTES by evicting the ones drawn
+    least recently.
+    """
+
+    # GPU bytes kept before least recently drawn textures get evicted
+    BUDGET_BYTES = 256 * 1024 * 1024
+    # Directory of decoded images (see bake_assets.py), e.g.
+    # bge.logic.expandPath("//image_cache"). None decodes every launch.
+    CACHE_DIR = None
+
+    _default: TextureRegistry | None = None
+
+    def __init__(self, budget_bytes: int | None = None,
+                 cache_dir: str | pathlib.Path | None = None) -> None:
+        self.budget_bytes = self.BUDGET_BYTES if budget_bytes is None else budget_bytes
+        cache_dir = cache_dir or self.CACHE_DIR
+        self.cache = DecodedImageCache(cache_dir) if cache_dir else None
+        # Least recently drawn first
+        self.textures: OrderedDict[tuple, ImageTexture] = OrderedDict()
+        self.frame = None
+        self.evictions = 0
+        # Draws of animated textures, idle UIs keep updating while theirs grows
+        self.animated_draws = 0
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def update_default(cls, frame=None):
+        if cls._default is not None:
+            cls._default.update(frame)
+
+    def make_key(self, path: str | pathlib.Path, glob="", linear=True,
+                 max_size: int | None = None):
+        path = pathlib.Path(path)
+        if not glob:
+            # Different spellings of the same file share one texture
+            path = path.resolve()
+        return (str(path), glob, linear, max_size)
+
+    def acquire(self, path: str | pathlib.Path, glob="", linear=True,
+                max_size: int | None = None):
+        """Shared texture for this file and options, pair with release(). max_size loads a thumbnail."""
+        key = self.make_key(path, glob, linear, max_size)
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = ImageTexture(
+                key, pathlib.Path(path), glob, linear, self.cache, max_size)
+            self.textures[key] = texture
+        texture.refs += 1
+        return texture
+
+    def release(self, texture: ImageTexture):
+        # Unused textures stay cached until the budget needs their memory
+        texture.refs -= 1
+
+    def touch(self, texture: ImageTexture):
+        """Mark a texture as drawn this frame."""
+        if texture.animated:
+            self.animated_draws += 1
+        if texture.last_drawn != self.frame or self.frame is None:
+            texture.last_drawn = self.frame
+            self.textures.move_to_end(texture.key)
+
+    @property
+    def used_bytes(self):
+        return sum(texture.size_bytes for texture in self.textures.values())
+
+    def update(self, frame=None):
+        """Evict textures over the budget, call once per frame before drawing."""
+        if frame is not None and frame == self.frame:
+            return
+        self.evict_over_budget()
+        self.frame = frame
+
+    def now(self):
+        """Time on the shared animation clock."""
+        if isinstance(self.frame, (int, float)):
+            return self.frame
+        return time.perf_counter()
+
+    def evict_over_budget(self):
+        used = self.used_bytes
+        for texture in list(self.textures.values()):
+            if used <= self.budget_bytes:
+                break
+            if texture.last_drawn == self.frame and self.frame is not None:
+                # Everything after this was drawn last frame too, keep it
+                break
+
+            if texture.applied:
+                used -= texture.size_bytes
+                texture.evict()
+                self.evictions += 1
+            if texture.refs <= 0 and not (texture.loading or texture.queued):
+                del self.textures[texture.key]
+
+    def info(self):
+        return {
+            "textures": len(self.textures),
+            "uploaded": sum(texture.applied for texture in self.textures.values()),
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+            "evictions": self.evictions,
+        }
+
+    def purge_unused(self):
+        """Delete every texture nothing holds a reference to, e.g. when a scene or GUI shuts down."""
+        for texture in list(self.textures.values()):
+            if texture.refs <= 0 and not (texture.loading or texture.queued):
+                texture.delete_textures()
+                del self.textures[texture.key]
+
+    def clear(self):
+        for texture in self.textures.values():
+            texture.delete_textures()
+        self.textures.clear()
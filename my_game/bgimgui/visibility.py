@@ -0,0 +1,65 @@
+from __future__ import annotations
+import bge
+import math
+
+
+class VisibilityPolicy:
+    """
+    Decides whether a world-space UI panel is worth updating this frame.
+    Hidden panels skip input, UI building and rendering entirely.
+    """
+
+    def __init__(self, frustum=True, facing=True, max_distance: float | None = None,
+                 radius: float | None = None) -> None:
+        # Test the panel bounds against the camera frustum
+        self.frustum = frustum
+        # Hide panels whose front (local +Z) faces away from the camera
+        self.facing = facing
+        # Hide panels further away than this, None to disable
+        self.max_distance = max_distance
+        # Local bounding sphere radius, computed from the panel mesh if None
+        self.radius = radius
+
+        self._radius_cache: dict[int, float] = {}
+
+    def local_radius(self, panel: bge.types.KX_GameObject):
+        if self.radius is not None:
+            return self.radius
+
+        key = id(panel)
+        radius = self._radius_cache.get(key)
+        if radius is None:
+            radius = 0.0
+            for mesh in panel.meshes:
+                for material_id in range(len(mesh.materials)):
+                    for index in range(mesh.getVertexArrayLength(material_id)):
+                        vertex = mesh.getVertex(material_id, index)
+                        radius = max(radius, vertex.XYZ.length)
+            if radius == 0.0:
+                # Default plane spans -1..1 on both axes
+                radius = math.sqrt(2)
+            self._radius_cache[key] = radius
+        return radius
+
+    def is_visible(self, panel: bge.types.KX_GameObject,
+                   camera: bge.types.KX_Camera | None):
+        if camera is None:
+            return True
+
+        to_camera = camera.worldPosition - panel.worldPosition
+
+        if self.max_distance is not None and to_camera.length > self.max_distance:
+            return False
+
+        if self.facing:
+            normal = panel.worldOrientation.col[2]
+            if normal.dot(to_camera) <= 0:
+                return False
+
+        if self.frustum:
+            radius = self.local_radius(panel) * max(panel.worldScale)
+            inside = camera.sphereInsideFrustum(panel.worldPosition, radius)
+            if inside == camera.OUTSIDE:
+                return False
+
+        return True
@@ -1,7 +1,9 @@
 from __future__ import annotations
 from .image import ImageHelper, ForegroundImageHelper, BackgroundImageHelper
+from .profiler import Profiler, profiler
+import functools
 import os
-from imgui_bundle import imgui
+from imgui_bundle import imgui, implot
 import bge.logic
 
 
@@ -103,7 +105,183 @@ class BackgroundImage(ImageWidget):
         super().draw()
 
 
+class ImageGallery:
+    """
+    Grid of image thumbnails that scales to thousands of items. Only the
+    visible rows are laid out, images load at the thumbnail size covering a
+    cell, the hovered/selected image upgrades to full resolution, and items
+    scrolled far out of view give their textures back.
+    """
+
+    # Sizes thumbnails are loaded at, the smallest one covering a cell is used
+    THUMBNAIL_LEVELS = (64, 128, 256, 512)
+    # Rows past the visible ones to load ahead of scrolling
+    PREFETCH_ROWS = 2
+    # Rows past the visible ones to keep loaded before releasing them
+    KEEP_ROWS = 6
+
+    def __init__(self, paths, cell_size=(128, 128), full_resolution_on_hover=True) -> None:
+        self.paths = list(paths)
+        self.cell_size = cell_size
+        self.full_resolution_on_hover = full_resolution_on_hover
+
+        self.selected: int | None = None
+        self.hovered: int | None = None
+        self._level = self.thumbnail_level()
+        # Item index -> loaded image, only for items around the view
+        self._thumbnails: dict[int, ImageHelper] = {}
+        self._full: dict[int, ImageHelper] = {}
+
+    def thumbnail_level(self):
+        side = max(self.cell_size)
+        for level in self.THUMBNAIL_LEVELS:
+            if level >= side:
+                return level
+        # Bigger than every level, load full size
+        return None
+
+    def set_paths(self, paths):
+        self.release()
+        self.paths = list(paths)
+        self.selected = None
+
+    def set_cell_size(self, width: int, height: int):
+        self.cell_size = (width, height)
+        level = self.thumbnail_level()
+        if level != self._level:
+            self._level = level
+            self._release_all(self._thumbnails)
+
+    def _get(self, images: dict[int, ImageHelper], index: int, max_size: int | None):
+        image = images.get(index)
+        if image is None:
+            image = images[index] = ImageHelper(
+                self.paths[index], max_size=max_size)
+        return image
+
+    def _release_all(self, images: dict[int, ImageHelper]):
+        for image in images.values():
+            image.release()
+        images.clear()
+
+    def release(self):
+        self._release_all(self._thumbnails)
+        self._release_all(self._full)
+
+    def draw(self, width=0, height=0):
+        """Draws the gallery in a scrolling child region, returns the index clicked this frame or None."""
+        clicked = None
+        self.hovered = None
+
+        if imgui.begin_child("##gallery", imgui.ImVec2(width, height)):
+            cell_width, cell_height = self.cell_size
+            spacing = imgui.get_style().item_spacing
+            available = imgui.get_content_region_avail().x
+            columns = max(1, int((available + spacing.x) //
+                          (cell_width + spacing.x)))
+            rows = -(-len(self.paths) // columns)
+
+            first_row, last_row = rows, -1
+            clipper = imgui.ListClipper()
+            clipper.begin(rows, cell_height + spacing.y)
+            while clipper.step():
+                first_row = min(first_row, clipper.display_start)
+                last_row = max(last_row, clipper.display_end - 1)
+                for row in range(clipper.display_start, clipper.display_end):
+                    for column in range(columns):
+                        index = row * columns + column
+                        if index >= len(self.paths):
+                            break
+                        if column:
+                            imgui.same_line()
+                        if self._draw_item(index):
+                            clicked = index
+            clipper.end()
+
+            self._update_residency(first_row, last_row, columns, rows)
+        imgui.end_child()
+
+        self._update_full_resolution()
+        return clicked
+
+    def _draw_item(self, index: int):
+        imgui.push_id(index)
+        image = self._get(self._thumbnails, index, self._level)
+        full = self._full.get(index)
+        if full is not None and full.applied:
+            image = full
+
+        cell_width, cell_height = self.cell_size
+        image.render(cell_width, cell_height,
+                     *image.crop_to_ratio(cell_width / cell_height))
+
+        clicked = imgui.is_item_clicked()
+        if clicked:
+            self.selected = index
+        if imgui.is_item_hovered():
+            self.hovered = index
+        if index == self.selected:
+            draw_list = imgui.get_window_draw_list()
+            draw_list.add_rect(imgui.get_item_rect_min(), imgui.get_item_rect_max(),
+                               imgui.get_color_u32(imgui.Col_.nav_highlight), thickness=2)
+        imgui.pop_id()
+        return clicked
+
+    def _update_residency(self, first_row: int, last_row: int, columns: int, rows: int):
+        if last_row < first_row:
+            return
+
+        for row in range(max(0, first_row - self.PREFETCH_ROWS),
+                         min(rows, last_row + 1 + self.PREFETCH_ROWS)):
+            if first_row <= row <= last_row:
+                continue
+            for index in range(row * columns, min(len(self.paths), (row + 1) * columns)):
+                self._get(self._thumbnails, index, self._level).prefetch()
+
+        keep_start = (first_row - self.KEEP_ROWS) * columns
+        keep_end = (last_row + 1 + self.KEEP_ROWS) * columns
+        for index in [index for index in self._thumbnails
+                      if not keep_start <= index < keep_end]:
+            self._thumbnails.pop(index).release()
+
+    def _update_full_resolution(self):
+        if self._level is None:
+            # Thumbnails are already full size
+            return
+
+        wanted = {self.selected}
+        if self.full_resolution_on_hover:
+            wanted.add(self.hovered)
+        wanted.discard(None)
+
+        for index in [index for index in self._full if index not in wanted]:
+            self._full.pop(index).release()
+        for index in wanted:
+            # Accessing the texture queues the load, it's shown once uploaded
+            self._get(self._full, index, None).frame_uvs()
+
+
+def _window_zone(suffix=""):
+    # Times a GUIWindow method as a profiler zone named after the window
+    def decorate(method):
+        @functools.wraps(method)
+        def timed(self, *args, **kwargs):
+            if not profiler.enabled:
+                return method(self, *args, **kwargs)
+            with profiler.zone(self.name + suffix):
+                return method(self, *args, **kwargs)
+        return timed
+    return decorate
+
+
 class GUIWindow:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Overrides are timed too, the zone of a super() call inside them is merged
+        for method, suffix in (("draw_window", ""), ("draw_contents", " contents")):
+            if method in cls.__dict__:
+                setattr(cls, method, _window_zone(suffix)(cls.__dict__[method]))
+
     def __init__(self, name: str, io: imgui.IO, closable: bool = True, flags=None) -> None:
         super().__init__()
         self.name = name
@@ -123,6 +301,7 @@ class GUIWindow:
     def hide_window(self):
         self.show = False
 
+    @_window_zone()
     def draw_window(self):
         if self.show:
             if self.closable:
@@ -136,5 +315,75 @@ class GUIWindow:
                 self.draw_contents()
             imgui.end()
 
+    @_window_zone(" contents")
     def draw_contents(self):
         pass
+
+
+class ProfilerWindow(GUIWindow):
+    """Overlay with min/avg/p99 of every profiler zone, and a plot of the checked ones."""
+
+    def __init__(self, name: str = "Profiler", io: imgui.IO | None = None, closable: bool = True,
+                 flags=None, profiler: Profiler = profiler) -> None:
+        # Same arguments as GUIWindow, ProfilerWindow(io=io) keeps the default name
+        super().__init__(name, io if io is not None else imgui.get_io(), closable, flags)
+        self.profiler = profiler
+        self.plotted: set[tuple[str, str]] = set()
+        self._plot_context = None
+
+    def draw_contents(self):
+        profiler = self.profiler
+        _, profiler.enabled = imgui.checkbox("Enabled", profiler.enabled)
+        imgui.same_line()
+        if imgui.button("Reset"):
+            profiler.reset()
+
+        flags = (imgui.TableFlags_.borders | imgui.TableFlags_.row_bg
+                 | imgui.TableFlags_.scroll_y | imgui.TableFlags_.resizable)
+        if imgui.begin_table("zones", 6, flags, imgui.ImVec2(0, 200)):
+            imgui.table_setup_scroll_freeze(0, 1)
+            for column in ("Zone", "Scope", "min ms", "avg ms", "p99 ms", "last ms"):
+                imgui.table_setup_column(column)
+            imgui.table_headers_row()
+
+            for scope, name, stats in profiler.summary():
+                key = (scope, name)
+                imgui.table_next_row()
+                imgui.table_next_column()
+                clicked, plot = imgui.checkbox(f"{name}##{scope}", key in self.plotted)
+                if clicked:
+                    if plot:
+                        self.plotted.add(key)
+                    else:
+                        self.plotted.discard(key)
+                imgui.table_next_column()
+                imgui.text(scope)
+                for column in ("min", "avg", "p99", "last"):
+                    imgui.table_next_column()
+                    imgui.text(f"{stats[column]:.3f}")
+            imgui.end_table()
+
+        if self.plotted:
+            self._draw_plot()
+
+    def _draw_plot(self):
+        if self._plot_context is None:
+            self._plot_context = implot.create_context()
+        implot.set_current_context(self._plot_context)
+
+        if implot.begin_plot("##zones", imgui.ImVec2(-1, 200)):
+            implot.setup_axes("sample", "ms", implot.AxisFlags_.auto_fit,
+                              implot.AxisFlags_.auto_fit)
+            for key in list(self.plotted):
+                stats = self.profiler.zones.get(key)
+                if stats is None:
+                    self.plotted.discard(key)
+                    continue
+                implot.plot_line(f"{key[1]} ({key[0]})",
+                                 stats.history() / 1e6)
+            implot.end_plot()
+
+    def release(self):
+        if self._plot_context is not None:
+            implot.destroy_context(self._plot_context)
+            self._plot_context = None
@@ -0,0 +1,31 @@
+from . import bgimgui
+from .simple_gui import SimpleCustomGUI
+from bge.types import SCA_PythonController
+import bge
+
+
+# Example of many world panels run by one PanelManager, instead of a
+# runGUI logic brick per panel. Only the clicked panel receives typing.
+def startGUI(cont: SCA_PythonController):
+    if cont.sensors["tap"].positive:
+        own = cont.owner
+        manager = bgimgui.PanelManager.for_scene(own.scene)
+
+        # Every object with an "imgui_panel" property gets its own UI
+        for obj in own.scene.objects:
+            if "imgui_panel" in obj:
+                manager.add(SimpleCustomGUI(own.scene,
+                                            main=False,
+                                            panel=obj,
+                                            resolution=(400, 400)))
+
+
+def runGUI(cont: SCA_PythonController):
+    if cont.sensors["loop"].positive:
+        bgimgui.PanelManager.for_scene(cont.owner.scene).update()
+
+
+def stopGUI(cont: SCA_PythonController):
+    if cont.sensors["stop"].positive:
+        bgimgui.PanelManager.for_scene(cont.owner.scene).shutdown()
+        bge.logic.endGame()
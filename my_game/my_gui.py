@@ -35,12 +35,13 @@ class MyCustomGUI(bgimgui.BGEImguiWrapper):
         main_font_path = bge.logic.expandPath(
             "//Orbitron-VariableFont_wght.ttf")
         main_font_size_in_pixels = 20
-        backend.set_main_font(main_font_path, main_font_size_in_pixels)
-
         extra_font_path = bge.logic.expandPath("//Blackout 2 AM.ttf")
         extra_font_size = 40
-        self.extra_font = backend.add_extra_font(
-            extra_font_path, extra_font_size)
+
+        # Build the font atlas once for both fonts
+        with backend.font_batch() as fonts:
+            fonts.set_main(main_font_path, main_font_size_in_pixels)
+            self.extra_font = fonts.add(extra_font_path, extra_font_size)
 
         self.show_test_window = True
         self.show_custom_window = True
@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks import headless
+
+# Has to happen before anything imports OpenGL, which the test modules do when collected
+headless.select_platform("egl")
+try:
+    context = headless.create_context("egl", 320, 240)
+    context_error = None
+except RuntimeError as error:
+    context = None
+    context_error = str(error)
+
+from benchmarks import fake_bge  # noqa: E402
+
+fake_bge.install(320, 240)
+fake_bge.load_bgimgui()
+
+
+@pytest.fixture
+def gl_context():
+    if context is None:
+        pytest.skip(context_error)
+    return context
+
+
+@pytest.fixture
+def engine():
+    """Fresh scene and input on the fake engine, its clock keeps running."""
+    fake_bge.state.reset()
+    return fake_bge.state
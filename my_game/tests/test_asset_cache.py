@@ -0,0 +1,108 @@
+import os
+import pathlib
+
+from PIL import Image
+import pytest
+
+from bgimgui.asset_cache import DecodedImageCache, decode_frames
+
+SIZE = (12, 8)
+COLORS = ((255, 0, 0), (0, 255, 0), (0, 0, 255))
+DURATIONS = (50, 80, 0)
+
+
+def write_gif(path: pathlib.Path, colors=COLORS):
+    frames = [Image.new("RGB", SIZE, color) for color in colors]
+    frames[0].save(path, save_all=True, append_images=frames[1:],
+                   duration=list(DURATIONS[:len(colors)]), loop=0)
+    return path
+
+
+def decoded(path: pathlib.Path, max_size=None):
+    with Image.open(path) as image:
+        return list(decode_frames(image, max_size))
+
+
+@pytest.fixture
+def gif(tmp_path: pathlib.Path):
+    return write_gif(tmp_path / "anim.gif")
+
+
+@pytest.fixture
+def cache(tmp_path: pathlib.Path):
+    return DecodedImageCache(tmp_path / "cache")
+
+
+def test_baked_frames_load_back(cache: DecodedImageCache, gif):
+    cached = cache.load(gif)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert (cached.width, cached.height, cached.frame_count) == (*SIZE, 3)
+
+    expected = decoded(gif)
+    assert [frame.tobytes() for frame in cached.frames] == [pixels for pixels, _ in expected]
+    # Frames without a duration play for 100 ms
+    assert list(cached.durations) == [50, 80, 100]
+
+    assert cache.load(gif) is not None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize("offset, data", [
+    (0, b"NOPE"),
+    (4, (DecodedImageCache.FORMAT_VERSION + 1).to_bytes(2, "little")),
+    (6, (3).to_bytes(2, "little")),
+], ids=["magic", "version", "channels"])
+def test_entries_with_a_wrong_header_are_ignored(cache: DecodedImageCache, gif, offset, data):
+    entry = cache.bake(gif)
+    with open(entry, "r+b") as cache_file:
+        cache_file.seek(offset)
+        cache_file.write(data)
+
+    assert cache.lookup(gif) is None
+    # Loading bakes it again
+    assert cache.load(gif) is not None
+    assert cache.lookup(gif) is not None
+
+
+def test_truncated_entries_are_ignored(cache: DecodedImageCache, gif):
+    entry = cache.bake(gif)
+    os.truncate(entry, entry.stat().st_size - 1)
+    assert cache.lookup(gif) is None
+
+    os.truncate(entry, DecodedImageCache.HEADER.size - 1)
+    assert cache.lookup(gif) is None
+
+
+def test_edited_sources_get_a_new_entry(cache: DecodedImageCache, gif):
+    old_key = cache.key(gif)
+    cache.bake(gif)
+
+    write_gif(gif, COLORS[:2])
+    assert cache.key(gif) != old_key
+    assert cache.lookup(gif) is None
+    assert cache.load(gif).frame_count == 2
+
+
+def test_touched_sources_keep_their_entry(cache: DecodedImageCache, gif):
+    key = cache.key(gif)
+    cache.bake(gif)
+
+    stat = gif.stat()
+    os.utime(gif, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    # Hashed again as the mtime changed, but the contents are the same
+    assert cache.key(gif) == key
+    assert len(cache._keys) == 2
+    assert cache.lookup(gif) is not None
+
+
+def test_thumbnails_are_stored_next_to_the_full_size(cache: DecodedImageCache, gif):
+    full = cache.load(gif)
+    thumbnail = cache.load(gif, max_size=6)
+
+    assert cache.key(gif, 6) == f"{cache.key(gif)}-6"
+    assert cache.entry_path(cache.key(gif, 6)).exists()
+    assert (thumbnail.width, thumbnail.height) == (6, 4)
+    assert [frame.tobytes() for frame in thumbnail.frames] == [
+        pixels for pixels, _ in decoded(gif, 6)]
+    assert (full.width, full.height) == SIZE
+    assert (cache.hits, cache.misses) == (0, 2)
@@ -0,0 +1,79 @@
+from imgui_bundle import imgui
+import pytest
+
+from bgimgui import resources
+from bgimgui.atlas import PanelAtlas
+from bgimgui.image import release_dummy_texture
+from bgimgui.imgui_wrapper import BGEImguiWrapper
+from benchmarks.fake_bge import GameObject
+
+PADDING = PanelAtlas.PADDING
+
+
+class LabelGUI(BGEImguiWrapper):
+    def setup_gui(self):
+        self.io.set_ini_filename("")
+
+    def draw(self):
+        imgui.text(self.backend.panel.name)
+
+
+@pytest.fixture
+def atlas(gl_context, engine):
+    material = engine.scene.add_object(GameObject("AtlasMaterial"))
+    atlas = PanelAtlas(engine.scene, material, size=(256, 256))
+    guis = []
+
+    def add_panel(resolution):
+        panel = engine.scene.add_object(GameObject(
+            f"Panel.{len(guis):03d}", properties={"imgui_panel": len(guis)}))
+        gui = LabelGUI(engine.scene, main=False, panel=panel,
+                       resolution=resolution, atlas=atlas)
+        guis.append(gui)
+        return gui.backend
+
+    atlas.add_panel = add_panel
+    yield atlas
+    for gui in guis:
+        gui.shutdown_gui()
+        imgui.destroy_context(gui.context)
+    atlas.shutdown()
+    release_dummy_texture()
+
+
+def test_regions_are_padded_on_every_side(atlas):
+    first = atlas.add_panel((100, 50))
+    second = atlas.add_panel((100, 50))
+    # Would touch the right edge of the atlas, starts a new shelf
+    third = atlas.add_panel((256 - 200 - 5 * PADDING, 50))
+
+    assert atlas.regions[first] == (PADDING, PADDING, 100, 50)
+    assert atlas.regions[second] == (100 + 3 * PADDING, PADDING, 100, 50)
+    assert atlas.regions[third][:2] == (PADDING, 50 + 3 * PADDING)
+
+
+def test_panel_that_does_not_fit_is_not_added(atlas):
+    panels = [atlas.add_panel((100, 100)) for _ in range(4)]
+    regions = dict(atlas.regions)
+    live = len(resources.tracker.live)
+
+    with pytest.raises(ValueError):
+        atlas.add_panel((100, 100))
+    # The context of the GUI that failed to start
+    imgui.destroy_context(imgui.get_current_context())
+
+    assert atlas.regions == regions
+    assert len(resources.tracker.live) == live
+    assert list(atlas._original_uvs) == panels
+    assert atlas.repacks == 0
+
+
+def test_removals_repack_once_before_the_next_frame(atlas, engine):
+    panels = [atlas.add_panel((100, 50)) for _ in range(4)]
+    for panel in panels[:3]:
+        atlas.remove(panel)
+    assert atlas.repacks == 0
+
+    engine.scene.draw()
+    assert atlas.repacks == 1
+    assert atlas.regions == {panels[3]: (PADDING, PADDING, 100, 50)}
@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+from imgui_bundle import imgui
+from OpenGL import GL as gl
+import pytest
+
+from bgimgui import renderer
+from bgimgui.renderer import DrawCommandProcessor, GLStateTracker
+
+FB_WIDTH, FB_HEIGHT = 320, 240
+FULL_CLIP = (0, 0, FB_WIDTH, FB_HEIGHT)
+
+
+def command(idx_offset, count, texture=1, clip=FULL_CLIP, vtx_offset=0):
+    return SimpleNamespace(elem_count=count, clip_rect=clip, texture_id=texture,
+                           idx_offset=idx_offset, vtx_offset=vtx_offset)
+
+
+class RecordingGL:
+    """The GL module, with the draws recorded instead of issued."""
+
+    def __init__(self, state: GLStateTracker) -> None:
+        self.state = state
+        self.draws = []
+
+    def __getattr__(self, name):
+        return getattr(gl, name)
+
+    def glDrawElements(self, mode, count, gltype, offset):
+        self.glDrawElementsBaseVertex(mode, count, gltype, offset, 0)
+
+    def glDrawElementsBaseVertex(self, mode, count, gltype, offset, base_vertex):
+        current = self.state.current
+        self.draws.append((current["texture"], current["scissor_box"],
+                           count, offset.value or 0, base_vertex))
+
+
+@pytest.fixture
+def processor(gl_context, monkeypatch):
+    state = GLStateTracker(GLStateTracker.TRUST)
+    state.begin()
+    recording = RecordingGL(state)
+    monkeypatch.setattr(renderer, "gl", recording)
+
+    processor = DrawCommandProcessor()
+    processor.begin_frame(state, FB_WIDTH, FB_HEIGHT)
+    processor.draws = recording.draws
+    yield processor
+    state.end()
+
+
+def test_adjacent_commands_are_merged(processor):
+    processor.process([command(0, 6), command(6, 12), command(18, 3)], 0, 0)
+
+    assert processor.draws == [(1, (0, 0, FB_WIDTH, FB_HEIGHT), 21, 0, 0)]
+    assert (processor.draws_issued, processor.draws_merged) == (1, 2)
+
+
+def test_commands_that_differ_are_not_merged(processor):
+    processor.process([
+        command(0, 6),
+        command(6, 6, texture=2),
+        command(12, 6, texture=2, clip=(0, 0, 100, 100)),
+        command(18, 6, texture=2, clip=(0, 0, 100, 100), vtx_offset=4),
+        # Not contiguous with the one before
+        command(30, 6, texture=2, clip=(0, 0, 100, 100), vtx_offset=4),
+    ], 0, 0)
+
+    assert [draw[2:] for draw in processor.draws] == [
+        (6, 0, 0), (6, 6 * imgui.INDEX_SIZE, 0), (6, 12 * imgui.INDEX_SIZE, 0),
+        (6, 18 * imgui.INDEX_SIZE, 4), (6, 30 * imgui.INDEX_SIZE, 4)]
+    assert (processor.draws_issued, processor.draws_merged) == (5, 0)
+
+
+def test_buffer_offsets_are_added(processor):
+    processor.process([command(6, 3, vtx_offset=2)], 10, 64)
+
+    assert processor.draws == [(1, (0, 0, FB_WIDTH, FB_HEIGHT), 3, 64 + 6 * imgui.INDEX_SIZE, 12)]
+
+
+def test_unchanged_binds_are_skipped(processor):
+    processor.process([
+        command(0, 6, texture=1),
+        command(6, 6, texture=1, clip=(0, 0, 100, 100)),
+        command(12, 6, texture=2, clip=(0, 0, 100, 100)),
+    ], 0, 0)
+
+    assert [draw[0] for draw in processor.draws] == [1, 1, 2]
+    assert processor.texture_binds == 2
+    # The window sized scissor box of the first draw is already set, then
+    # the texture of the second draw and the clip rect of the third
+    assert processor.state_changes_skipped == 3
+    assert processor.state.skipped == 3
+
+
+def test_clip_rects_become_scissor_boxes(processor):
+    processor.process([command(0, 6, clip=(10, 20, 110, 70))], 0, 0)
+    processor.begin_frame(processor.state, FB_WIDTH, FB_HEIGHT, offset_x=100, offset_y=200)
+    processor.process([command(0, 6, clip=(10, 20, 110, 70))], 0, 0)
+
+    # Flipped to GL's bottom up window coordinates, then moved by the offset
+    assert [draw[1] for draw in processor.draws] == [
+        (10, FB_HEIGHT - 70, 100, 50), (110, FB_HEIGHT - 70 + 200, 100, 50)]
+
+
+@pytest.mark.parametrize("culled", [
+    command(0, 0),
+    command(0, 6, clip=(50, 0, 50, 100)),
+    command(0, 6, clip=(0, 50, 100, 50)),
+    command(0, 6, clip=(-100, -100, 0, 0)),
+    command(0, 6, clip=(FB_WIDTH, 0, FB_WIDTH + 100, 100)),
+    command(0, 6, clip=(0, FB_HEIGHT, 100, FB_HEIGHT + 100)),
+], ids=["empty", "no width", "no height", "before", "right", "below"])
+def test_commands_without_pixels_are_culled(processor, culled):
+    processor.process([culled, command(6, 6)], 0, 0)
+
+    assert [draw[3] for draw in processor.draws] == [6 * imgui.INDEX_SIZE]
+    assert processor.draws_culled == 1
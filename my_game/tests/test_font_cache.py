@@ -0,0 +1,46 @@
+import pathlib
+
+from imgui_bundle import imgui
+from benchmarks.fake_bge import BLEND_DIR, load_bgimgui
+
+load_bgimgui()
+from bgimgui.fonts import FontAtlasCache, font_source  # noqa: E402
+
+FONT = str(BLEND_DIR / "Orbitron-VariableFont_wght.ttf")
+
+
+def build(cache: FontAtlasCache, size: float):
+    fonts = imgui.ImFontAtlas()
+    font = fonts.add_font_from_file_ttf(FONT, size)
+    return cache.build(fonts, [font_source(FONT, size)], [font])
+
+
+def test_sizes_of_one_font_are_cached_side_by_side(tmp_path: pathlib.Path):
+    cache = FontAtlasCache(tmp_path)
+    build(cache, 14)
+    build(cache, 16)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    for _ in range(2):
+        build(cache, 14)
+        build(cache, 16)
+    assert (cache.hits, cache.misses) == (4, 2)
+
+
+def test_bakes_of_an_edited_font_are_pruned(tmp_path: pathlib.Path):
+    cache = FontAtlasCache(tmp_path / "cache")
+    font_path = tmp_path / "font.ttf"
+    font_path.write_bytes(pathlib.Path(FONT).read_bytes())
+
+    def build_copy():
+        fonts = imgui.ImFontAtlas()
+        font = fonts.add_font_from_file_ttf(str(font_path), 14)
+        return cache.build(fonts, [font_source(str(font_path), 14)], [font])
+
+    build_copy()
+    # Same glyphs, different file hash
+    font_path.write_bytes(font_path.read_bytes() + b"\0")
+    build_copy()
+    assert cache.misses == 2
+    assert len(list(cache.directory.glob("*.json"))) == 1
+
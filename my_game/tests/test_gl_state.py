@@ -0,0 +1,135 @@
+from imgui_bundle import imgui
+from OpenGL import GL as gl
+import pytest
+
+from bgimgui.image import release_dummy_texture
+from bgimgui.imgui_wrapper import BGEImguiWrapper
+from bgimgui.renderer import GLStateTracker
+from benchmarks.fake_bge import GameObject
+
+VERTEX_SHADER = """
+#version 330 core
+void main() { gl_Position = vec4(0.0); }
+"""
+FRAGMENT_SHADER = """
+#version 330 core
+out vec4 color;
+void main() { color = vec4(1.0); }
+"""
+
+
+class WidgetsGUI(BGEImguiWrapper):
+    def setup_gui(self):
+        self.io.set_ini_filename("")
+        self.value = 0.5
+
+    def draw(self):
+        imgui.set_next_window_pos((10, 10))
+        imgui.set_next_window_size((200, 100))
+        imgui.begin("Widgets")
+        imgui.text("Some text")
+        imgui.button("A button")
+        _, self.value = imgui.slider_float("Value", self.value, 0, 1)
+        imgui.end()
+
+
+def read_state():
+    return GLStateTracker(GLStateTracker.FULL)._query()
+
+
+def apply_state(state: dict):
+    tracker = GLStateTracker(GLStateTracker.FULL)
+    for key in GLStateTracker.RESTORE_ORDER:
+        tracker._apply(key, state[key])
+
+
+def engine_state():
+    # What the engine leaves bound when the post_draw callbacks run
+    return GLStateTracker(GLStateTracker.TRUST)._engine_defaults()
+
+
+def game_state():
+    """State a game's own GL code could have left behind, nothing at its default."""
+    shaders = []
+    program = gl.glCreateProgram()
+    for kind, source in ((gl.GL_VERTEX_SHADER, VERTEX_SHADER),
+                         (gl.GL_FRAGMENT_SHADER, FRAGMENT_SHADER)):
+        shader = gl.glCreateShader(kind)
+        gl.glShaderSource(shader, source)
+        gl.glCompileShader(shader)
+        gl.glAttachShader(program, shader)
+        shaders.append(shader)
+    gl.glLinkProgram(program)
+    assert gl.glGetProgramiv(program, gl.GL_LINK_STATUS)
+    for shader in shaders:
+        gl.glDeleteShader(shader)
+
+    array_buffer, element_buffer = (int(buffer) for buffer in gl.glGenBuffers(2))
+    return {
+        "framebuffer": 0,
+        "texture": int(gl.glGenTextures(1)),
+        "blend_equation": (gl.GL_FUNC_SUBTRACT, gl.GL_MAX),
+        "blend_func": (gl.GL_SRC_ALPHA, gl.GL_ONE),
+        "polygon_mode": gl.GL_LINE,
+        "blend": True,
+        "cull_face": False,
+        "depth_test": False,
+        "scissor_test": True,
+        "scissor_box": (3, 5, 100, 50),
+        "viewport": (7, 11, 200, 150),
+        "program": int(program),
+        "active_texture": gl.GL_TEXTURE0,
+        "vertex_array": int(gl.glGenVertexArrays(1)),
+        "array_buffer": array_buffer,
+        "element_array_buffer": element_buffer,
+    }
+
+
+@pytest.fixture(params=["main", "panel"])
+def gui(request, gl_context, engine):
+    if request.param == "main":
+        gui = WidgetsGUI(engine.scene)
+    else:
+        panel = engine.scene.add_object(GameObject(
+            "Panel", (0, 0, -5), properties={"imgui_panel": 0}))
+        gui = WidgetsGUI(engine.scene, main=False, panel=panel, resolution=(128, 128))
+    yield gui
+    gui.shutdown_gui()
+    imgui.destroy_context(gui.context)
+    release_dummy_texture()
+
+
+def render_pass(engine, gui, before: dict):
+    gui.update_gui()
+    apply_state(before)
+    assert read_state() == before
+    for callback in engine.scene.post_draw:
+        callback()
+    assert gui.backend.stats.draw_calls > 0
+    return read_state()
+
+
+@pytest.mark.parametrize("mode", GLStateTracker.MODES)
+def test_engine_state_is_restored(engine, gui, mode):
+    gui.backend.set_gl_state_mode(mode)
+    before = engine_state()
+    for _ in range(3):
+        assert render_pass(engine, gui, before) == before
+        engine.advance()
+
+
+def test_full_mode_restores_game_state(engine, gui):
+    gui.backend.set_gl_state_mode(GLStateTracker.FULL)
+    before = game_state()
+    assert render_pass(engine, gui, before) == before
+
+
+def test_tracked_mode_restores_game_state_but_bindings(engine, gui):
+    gui.backend.set_gl_state_mode(GLStateTracker.TRACKED)
+    before = game_state()
+    after = render_pass(engine, gui, before)
+    for key in GLStateTracker.OWNED_KEYS:
+        # Left unbound, the engine binds its own before drawing
+        assert after.pop(key) == 0
+        before.pop(key)
+    assert after == before
@@ -0,0 +1,55 @@
+import time
+
+from imgui_bundle import imgui
+import pytest
+
+from bgimgui import renderer
+from bgimgui.image import release_dummy_texture
+from bgimgui.imgui_wrapper import BGEImguiWrapper
+
+
+class IdleGUI(BGEImguiWrapper):
+    IDLE_MODE = True
+
+    def setup_gui(self):
+        self.io.set_ini_filename("")
+
+    def draw(self):
+        imgui.begin("Idle")
+        imgui.text("Nothing changes")
+        imgui.end()
+
+
+class EngineClock:
+    """The time module, with perf_counter() following the fake engine's clock."""
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    def perf_counter(self):
+        return self.engine.frame_time
+
+
+@pytest.fixture
+def gui(gl_context, engine, monkeypatch):
+    monkeypatch.setattr(renderer, "time", EngineClock(engine))
+    gui = IdleGUI(engine.scene)
+    yield gui
+    gui.shutdown_gui()
+    imgui.destroy_context(gui.context)
+    release_dummy_texture()
+
+
+def test_imgui_time_follows_the_engine_clock_across_idle_frames(gui, engine):
+    start = engine.frame_time
+    tick = 1 / engine.tic_rate
+    for _ in range(120):
+        gui.update_gui()
+        engine.advance()
+
+    assert gui.frames_idle > gui.frames_built
+    # The first frame counts as one tick
+    assert imgui.get_time() == pytest.approx(gui._last_build - start + tick)
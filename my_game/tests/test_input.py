@@ -0,0 +1,136 @@
+from imgui_bundle import imgui
+import pytest
+
+from bgimgui.image import release_dummy_texture
+from bgimgui.imgui_wrapper import BGEImguiWrapper
+from benchmarks.fake_bge import EVENTS
+
+Key = imgui.Key
+
+
+class EmptyGUI(BGEImguiWrapper):
+    def setup_gui(self):
+        self.io.set_ini_filename("")
+
+    def draw(self):
+        pass
+
+
+class RecordingIO:
+    """imgui's IO, with the input events recorded on their way in."""
+
+    def __init__(self, io) -> None:
+        object.__setattr__(self, "io", io)
+        object.__setattr__(self, "events", [])
+
+    def __getattr__(self, name):
+        return getattr(self.io, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.io, name, value)
+
+    def add_key_event(self, key, down):
+        self.events.append(("key", key, down))
+        self.io.add_key_event(key, down)
+
+    def add_mouse_pos_event(self, x, y):
+        self.events.append(("pos", x, y))
+        self.io.add_mouse_pos_event(x, y)
+
+    def add_mouse_button_event(self, button, down):
+        self.events.append(("button", button, down))
+        self.io.add_mouse_button_event(button, down)
+
+    def add_mouse_wheel_event(self, x, y):
+        self.events.append(("wheel", x, y))
+        self.io.add_mouse_wheel_event(x, y)
+
+    def add_input_character(self, character):
+        self.events.append(("char", chr(character)))
+        self.io.add_input_character(character)
+
+
+@pytest.fixture
+def backend(gl_context, engine):
+    gui = EmptyGUI(engine.scene)
+    backend = gui.backend
+    io = backend.io = RecordingIO(backend.io)
+
+    def update(keys=(), text="", position=None, buttons=()):
+        """One frame of input, returns the events it sent."""
+        engine.keyboard.set([EVENTS[key] for key in keys], text)
+        engine.mouse.set(position, [EVENTS[button] for button in buttons])
+        io.events.clear()
+        backend.update_io()
+        engine.advance()
+        return [event for event in io.events if event[0] != "pos"]
+
+    backend.update = update
+    yield backend
+    gui.shutdown_gui()
+    imgui.destroy_context(gui.context)
+    release_dummy_texture()
+
+
+def test_held_keys_are_sent_once(backend):
+    assert backend.update(["AKEY"]) == [("key", Key.a, True)]
+    assert backend.update(["AKEY"]) == []
+    assert backend.update(["AKEY", "CKEY"]) == [("key", Key.c, True)]
+    assert backend.update(["CKEY"]) == [("key", Key.a, False)]
+    assert backend.update() == [("key", Key.c, False)]
+    assert backend.input_events == 1
+
+
+def test_unmapped_keys_are_ignored(backend):
+    assert backend.update(["BKEY"]) == []
+
+    backend.key_map[EVENTS["BKEY"]] = Key.b
+    backend._build_input_lookup()
+    assert backend.update(["BKEY"]) == [("key", Key.b, True)]
+
+
+def test_left_and_right_modifiers_share_one_modifier(backend):
+    assert sorted(backend.update(["LEFTCTRLKEY"])) == sorted([
+        ("key", Key.left_ctrl, True), ("key", Key.im_gui_mod_ctrl, True)])
+    assert backend.update(["LEFTCTRLKEY", "RIGHTCTRLKEY"]) == [("key", Key.right_ctrl, True)]
+    # Still held with the right one
+    assert backend.update(["RIGHTCTRLKEY"]) == [("key", Key.left_ctrl, False)]
+    assert sorted(backend.update()) == sorted([
+        ("key", Key.right_ctrl, False), ("key", Key.im_gui_mod_ctrl, False)])
+
+
+def test_buttons_are_sent_on_change(backend):
+    assert backend.update(buttons=["LEFTMOUSE"]) == [("button", 0, True)]
+    assert backend.update(buttons=["LEFTMOUSE", "RIGHTMOUSE"]) == [("button", 1, True)]
+    assert backend.update(buttons=["RIGHTMOUSE"]) == [("button", 0, False)]
+    assert backend.input_held
+    assert backend.update() == [("button", 1, False)]
+    assert not backend.input_held
+
+
+def test_wheel_is_sent_every_frame_it_turns(backend):
+    assert backend.update(buttons=["WHEELUPMOUSE"]) == [("wheel", 0, 0.5)]
+    assert backend.update(buttons=["WHEELUPMOUSE"]) == [("wheel", 0, 0.5)]
+    assert backend.update(buttons=["WHEELDOWNMOUSE"]) == [("wheel", 0, -0.5)]
+    assert backend.update() == []
+
+
+def test_typed_text_is_sent_per_character(backend):
+    # The first frame also sends the mouse position
+    backend.update()
+    assert backend.update(text="hé!") == [("char", "h"), ("char", "é"), ("char", "!")]
+    assert backend.input_events == 3
+    assert backend.update() == []
+
+
+def test_mouse_position_is_sent_when_it_moves(backend):
+    io = backend.io
+    backend.update(position=(0.5, 0.25))
+    assert io.events == [("pos", 160, 60)]
+
+    backend.update(position=(0.5, 0.25))
+    assert io.events == []
+    assert backend.input_events == 0
+
+    backend.update(position=(0, 1))
+    assert io.events == [("pos", 0, 240)]
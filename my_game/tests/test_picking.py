@@ -0,0 +1,94 @@
+from imgui_bundle import imgui
+import pytest
+
+from bgimgui.image import release_dummy_texture
+from bgimgui.imgui_wrapper import BGEImguiWrapper
+from bgimgui.picking import PanelPicker
+from benchmarks.fake_bge import Camera, GameObject
+
+CENTER = (0.5, 0.5)
+
+
+class EmptyGUI(BGEImguiWrapper):
+    def setup_gui(self):
+        pass
+
+    def draw(self):
+        pass
+
+
+def panel(name, context_id, position, scale=(1, 1, 1), **properties):
+    return GameObject(name, position, scale, {"imgui_panel": context_id, **properties})
+
+
+@pytest.fixture
+def camera():
+    return Camera("Camera", aspect=1.0, fov=90.0)
+
+
+@pytest.fixture
+def picker():
+    return PanelPicker()
+
+
+def test_hit_uvs_start_at_the_top_left(picker, camera):
+    picker.register(panel("Panel", 0, (0, 0, -2), scale=(2, 1, 1)), 0)
+
+    hit = picker.pick(camera, CENTER)
+    assert (hit.u, hit.v) == pytest.approx((0.5, 0.5))
+    assert hit.distance == pytest.approx(2)
+    assert hit.point == pytest.approx((0, 0, -2))
+
+    # With a 90 degree fov the screen spans -2..2 at the distance of the panel
+    hit = picker.pick(camera, (0.25, 0.375))
+    assert (hit.u, hit.v) == pytest.approx((0.25, 0.25))
+    assert picker.pick(camera, (0.5, 0.1)) is None
+
+
+def test_nearest_panel_is_hit(picker, camera):
+    picker.register(panel("Far", 0, (0, 0, -6), scale=(4, 4, 1)), 0)
+    picker.register(panel("Near", 1, (0.5, 0, -3)), 1)
+    picker.register(panel("Behind", 2, (0, 0, 2)), 2)
+
+    hit = picker.pick(camera, CENTER)
+    assert (hit.panel.name, hit.context_id) == ("Near", 1)
+    assert hit.u == pytest.approx(0.25)
+
+    # Past the near panel's right edge only the far one is in the way
+    hit = picker.pick(camera, (0.8, 0.5))
+    assert hit.panel.name == "Far"
+    assert hit.point == pytest.approx((3.6, 0, -6))
+
+
+def test_panels_past_max_distance_are_missed(picker, camera):
+    picker.register(panel("Panel", 0, (0, 0, -5)), 0)
+
+    assert picker.pick(camera, CENTER, max_distance=4.9) is None
+    assert picker.pick(camera, CENTER, max_distance=5).panel.name == "Panel"
+
+
+def test_static_panels_are_not_read_again(picker, camera):
+    moving = panel("Moving", 0, (0, 0, -2))
+    static = panel("Static", 1, (0, 0, -4))
+    picker.register(moving, 0)
+    picker.register(static, 1, static=True)
+
+    moving.worldPosition[0] = 10
+    static.worldPosition[0] = 10
+    # The static panel is still hit where it was registered
+    hit = picker.pick(camera, CENTER)
+    assert hit.panel is static
+    assert picker.picks == 1
+
+
+def test_renderers_register_panels_with_the_static_property(gl_context, engine):
+    guis = [EmptyGUI(engine.scene, main=False, resolution=(64, 64), panel=engine.scene.add_object(
+        panel(f"Panel.{index}", index, (index * 3, 0, -5), imgui_static=static)))
+        for index, static in enumerate((False, True))]
+    picker = PanelPicker.for_scene(engine.scene)
+    assert list(picker._static) == [False, True]
+
+    for gui in guis:
+        gui.shutdown_gui()
+        imgui.destroy_context(gui.context)
+    release_dummy_texture()